@@ -0,0 +1,290 @@
+"""
+Headless batch runner for joint-check job files.
+
+Each job is one K-joint, given as a row of a CSV file, an object in a JSON
+array or a line of a JSON Lines (.jsonl) file, with the same inputs and units
+as the Streamlit sidebar:
+
+    id            optional label, defaults to the row number
+    code          AS or EN (default AS)
+    chord_type    SHS, RHS or CHS
+    chord         section name as in the catalogue 'Dimensions' column
+    brace_type    SHS, RHS or CHS (default CHS for CHS chords, else SHS)
+    brace         section name
+    chord_rotate, brace_rotate
+                  optional, rotate an RHS 90 degrees (default false)
+    e, chordspacing, L_chord (mm), div_chord
+    P_chord, P_brace (kN), M_ip_chord, M_op_chord, M_op_brace (kNm)
+    sigma_max (MPa, default 24), SCF_ch_op, SCF_br_op (default 2.0)
+
+Jobs are read lazily, a .json array one element at a time, and processed in
+chunks through functions_vec.joint_check, and results are streamed to CSV or
+Parquet, so memory use is bounded by the chunk size rather than the number of
+jobs. A .sqlite output appends the results, with the inputs and stress
+components of every joint, to a results store (see results_store.py) instead.
+
+    python batch.py jobs.csv results.csv
+    python batch.py jobs.jsonl results.parquet --chunk-size 20000
+    python batch.py jobs.csv project.sqlite
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+import numpy as np
+
+import catalogue
+import functions_vec as fvec
+
+DEFAULT_CHUNK_SIZE = 5000
+#Characters read at a time from a .json job array
+JSON_READ_SIZE = 1 << 16
+
+JOB_DEFAULTS = {'code':'AS','e':0.0,'sigma_max':24.0,'SCF_ch_op':2.0,'SCF_br_op':2.0,
+                'chord_rotate':False,'brace_rotate':False}
+NUMERIC_INPUTS = ('e','chordspacing','L_chord','div_chord',
+                  'P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace',
+                  'sigma_max','SCF_ch_op','SCF_br_op')
+#Factor from job file units (mm, kN, kNm, MPa) to SI
+SI_FACTORS = {'e':1e-3,'chordspacing':1e-3,'L_chord':1e-3,'div_chord':1,
+              'P_chord':1e3,'P_brace':1e3,'M_ip_chord':1e3,'M_op_chord':1e3,'M_op_brace':1e3,
+              'sigma_max':1e6,'SCF_ch_op':1,'SCF_br_op':1}
+
+#Output columns and their Parquet types
+RESULT_FIELDS = (('id','string'),('code','string'),('chord_type','string'),('chord','string'),
+                 ('brace_type','string'),('brace','string'),
+                 ('Ov','float64'),('theta_deg','float64'),('g_prime','float64'),
+                 ('beta','float64'),('twogamma','float64'),('tau','float64'),('joint','string'),
+                 ('SCF_chax','float64'),('SCF_bax','float64'),('SCF_chch','float64'),
+                 ('sigma_chord','float64'),('sigma_brace','float64'),('utilisation','float64'),
+                 ('geometry_ok','bool'),('dimensions_ok','bool'),('stress_ok','bool'),('passed','bool'),
+                 ('message','string'))
+STRESS_COMPONENTS = ('sigma_chord1P','sigma_chord2P','sigma_chordM_ip','sigma_chordM_op','sigma_brace_1P','sigma_braceM_op')
+#Further columns of each result row, kept by the results store (stresses in MPa, inputs in job file units)
+DETAIL_FIELDS = ((('chord_row','int64'),('brace_row','int64'))
+                 + tuple((name,'float64') for name in NUMERIC_INPUTS)
+                 + (('MF_chord','float64'),('MF_brace','float64'),('SCF_in_range','bool'),('fail_code','int64'))
+                 + tuple((name,'float64') for name in STRESS_COMPONENTS))
+
+def _iter_json_array(f,read_size=JSON_READ_SIZE):
+    """Yield the elements of the JSON array in file f one at a time, holding about one element in memory"""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    def more():
+        nonlocal buf, pos, eof
+        data = f.read(read_size)
+        eof = not data
+        buf = buf[pos:] + data
+        pos = 0
+    started = False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON job array")
+            more()
+            continue
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError("A .json job file must hold an array of jobs")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf,pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more()
+            continue
+        #An element is only complete once followed by a separator, as a number may go on in the next read
+        if end == len(buf) or buf[end] not in ",] \t\r\n":
+            if eof:
+                raise ValueError(f"Invalid JSON job array near character {end}")
+            more()
+            continue
+        pos = end
+        yield item
+
+def read_jobs(path):
+    """Yield job dicts one at a time from a .csv, .json or .jsonl file"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path,newline='') as f:
+        if ext == '.csv':
+            yield from csv.DictReader(f)
+        elif ext == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif ext == '.json':
+            yield from _iter_json_array(f)
+        else:
+            raise ValueError(f"Unsupported job file type '{ext}', use .csv, .json or .jsonl")
+
+def _as_bool(value):
+    return (value.strip().lower() in ('1','true','yes','y') if isinstance(value,str) else bool(value))
+
+def parse_job(job,number):
+    """Fill defaults and convert a raw job to SI floats. Raises ValueError/KeyError/OverflowError on bad input"""
+    parsed = dict(JOB_DEFAULTS)
+    parsed.update({key:val for key,val in job.items() if val not in (None,'')})
+    for name in ('chord','brace','chord_type','code'):
+        if name not in parsed:
+            raise KeyError(f"missing '{name}'")
+    parsed['id'] = str(parsed.get('id',number))
+    parsed['brace_type'] = parsed.get('brace_type',"CHS" if parsed['chord_type'] == "CHS" else "SHS")
+    for name in NUMERIC_INPUTS:
+        if name not in parsed:
+            raise KeyError(f"missing '{name}'")
+        parsed[name] = float(parsed[name]) * SI_FACTORS[name]
+    parsed['chord_rotate'] = _as_bool(parsed['chord_rotate'])
+    parsed['brace_rotate'] = _as_bool(parsed['brace_rotate'])
+    return parsed
+
+def _error_row(job,number,error):
+    row = {name:None for name,_ in RESULT_FIELDS}
+    for name in ('code','chord_type','chord','brace_type','brace'):
+        row[name] = (None if job.get(name) is None else str(job.get(name)))
+    row['id'] = str(job.get('id',number))
+    row['passed'] = False
+    row['message'] = f"Input error: {error}"
+    return row
+
+def run_chunk(jobs,first_number=0):
+    """Evaluate a list of raw jobs, grouped by chord type, and return result rows in input order"""
+    cat = catalogue.load()
+    rows = [None] * len(jobs)
+    groups = {}
+    for i, job in enumerate(jobs):
+        try:
+            parsed = parse_job(job,first_number + i)
+            chord_table = cat.table(parsed['code'],parsed['chord_type'])
+            brace_table = cat.table(parsed['code'],parsed['brace_type'])
+            parsed['chord_row'] = chord_table.find(str(parsed['chord']))
+            parsed['brace_row'] = brace_table.find(str(parsed['brace']))
+            parsed['chord_props'] = chord_table.props(parsed['chord_row'],parsed['chord_rotate'])
+            parsed['brace_props'] = brace_table.props(parsed['brace_row'],parsed['brace_rotate'])
+        except (KeyError,ValueError,TypeError,OverflowError) as error:
+            #OverflowError: JSON integers too large for a float
+            rows[i] = _error_row(job,first_number + i,error)
+            continue
+        groups.setdefault(parsed['chord_type'],[]).append((i,parsed))
+
+    for chord_type, group in groups.items():
+        chord = fvec.section_array([parsed['chord_props'] for _,parsed in group])
+        brace = fvec.section_array([parsed['brace_props'] for _,parsed in group])
+        inputs = {name:np.array([parsed[name] for _,parsed in group]) for name in NUMERIC_INPUTS}
+        ind = np.arange(len(group))
+        res = fvec.joint_check(chord_type,chord,brace,pairs=(ind,ind),**inputs)
+        utilisation = np.maximum(res['sigma_chord'],res['sigma_brace']) / inputs['sigma_max']
+        for k, (i,parsed) in enumerate(group):
+            row = {name:str(parsed[name]) for name in ('id','code','chord_type','chord','brace_type','brace')}
+            for name in ('Ov','g_prime','beta','twogamma','tau','SCF_chax','SCF_bax','SCF_chch'):
+                row[name] = float(res[name][k])
+            row['theta_deg'] = float(np.degrees(res['theta'][k]))
+            row['joint'] = ("gap" if res['gap'][k] else "overlap")
+            row['sigma_chord'] = float(res['sigma_chord'][k]) / 1e6
+            row['sigma_brace'] = float(res['sigma_brace'][k]) / 1e6
+            row['utilisation'] = float(utilisation[k])
+            row['geometry_ok'] = bool(res['success'][k])
+            row['dimensions_ok'] = bool(res['dim_success'][k])
+            row['stress_ok'] = bool(res['success_stress'][k])
+            row['passed'] = row['geometry_ok'] and row['dimensions_ok'] and row['stress_ok']
+            message = fvec.check_message(res['fail_code'][k],res['gap'][k],chord['h'][k])
+            if not row['dimensions_ok']:
+                message += " | FAIL - Dimensional Parameters exceeded"
+            if not row['stress_ok']:
+                message += " | FAIL - Stresses exceed allowable limits"
+            row['message'] = message
+            row['chord_row'] = int(parsed['chord_row'])
+            row['brace_row'] = int(parsed['brace_row'])
+            for name in NUMERIC_INPUTS:
+                row[name] = parsed[name] / SI_FACTORS[name]
+            for name in ('MF_chord','MF_brace'):
+                row[name] = float(res[name][k])
+            row['SCF_in_range'] = bool(res['SCF_in_range'][k])
+            row['fail_code'] = int(res['fail_code'][k])
+            for name in STRESS_COMPONENTS:
+                row[name] = float(res[name][k]) / 1e6
+            rows[i] = row
+    return rows
+
+class CsvResultWriter:
+    def __init__(self,path):
+        self.file = open(path,'w',newline='')
+        self.writer = csv.DictWriter(self.file,fieldnames=[name for name,_ in RESULT_FIELDS],extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self,rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+class ParquetResultWriter:
+    """Writes each chunk as a Parquet row group. Needs the optional pyarrow package"""
+    def __init__(self,path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow, install it or write to .csv instead")
+        self.pa = pa
+        self.schema = pa.schema([(name,pa.type_for_alias(dtype)) for name,dtype in RESULT_FIELDS])
+        self.writer = pq.ParquetWriter(path,self.schema)
+
+    def write(self,rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows,schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def result_writer(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        return ParquetResultWriter(path)
+    if ext in ('.sqlite','.db'):
+        import results_store
+        return results_store.StoreResultWriter(path)
+    return CsvResultWriter(path)
+
+def run(job_path,out_path,chunk_size=DEFAULT_CHUNK_SIZE):
+    """Run every job in job_path and stream the results to out_path (.csv, .parquet, or a .sqlite results store).
+    Returns counts of jobs, passed and failed"""
+    jobs = read_jobs(job_path)
+    writer = result_writer(out_path)
+    summary = {'jobs':0,'passed':0,'failed':0}
+    try:
+        while True:
+            chunk = list(islice(jobs,chunk_size))
+            if not chunk:
+                break
+            rows = run_chunk(chunk,summary['jobs'])
+            writer.write(rows)
+            summary['jobs'] += len(rows)
+            summary['passed'] += sum(row['passed'] for row in rows)
+        summary['failed'] = summary['jobs'] - summary['passed']
+    finally:
+        writer.close()
+    return summary
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Check every K-joint in a job file against CIDECT 8 fatigue limits.")
+    parser.add_argument('jobs',help="job file (.csv, .json or .jsonl)")
+    parser.add_argument('results',help="output file (.csv or .parquet), or a results store (.sqlite) to append to")
+    parser.add_argument('--chunk-size',type=int,default=DEFAULT_CHUNK_SIZE,help="jobs evaluated per vectorised pass")
+    args = parser.parse_args(argv)
+    summary = run(args.jobs,args.results,args.chunk_size)
+    print(f"{summary['jobs']} joints checked: {summary['passed']} passed, {summary['failed']} failed")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(cli())
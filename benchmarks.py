@@ -0,0 +1,209 @@
+"""
+Benchmarks and golden values for the calculation core.
+
+Each benchmark is timed as the best of several repeats and compared with the
+baselines stored in data/benchmarks.json. A benchmark fails when it is slower
+than threshold x baseline (and more than MIN_SLACK seconds slower, so
+sub-millisecond noise never fails a run). Benchmarks whose dependencies cannot
+be imported are reported as errors, not failures.
+
+data/golden_joints.json holds results of the scalar functions.joint_check for a
+fixed set of joints; test_benchmarks.py checks every faster path against them.
+
+    python benchmarks.py                 compare with the baselines, exit 1 on a regression
+    python benchmarks.py --update        store the current timings as the baselines
+    python benchmarks.py --write-golden  regenerate the golden values from functions.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"data")
+BASELINE_PATH = os.path.join(DATA_DIR,"benchmarks.json")
+GOLDEN_PATH = os.path.join(DATA_DIR,"golden_joints.json")
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_REPEAT = 5
+MIN_SLACK = 0.005
+
+#Sidebar default geometry and forces in SI units (m, N, Nm, Pa)
+GEOMETRY = (2.0,8.0,4)
+LOADS = (70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+#(code, chord type, brace type, eccentricity) of each all-sizes sweep and golden case,
+#every chord/brace family the sidebar offers
+SWEEPS = tuple((code,chord_type,brace_type,e) for code in ("AS","EN")
+               for chord_type,brace_type,e in (("SHS","SHS",-0.1),("SHS","RHS",-0.1),("RHS","SHS",-0.05),
+                                               ("RHS","RHS",-0.05),("CHS","CHS",0.0)))
+
+def _single_joint():
+    import catalogue
+    import functions as fnc
+    table = catalogue.load().table("AS","SHS")
+    chord, brace = table.props(40), table.props(25)
+    return lambda: fnc.joint_check("SHS",chord,brace,-0.1,*GEOMETRY,*LOADS)
+
+def _sweep(code):
+    import catalogue
+    import sweep_cache
+    cat = catalogue.load()
+    tables = [(chord_type,e,cat.table(code,chord_type).section_array(),cat.table(code,brace_type).section_array())
+              for sweep_code,chord_type,brace_type,e in SWEEPS if sweep_code == code]
+    #The app's path (pruning and the stage graph), through an empty cache so every sweep is computed
+    forces, SCF = LOADS[:5], LOADS[6:]
+    def run():
+        cache = sweep_cache.SweepCache(spill_dir=None)
+        for chord_type, e, chord, brace in tables:
+            sweep_cache.all_sizes(chord_type,chord,brace,e,*GEOMETRY,*forces,*SCF,cache=cache)
+    return run
+
+def _SCFochax():
+    import functions as fnc
+    beta = np.linspace(0.2,0.7,100000)
+    theta = np.linspace(0.5,1.1,100000)
+    return lambda: fnc.SCFochax_func(beta,theta)
+
+def _section_solve():
+    import section_cache
+    import validation as vld
+    def run():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            hs = vld.hs(0.2,0.008,cache=section_cache.SectionCache(cache_dir))
+            hs.rhs(0.1)
+            hs.chs()
+    return run
+
+def _catalogue_load():
+    import catalogue
+    def run():
+        catalogue.load.cache_clear()
+        catalogue.load()
+    return run
+
+def _import(modules):
+    code = "import " + ", ".join(modules)
+    def run():
+        subprocess.run([sys.executable,"-c",code],check=True,capture_output=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+    return run
+
+#name -> setup() returning the function to time
+BENCHMARKS = {
+    'single_joint':_single_joint,
+    'sweep_AS':lambda: _sweep("AS"),
+    'sweep_EN':lambda: _sweep("EN"),
+    'SCFochax_func':_SCFochax,
+    'section_solve':_section_solve,
+    'catalogue_load':_catalogue_load,
+    'import_core':lambda: _import(("functions","functions_vec","catalogue","stages")),
+    'import_app':lambda: _import(("main",)),
+}
+#Calls per timing of benchmarks too fast to time one call at a time
+NUMBER = {'single_joint':200}
+
+def time_benchmark(name,repeat=DEFAULT_REPEAT):
+    """Best time of one call (s) over repeat timings"""
+    func = BENCHMARKS[name]()
+    number = NUMBER.get(name,1)
+    func()
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best,(time.perf_counter() - start) / number)
+    return best
+
+def run(names=None,repeat=DEFAULT_REPEAT):
+    """Time each benchmark. Returns {name: seconds} and {name: error message} for those that could not run"""
+    timings = {}
+    errors = {}
+    for name in (BENCHMARKS if names is None else names):
+        try:
+            timings[name] = time_benchmark(name,repeat)
+        except Exception as error:
+            errors[name] = f"{type(error).__name__}: {error}"
+    return timings, errors
+
+def load_baselines(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)["timings"]
+    except (OSError,ValueError,KeyError):
+        return {}
+
+def save_baselines(timings,path=BASELINE_PATH):
+    with open(path,"w") as f:
+        json.dump({"python":sys.version.split()[0],"timings":timings},f,indent=1,sort_keys=True)
+
+def regressions(timings,baselines,threshold=DEFAULT_THRESHOLD):
+    """Benchmarks slower than threshold x baseline, as {name: (seconds, baseline)}"""
+    return {name:(seconds,baselines[name]) for name,seconds in timings.items()
+            if name in baselines and seconds > threshold * baselines[name] and seconds - baselines[name] > MIN_SLACK}
+
+def golden_cases():
+    """(chord_type, chord_props, brace_props, e) of the golden joints: a spread of rows of each sweep table"""
+    import catalogue
+    cat = catalogue.load()
+    cases = []
+    for code, chord_type, brace_type, e in SWEEPS:
+        chord_table, brace_table = cat.table(code,chord_type), cat.table(code,brace_type)
+        for ch_row in np.linspace(0,len(chord_table) - 1,7).astype(int):
+            for br_row in np.linspace(0,len(brace_table) - 1,7).astype(int):
+                if brace_table.b[br_row] <= chord_table.b[ch_row]:
+                    cases.append((chord_type,chord_table.props(ch_row),brace_table.props(br_row),e))
+    return cases
+
+#Outputs of functions.joint_check kept as golden values
+GOLDEN_KEYS = ('Ov','theta','g_prime','beta','twogamma','tau','success','message','gap','dim_success',
+               'SCF_chax','SCF_bax','SCF_chch','sigma_chord','sigma_brace','success_stress')
+
+def write_golden(path=GOLDEN_PATH):
+    import functions as fnc
+    golden = []
+    for chord_type, chord, brace, e in golden_cases():
+        res = fnc.joint_check(chord_type,chord,brace,e,*GEOMETRY,*LOADS)
+        golden.append({'chord_type':chord_type,'chord':chord,'brace':brace,'e':e,
+                       'result':{key:res[key] for key in GOLDEN_KEYS}})
+    with open(path,"w") as f:
+        json.dump(golden,f,indent=0)
+    return len(golden)
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Time the calculation core and compare with the stored baselines.")
+    parser.add_argument('names',nargs='*',help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat',type=int,default=DEFAULT_REPEAT)
+    parser.add_argument('--threshold',type=float,default=DEFAULT_THRESHOLD,help="allowed slowdown factor")
+    parser.add_argument('--update',action='store_true',help="store the timings as the new baselines")
+    parser.add_argument('--write-golden',action='store_true',help="regenerate the golden values from functions.py")
+    args = parser.parse_args(argv)
+    if args.write_golden:
+        print(f"{write_golden()} golden joints written to {GOLDEN_PATH}")
+        return 0
+    timings, errors = run(args.names or None,args.repeat)
+    baselines = load_baselines()
+    for name, seconds in timings.items():
+        base = baselines.get(name)
+        ratio = (f"{seconds / base:5.2f}x baseline" if base else "no baseline")
+        print(f"{name:16s} {seconds*1000:10.3f} ms  {ratio}")
+    for name, error in errors.items():
+        print(f"{name:16s} not run ({error})")
+    if args.update:
+        save_baselines({**baselines,**timings})
+        print(f"Baselines written to {BASELINE_PATH}")
+        return 0
+    slow = regressions(timings,baselines,args.threshold)
+    for name, (seconds, base) in slow.items():
+        print(f"REGRESSION {name}: {seconds*1000:.3f} ms vs baseline {base*1000:.3f} ms")
+    return (1 if slow else 0)
+
+if __name__ == '__main__':
+    sys.exit(cli())
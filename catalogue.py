@@ -0,0 +1,182 @@
+"""
+Precompiled hollow section catalogue.
+
+The CSV tables in data/ are normalised once into a columnar binary store in
+data/catalogue/: one .npy file per column, in SI units, covering every row of
+every table, plus index.json describing where each table starts and stops.
+The columns are memory-mapped on load, so a cold start reads no CSV and does
+no per-row unit conversion. Each table also stores row orders sorted on b, d
+and t for cheap range queries.
+
+Run `python catalogue.py` to (re)build the store. load() rebuilds it
+automatically when a CSV is newer than the store.
+"""
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+
+import functions_vec as fvec
+import tracing
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"data")
+CATALOGUE_DIR = os.path.join(DATA_DIR,"catalogue")
+FORMAT_VERSION = 1
+
+#Source CSV of each (code, section type), as read by validation.load_data
+SOURCES = {("AS","SHS"):"SHS.csv", ("AS","RHS"):"RHS.csv", ("AS","CHS"):"CHS.csv",
+           ("EN","SHS"):"SHS.csv", ("EN","RHS"):"RHS.csv", ("EN","CHS"):"CHS_en.csv"}
+
+#Numeric columns of the store, all SI: m, m^2, m^4 and kg/m
+COLUMNS = ("b","d","t","A","Ix","Iy","mass")
+SORT_COLUMNS = ("b","d","t")
+
+def _read_csv(path):
+    """Normalise one CSV table into SI columns.
+    Tables without a b column are CHS (b = d), tables without Iy are symmetric (Iy = Ix)"""
+    import pandas as pd
+    df = pd.read_csv(path,header=0)
+    cols = {"name":df["Dimensions"].astype(str).to_numpy()}
+    cols["d"] = df["d"].to_numpy(dtype=float) / 1000
+    cols["b"] = (df["b"].to_numpy(dtype=float) / 1000 if "b" in df else cols["d"].copy())
+    cols["t"] = df["t"].to_numpy(dtype=float) / 1000
+    cols["A"] = df["Area"].to_numpy(dtype=float) / 1000**2
+    cols["Ix"] = df["Ix"].to_numpy(dtype=float) * 10**6 / 1000**4
+    cols["Iy"] = (df["Iy"].to_numpy(dtype=float) * 10**6 / 1000**4 if "Iy" in df else cols["Ix"].copy())
+    cols["mass"] = df["Mass"].to_numpy(dtype=float)
+    return cols
+
+def _source_stamp(source):
+    stat = os.stat(os.path.join(DATA_DIR,source))
+    return [stat.st_mtime_ns,stat.st_size]
+
+@tracing.traced("catalogue build")
+def build(out_dir=CATALOGUE_DIR):
+    """Compile every CSV table in SOURCES into the columnar store in out_dir"""
+    sources = sorted(set(SOURCES.values()))
+    blocks = {name:[] for name in COLUMNS + ("name",) + tuple("sort_" + c for c in SORT_COLUMNS)}
+    ranges = {}
+    start = 0
+    for source in sources:
+        cols = _read_csv(os.path.join(DATA_DIR,source))
+        n = len(cols["d"])
+        for name in COLUMNS + ("name",):
+            blocks[name].append(cols[name])
+        for name in SORT_COLUMNS:
+            blocks["sort_" + name].append(np.argsort(cols[name],kind="stable"))
+        ranges[source] = [start,start + n]
+        start += n
+    index = {"version":FORMAT_VERSION,
+             "sources":{source:{"rows":ranges[source],"stamp":_source_stamp(source)} for source in sources},
+             "tables":{f"{code}/{hs_type}":source for (code,hs_type),source in SOURCES.items()}}
+
+    #Write into a temporary directory first, then move each file into place with index.json last,
+    #so a reader in another worker never loads a half written store
+    os.makedirs(out_dir,exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=out_dir)
+    for name, parts in blocks.items():
+        arr = np.concatenate(parts)
+        if name == "name":
+            arr = arr.astype("U")
+        np.save(os.path.join(tmp_dir,name + ".npy"),arr)
+    with open(os.path.join(tmp_dir,"index.json"),"w") as f:
+        json.dump(index,f,indent=1)
+    for name in list(blocks) + ["index"]:
+        filename = name + (".json" if name == "index" else ".npy")
+        os.replace(os.path.join(tmp_dir,filename),os.path.join(out_dir,filename))
+    os.rmdir(tmp_dir)
+    return out_dir
+
+def _is_stale(catalogue_dir):
+    try:
+        with open(os.path.join(catalogue_dir,"index.json")) as f:
+            index = json.load(f)
+    except (OSError,ValueError):
+        return True
+    if index.get("version") != FORMAT_VERSION:
+        return True
+    for source in set(SOURCES.values()):
+        entry = index["sources"].get(source)
+        if entry is None or entry["stamp"] != _source_stamp(source):
+            return True
+    return False
+
+class Table:
+    """One section table (e.g. AS CHS) as memory-mapped column slices in SI units"""
+    def __init__(self,columns,start,stop):
+        self.start = start
+        self.stop = stop
+        for name in COLUMNS + ("name",):
+            setattr(self,name,columns[name][start:stop])
+        self.sorted = {name:columns["sort_" + name][start:stop] for name in SORT_COLUMNS}
+        self._sorted_values = {}
+        self._rows = None
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def find(self,name):
+        """Row number of the section called name (the 'Dimensions' column of the CSV)"""
+        if self._rows is None:
+            self._rows = {str(n):i for i,n in enumerate(self.name)}
+        return self._rows[name]
+
+    def range_rows(self,column,lo=-np.inf,hi=np.inf):
+        """Rows with lo <= column <= hi, found by binary search on the sorted index"""
+        order = self.sorted[column]
+        if column not in self._sorted_values:
+            self._sorted_values[column] = getattr(self,column)[order]
+        values = self._sorted_values[column]
+        return order[np.searchsorted(values,lo,side="left"):np.searchsorted(values,hi,side="right")]
+
+    def select(self,**ranges):
+        """Sorted rows satisfying every (lo, hi) range given by keyword, e.g. select(b=(0.1,0.2),t=(0.004,0.01))"""
+        rows = None
+        for column, (lo, hi) in ranges.items():
+            found = np.sort(self.range_rows(column,lo,hi))
+            rows = (found if rows is None else np.intersect1d(rows,found,assume_unique=True))
+        return (np.arange(len(self)) if rows is None else rows)
+
+    def props(self,row,reverse_axes=False):
+        """(b,h,t,area,I_x,I_y) tuple of one row, as returned by validation.hs_populate"""
+        b, d, Ix, Iy = float(self.b[row]), float(self.d[row]), float(self.Ix[row]), float(self.Iy[row])
+        if reverse_axes:
+            b, d, Ix, Iy = d, b, Iy, Ix
+        return b, d, float(self.t[row]), float(self.A[row]), Ix, Iy
+
+    def section_array(self,rows=None):
+        """Structured array of functions_vec.SECTION_DTYPE for rows (default all rows)"""
+        rows = (slice(None) if rows is None else rows)
+        arr = np.empty(len(self.d[rows]),dtype=fvec.SECTION_DTYPE)
+        for field, column in zip(fvec.SECTION_DTYPE.names,("b","d","t","A","Ix","Iy")):
+            arr[field] = getattr(self,column)[rows]
+        return arr
+
+class Catalogue:
+    """Memory-mapped view of the whole compiled store"""
+    def __init__(self,catalogue_dir=CATALOGUE_DIR):
+        with open(os.path.join(catalogue_dir,"index.json")) as f:
+            self.index = json.load(f)
+        names = COLUMNS + ("name",) + tuple("sort_" + c for c in SORT_COLUMNS)
+        self.columns = {name:np.load(os.path.join(catalogue_dir,name + ".npy"),mmap_mode="r") for name in names}
+        self._tables = {}
+
+    def table(self,code,hs_type):
+        key = f"{code}/{hs_type}"
+        if key not in self._tables:
+            start, stop = self.index["sources"][self.index["tables"][key]]["rows"]
+            self._tables[key] = Table(self.columns,start,stop)
+        return self._tables[key]
+
+@lru_cache(maxsize=None)
+@tracing.traced("catalogue load")
+def load(catalogue_dir=CATALOGUE_DIR):
+    """Memory-map the compiled catalogue, building it first if it is missing or out of date"""
+    if _is_stale(catalogue_dir):
+        build(catalogue_dir)
+    return Catalogue(catalogue_dir)
+
+if __name__ == '__main__':
+    print(f"Catalogue written to {build()}")
@@ -0,0 +1,189 @@
+"""
+Fatigue damage of K-joints from member force time histories.
+
+The joint check of functions_vec is linear in the five member forces once the
+geometry, SCFs and moment factors are fixed, so each joint is reduced to a 2x5
+matrix of influence coefficients (hot-spot stress per unit force at the chord
+and brace locations). A force history of shape (n, 5), in the order of LOADS,
+becomes the two hot-spot stress histories with one matrix product.
+
+Each stress history is rainflow counted (four-point method, ASTM E1049
+equivalent: closed cycles plus the residue as half cycles) and damage is summed
+with Miner's rule against the CIDECT Design Guide 8 hot-spot S-N curves.
+Histories may be given as one array or as an iterable of chunks, e.g. slices of
+a memory-mapped .npy file, and are counted as they stream in.
+"""
+import numpy as np
+
+import functions_vec as fvec
+
+#Order of the force columns of a history, SI units (N, Nm)
+LOADS = ('P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace')
+LOCATIONS = ('chord','brace')
+DEFAULT_CHUNK_SIZE = 100000
+
+#CIDECT DG8 hot-spot S-N curves, stress range in MPa and wall thickness in mm
+SN_KNEE = 5e6
+SN_CUTOFF = 1e8
+SN_T_MIN, SN_T_MAX = 4., 50.
+
+def influence_coefficients(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,SCF_ch_op,SCF_br_op):
+    """
+    Hot-spot stress per unit force of each joint, from functions_vec.joint_check.
+    chord, brace: structured arrays of functions_vec.SECTION_DTYPE, joint i is chord[i] with brace[i]
+    Geometry may be scalars or arrays with one value per joint.
+
+    Returns an array of shape (joints, 2, 5): [joint, location, load] in Pa/N and Pa/Nm
+    """
+    n = len(chord)
+    ind = np.tile(np.arange(n),len(LOADS))
+    unit = np.repeat(np.eye(len(LOADS)),n,axis=0)
+    geometry = [np.tile(np.broadcast_to(x,(n,)),len(LOADS)) for x in (e,chordspacing,L_chord,div_chord)]
+    res = fvec.joint_check(chord_type,chord,brace,*geometry,*unit.T,np.inf,SCF_ch_op,SCF_br_op,pairs=(ind,ind))
+    stress = np.stack([res['sigma_chord'],res['sigma_brace']])
+    return stress.reshape(2,len(LOADS),n).transpose(2,0,1)
+
+def turning_points(x):
+    """Peaks and valleys of x, keeping the first and last samples"""
+    x = np.asarray(x,dtype=float)
+    x = x[np.concatenate(([True],np.diff(x) != 0))]
+    if len(x) < 3:
+        return x
+    d = np.sign(np.diff(x))
+    return x[np.concatenate(([True],d[1:] != d[:-1],[True]))]
+
+def _extract_sequential(x):
+    """Four-point cycle extraction with a stack, one point at a time"""
+    stack = []
+    ranges = []
+    for val in x.tolist():
+        stack.append(val)
+        while len(stack) >= 4:
+            x1, x2, x3, x4 = stack[-4:]
+            r = abs(x3 - x2)
+            if r <= abs(x2 - x1) and r <= abs(x4 - x3):
+                ranges.append(r)
+                del stack[-3:-1]
+            else:
+                break
+    return np.array(ranges), np.array(stack)
+
+def extract_cycles(x):
+    """
+    Four-point rainflow extraction on a sequence of turning points.
+    Every inner range that is no larger than both neighbours is a closed cycle;
+    all of them are removed at once in each pass, and the last few passes, when
+    little is left to remove, run on a stack instead.
+
+    Returns the ranges of the closed cycles and the residue (unclosed turning points)
+    """
+    x = np.asarray(x,dtype=float)
+    found = []
+    while len(x) >= 4:
+        r = np.abs(np.diff(x))
+        cand = (r[1:-1] <= r[:-2]) & (r[1:-1] <= r[2:])
+        #Equal neighbouring ranges share a point, only the first of each run is taken
+        cand[1:] &= ~cand[:-1]
+        sel = np.flatnonzero(cand) + 1
+        if len(sel) * 64 < len(x):
+            break
+        found.append(r[sel])
+        keep = np.ones(len(x),dtype=bool)
+        keep[sel] = False
+        keep[sel + 1] = False
+        x = x[keep]
+    ranges, residue = _extract_sequential(x)
+    return np.concatenate(found + [ranges]), residue
+
+class Rainflow:
+    """
+    Streaming rainflow counter. push() takes the next chunk of a history and
+    returns the ranges of the cycles it closes; the unclosed turning points are
+    carried over to the next chunk. half_cycles() gives the residue ranges once
+    the history is complete.
+    """
+    def __init__(self):
+        self.residue = np.empty(0)
+
+    def push(self,samples):
+        ranges, self.residue = extract_cycles(turning_points(np.concatenate((self.residue,samples))))
+        return ranges
+
+    def half_cycles(self):
+        return np.abs(np.diff(self.residue))
+
+def count(x):
+    """Rainflow count of a whole history: (ranges, counts) with 1 for closed cycles and 0.5 for half cycles"""
+    counter = Rainflow()
+    full = counter.push(x)
+    half = counter.half_cycles()
+    return np.concatenate((full,half)), np.concatenate((np.ones(len(full)),np.full(len(half),0.5)))
+
+def cycles_to_failure(stress_range,t):
+    """
+    CIDECT DG8 hot-spot S-N curve: cycles to failure for hot-spot stress ranges (Pa)
+    at a wall thickness t (m). Uses the m = 3 curve up to 5e6 cycles, the m = 5 curve
+    up to the 1e8 cut-off, and infinite life beyond. t is clipped to the 4-50 mm
+    range of the curves.
+    """
+    S = np.asarray(stress_range,dtype=float) / 1e6
+    t = np.clip(np.asarray(t,dtype=float) * 1000,SN_T_MIN,SN_T_MAX)
+    with np.errstate(divide='ignore'):
+        log_S = np.log10(S)
+    log_N1 = (12.476 - 3*log_S) / (1 + 0.18*np.log10(16/t))
+    log_N2 = (16.327 - 5*log_S) / (1 + 0.22*np.log10(16/t))
+    log_N = np.where(log_N1 <= np.log10(SN_KNEE),log_N1,log_N2)
+    return np.where(log_N > np.log10(SN_CUTOFF),np.inf,10**log_N)
+
+def miner(ranges,counts,t,gamma_mf=1.0):
+    """Miner damage sum of counted stress ranges (Pa), with partial factor gamma_mf on the ranges"""
+    return float(np.sum(counts / cycles_to_failure(gamma_mf * np.asarray(ranges),t)))
+
+def chunks(history,chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield row slices of an array (e.g. np.load(path,mmap_mode='r')), or pass an iterable of chunks through"""
+    if isinstance(history,np.ndarray):
+        for start in range(0,len(history),chunk_size):
+            yield np.asarray(history[start:start + chunk_size],dtype=float)
+    else:
+        yield from history
+
+def history_damage(coeffs,history,t_chord,t_brace,gamma_mf=1.0,chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Miner damage of one joint.
+    coeffs: (2, 5) influence coefficients of the joint
+    history: (n, 5) force history in the order of LOADS (N, Nm), or an iterable of such chunks
+
+    Returns a dict of damage and number of counted cycles at the chord and brace hot spots
+    """
+    t = (t_chord,t_brace)
+    counters = [Rainflow() for _ in LOCATIONS]
+    damage = [0.,0.]
+    cycles = [0.,0.]
+    for chunk in chunks(history,chunk_size):
+        stress = np.asarray(chunk,dtype=float).reshape(-1,len(LOADS)) @ coeffs.T
+        for k, counter in enumerate(counters):
+            ranges = counter.push(stress[:,k])
+            damage[k] += miner(ranges,1.0,t[k],gamma_mf)
+            cycles[k] += len(ranges)
+    for k, counter in enumerate(counters):
+        half = counter.half_cycles()
+        damage[k] += miner(half,0.5,t[k],gamma_mf)
+        cycles[k] += 0.5 * len(half)
+    return {'damage_chord':damage[0], 'damage_brace':damage[1],
+            'cycles_chord':cycles[0], 'cycles_brace':cycles[1]}
+
+def joint_damage(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,SCF_ch_op,SCF_br_op,
+                 histories,gamma_mf=1.0,chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Miner damage of many joints, joint i being chord[i] with brace[i].
+    histories: one force history per joint, each as accepted by history_damage
+
+    Returns a dict of arrays with one value per joint: damage and cycle counts at the
+    chord and brace hot spots, and the governing damage
+    """
+    coeffs = influence_coefficients(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,SCF_ch_op,SCF_br_op)
+    rows = [history_damage(coeffs[i],history,chord['t'][i],brace['t'][i],gamma_mf,chunk_size)
+            for i, history in enumerate(histories)]
+    out = {key:np.array([row[key] for row in rows]) for key in ('damage_chord','damage_brace','cycles_chord','cycles_brace')}
+    out['damage'] = np.maximum(out['damage_chord'],out['damage_brace'])
+    return out
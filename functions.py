@@ -1,11 +1,26 @@
-from handcalcs import handcalc
+from functools import lru_cache, wraps
 from math import sqrt, cos, sin, pi, atan, tan
-import streamlit as st
 import forallpeople as u
 u.environment('structural')
-from scipy.interpolate import interp2d
 import numpy as np
 
+import tracing
+
+#handcalcs and scipy are imported on first use, so the calculation core
+#imports quickly for batch runs and sessions that never show the working
+def handcalc(**kwargs):
+    """handcalcs.handcalc, imported and applied to the function on its first call"""
+    def decorator(func):
+        rendered = []
+        @wraps(func)
+        def wrapper(*args,**kw):
+            if not rendered:
+                from handcalcs import handcalc as _handcalc
+                rendered.append(_handcalc(**kwargs)(func))
+            return rendered[0](*args,**kw)
+        return wrapper
+    return decorator
+
 def dim_params(b0,t0,b1,t1,chord_type):
     """Calculate the dimensional variables beta, 
     2*gamma and tau"""
@@ -137,26 +152,47 @@ def SCF_gap_rhs(beta,twogamma,tau,g_prime,theta):
 
 SCF_gap_rhs_hc = handcalc(override="long")(SCF_gap_rhs)
 
+#CIDECT Fig. tables for CHS joints, SCF_ochax and SCF_obax are tabulated against theta (rows) and beta (columns)
+SCF_BETA_VALS = np.array([0.3,0.6])
+SCF_THETA_VALS = np.array([30.,45.,60.])
+SCF_OCHAX_VALS = np.array([[2.73,2.5],[3.18,2.83],[3.52,3.19]])
+SCF_OBAX_VALS = np.array([[1.45,1.15],[2.03,1.7],[2.5,2.08]])
+SCF_BAX_MIN_VALS = np.array([2.64,2.30,2.12])
+
+@lru_cache(maxsize=None)
+def SCF_interpolators():
+    """Interpolators of SCF_ochax and SCF_obax, built once on first use and evaluated on arrays of (theta, beta) points"""
+    from scipy.interpolate import RegularGridInterpolator
+    return (RegularGridInterpolator((SCF_THETA_VALS,SCF_BETA_VALS),SCF_OCHAX_VALS,method='linear'),
+            RegularGridInterpolator((SCF_THETA_VALS,SCF_BETA_VALS),SCF_OBAX_VALS,method='linear'))
+
 def SCFochax_func(beta,theta):
     """
     SCFochax and SCFobax are functions of both beta and theta
-    Use Scipy interp2d function to create interpolation between curves
-    Then plot the image of the graphs and the plotted value.
-    This gives user re-assurance that the value was correctly calculated.
+    Interpolate linearly between the curves of the CIDECT Fig. tables.
+    beta and theta (radians) may be scalars or arrays of the same shape.
+    Points outside the tables take the value at the nearest edge and are
+    flagged False in in_range, so the caller can report them.
     """
-    beta_vals = [0.3,0.6]
-    theta_vals = [30,45,60]
-    SCF_ochax_vals = [[2.73,2.5],[3.18,2.83],[3.52,3.19]]
-    SCF_obax_vals = [[1.45,1.15],[2.03,1.7],[2.5,2.08]]
-    SCF_ochax_func = interp2d(beta_vals, theta_vals, SCF_ochax_vals, kind='linear')
-    SCF_obax_func = interp2d(beta_vals,theta_vals, SCF_obax_vals, kind='linear')
-    SCF_ochax = SCF_ochax_func(beta,theta*180/pi)
-    SCF_obax = SCF_obax_func(beta,theta*180/pi)
+    beta = np.asarray(beta,dtype=float)
+    theta_deg = np.asarray(theta,dtype=float)*180/pi
+    beta, theta_deg = np.broadcast_arrays(beta,theta_deg)
+    #Small tolerance so that points on the table edges are not flagged through round-off
+    tol = 1e-9
+    in_range = ((SCF_BETA_VALS[0] - tol <= beta) & (beta <= SCF_BETA_VALS[-1] + tol)
+                & (SCF_THETA_VALS[0] - tol <= theta_deg) & (theta_deg <= SCF_THETA_VALS[-1] + tol))
+    points = np.stack((np.clip(theta_deg,SCF_THETA_VALS[0],SCF_THETA_VALS[-1]),
+                       np.clip(beta,SCF_BETA_VALS[0],SCF_BETA_VALS[-1])),axis=-1)
+    SCF_ochax_interp, SCF_obax_interp = SCF_interpolators()
+    SCF_ochax = SCF_ochax_interp(points).reshape(beta.shape)
+    SCF_obax = SCF_obax_interp(points).reshape(beta.shape)
 
     #Interpolate SCF_bax_min
-    SCF_bax_min = np.interp(theta*180/pi,[30,45,60],[2.64,2.30,2.12])
+    SCF_bax_min = np.interp(theta_deg,SCF_THETA_VALS,SCF_BAX_MIN_VALS)
 
-    return SCF_ochax, SCF_obax, SCF_bax_min
+    if beta.ndim == 0:
+        return SCF_ochax.item(), SCF_obax.item(), SCF_bax_min.item(), in_range.item()
+    return SCF_ochax, SCF_obax, SCF_bax_min, in_range
 
 def SCF_chaxbaxchch_chs(gamma,tau,theta,SCF_ochax,SCF_obax,SCF_bax_min):
     """
@@ -202,4 +238,149 @@ def cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,sigma_chordM_op,sig
     sigma_chord = sum((sigma_chord1P, sigma_chord2P, sigma_chordM_ip, sigma_chordM_op))
     sigma_brace = sum((sigma_brace_1P,sigma_braceM_op))
     return sigma_chord, sigma_brace
-cum_stresses_hc = handcalc(override="long")(cum_stresses)
\ No newline at end of file
+cum_stresses_hc = handcalc(override="long")(cum_stresses)
+
+def _value(x):
+    """SI value of a forallpeople quantity, or x itself for plain numbers"""
+    return (x.value if isinstance(x,u.Physical) else x)
+
+@tracing.traced("scalar joint_check")
+def joint_check(chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op,MF_chord=None,MF_brace=None):
+    """
+    Run the calculation chain of main.main without any Streamlit output.
+    Works on plain SI floats (m, N, Nm, Pa), which is the fast path, or on
+    forallpeople quantities, which is what the handcalcs rendering uses.
+    MF_chord, MF_brace: optional manual magnification factors, T2.1/2.2 defaults otherwise
+
+    Returns a dict of the intermediate and final values keyed by variable name
+    """
+    b0,h0,t0,A_chord,Ix_chord,Iy_chord = chord_props
+    b1,h1,t1,A_brace,Ix_brace,Iy_brace = brace_props
+    Ov, theta, g_prime = overlap(L_chord,chordspacing,div_chord,e,h0,h1,t0)
+    beta, twogamma, tau = dim_params(b0,t0,b1,t1,chord_type)
+    success, message, gap = check_angle_ecc_gap(chord_type,theta,_value(e),_value(h0),Ov,g_prime,tau)
+    tau_min,tau_max,beta_min,beta_max,twogamma_min,twogamma_max = dim_limits(chord_type)
+    dim_success = (beta_min <= beta <= beta_max
+        and twogamma_min <= twogamma <= twogamma_max and tau_min <= tau <= tau_max)
+    MF_chord = (MF(chord_type,gap,"chord") if MF_chord is None else MF_chord)
+    MF_brace = (MF(chord_type,gap,"brace") if MF_brace is None else MF_brace)
+
+    SCF_ochax = SCF_obax = SCF_bax_min = None
+    if chord_type=="CHS":
+        SCF_ochax, SCF_obax, SCF_bax_min, SCF_in_range = SCFochax_func(beta,theta)
+        SCF_chax,SCF_bax,SCF_chch = SCF_chaxbaxchch_chs(twogamma/2,tau,theta,SCF_ochax,SCF_obax,SCF_bax_min)
+    elif gap:
+        SCF_chax,SCF_bax,SCF_chch = SCF_gap_rhs(beta,twogamma,tau,g_prime,theta)
+        SCF_in_range = True
+    else:
+        SCF_chax,SCF_bax,SCF_chch = SCF_overlap_rhs(beta,twogamma,tau,Ov,theta)
+        SCF_in_range = True
+
+    sigma_chord1P, sigma_chord2P = chord_ax_stresses(SCF_chax,SCF_chch,P_brace,P_chord,
+                                                    theta,A_chord,A_brace,MF_chord,MF_brace)
+    sigma_chordM_ip, sigma_chordM_op = chord_BM_stresses(h0,b0,b1,SCF_chch,SCF_ch_op,
+                                                    M_ip_chord,M_op_chord,Ix_chord,Iy_chord)
+    sigma_brace_1P, sigma_braceM_op = brace_stresses(b1,SCF_bax,P_brace,A_brace,
+                                                    SCF_br_op,M_op_brace,Iy_brace,MF_brace)
+    sigma_chord, sigma_brace = cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
+                                                    sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
+    success_stress = sigma_chord <= sigma_max and sigma_brace <= sigma_max
+    return {'Ov':Ov, 'theta':theta, 'g_prime':g_prime,
+            'beta':beta, 'twogamma':twogamma, 'tau':tau,
+            'success':success, 'message':message, 'gap':gap, 'dim_success':dim_success,
+            'MF_chord':MF_chord, 'MF_brace':MF_brace,
+            'SCF_ochax':SCF_ochax, 'SCF_obax':SCF_obax, 'SCF_bax_min':SCF_bax_min,
+            'SCF_chax':SCF_chax, 'SCF_bax':SCF_bax, 'SCF_chch':SCF_chch, 'SCF_in_range':SCF_in_range,
+            'sigma_chord1P':sigma_chord1P, 'sigma_chord2P':sigma_chord2P,
+            'sigma_chordM_ip':sigma_chordM_ip, 'sigma_chordM_op':sigma_chordM_op,
+            'sigma_brace_1P':sigma_brace_1P, 'sigma_braceM_op':sigma_braceM_op,
+            'sigma_chord':sigma_chord, 'sigma_brace':sigma_brace,
+            'success_stress':success_stress}
+
+#SI unit of each dimensioned input to joint_check, and of the stress outputs
+SECTION_UNITS = (u.m, u.m, u.m, u.m**2, u.m**4, u.m**4)
+INPUT_UNITS = {'e':u.m, 'chordspacing':u.m, 'L_chord':u.m,
+               'P_chord':u.N, 'P_brace':u.N,
+               'M_ip_chord':u.N*u.m, 'M_op_chord':u.N*u.m, 'M_op_brace':u.N*u.m,
+               'sigma_max':u.Pa}
+STRESS_KEYS = ('sigma_chord1P','sigma_chord2P','sigma_chordM_ip','sigma_chordM_op',
+               'sigma_brace_1P','sigma_braceM_op','sigma_chord','sigma_brace')
+
+def to_si(value,unit,name):
+    """Check a forallpeople quantity has the dimensions of unit and return its SI value as a float"""
+    if not isinstance(value,u.Physical):
+        raise TypeError(f"{name} must be a forallpeople quantity in {unit.dimensions}, got {value!r}")
+    if value.dimensions != unit.dimensions:
+        raise ValueError(f"{name} has dimensions {value.dimensions}, expected {unit.dimensions}")
+    return float(value.value)
+
+def joint_check_units(chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op):
+    """
+    Unit checked entry point to joint_check.
+    Inputs are forallpeople quantities (sections as (b,h,t,A,Ix,Iy) tuples of quantities),
+    validated and converted to SI floats once, run through the plain float path,
+    and the stresses returned as quantities in Pa.
+    """
+    chord_props = tuple(to_si(val,unit,'chord_props') for val,unit in zip(chord_props,SECTION_UNITS))
+    brace_props = tuple(to_si(val,unit,'brace_props') for val,unit in zip(brace_props,SECTION_UNITS))
+    inputs = {name:to_si(val,INPUT_UNITS[name],name) for name,val in
+                (('e',e),('chordspacing',chordspacing),('L_chord',L_chord),
+                ('P_chord',P_chord),('P_brace',P_brace),
+                ('M_ip_chord',M_ip_chord),('M_op_chord',M_op_chord),('M_op_brace',M_op_brace),
+                ('sigma_max',sigma_max))}
+    res = joint_check(chord_type,chord_props,brace_props,
+                    div_chord=div_chord,SCF_ch_op=SCF_ch_op,SCF_br_op=SCF_br_op,**inputs)
+    for key in STRESS_KEYS:
+        res[key] = res[key] * u.Pa
+    return res
+
+#LaTeX of each calculation step for the single joint page. The numbers come from joint_check,
+#these only render the working, and are memoised on the input values so a rerun
+#with unchanged inputs for a section does not run handcalcs again.
+#Inputs are in the sidebar units: m, m^2, m^4, kN and kNm
+@lru_cache(maxsize=256)
+@tracing.traced("LaTeX rendering")
+def overlap_latex(L_chord,chordspacing,div_chord,e,h0,h1,t0):
+    latex, _ = overlap_hc(L_chord*u.m,chordspacing*u.m,div_chord,e*u.m,h0*u.m,h1*u.m,t0*u.m)
+    return latex
+
+@lru_cache(maxsize=256)
+@tracing.traced("LaTeX rendering")
+def dim_params_latex(b0,t0,b1,t1,chord_type):
+    latex, _ = dim_params_hc(b0=b0*u.m,t0=t0*u.m,b1=b1*u.m,t1=t1*u.m,chord_type=chord_type)
+    return latex
+
+@lru_cache(maxsize=256)
+@tracing.traced("LaTeX rendering")
+def SCF_latex(chord_type,gap,beta,twogamma,tau,Ov,g_prime,theta,SCF_ochax=None,SCF_obax=None,SCF_bax_min=None):
+    if chord_type=="CHS":
+        latex, _ = SCF_chaxbaxchch_chs_hc(twogamma/2,tau,theta,SCF_ochax,SCF_obax,SCF_bax_min)
+    elif gap:
+        latex, _ = SCF_gap_rhs_hc(beta,twogamma,tau,g_prime,theta)
+    else:
+        latex, _ = SCF_overlap_rhs_hc(beta,twogamma,tau,Ov,theta)
+    return latex
+
+@lru_cache(maxsize=256)
+@tracing.traced("LaTeX rendering")
+def stresses_latex(chord_props,brace_props,SCF_chax,SCF_bax,SCF_chch,theta,MF_chord,MF_brace,
+                   P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op):
+    """LaTeX of the chord axial, chord bending, brace and total stresses"""
+    b0,h0,t0,A_chord,Ix_chord,Iy_chord = chord_props
+    b1,h1,t1,A_brace,Ix_brace,Iy_brace = brace_props
+    chord_ax_latex, (sigma_chord1P, sigma_chord2P) = chord_ax_stresses_hc(SCF_chax,SCF_chch,P_brace*u.kN,P_chord*u.kN,
+                                                        theta,A_chord*u.m**2,A_brace*u.m**2,MF_chord,MF_brace)
+    chord_BM_latex, (sigma_chordM_ip, sigma_chordM_op) = chord_BM_stresses_hc(h0*u.m,b0*u.m,b1*u.m,SCF_chch,SCF_ch_op,
+                                                        M_ip_chord*u.kN*u.m,M_op_chord*u.kN*u.m,
+                                                        Ix_chord*u.m**4,Iy_chord*u.m**4)
+    brace_latex, (sigma_brace_1P, sigma_braceM_op) = brace_stresses_hc(b1*u.m,SCF_bax,P_brace*u.kN,A_brace*u.m**2,SCF_br_op,
+                                                        M_op_brace*u.kN*u.m,Iy_brace*u.m**4,MF_brace)
+    cum_latex, _ = cum_stresses_hc(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
+                                    sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
+    return chord_ax_latex, chord_BM_latex, brace_latex, cum_latex
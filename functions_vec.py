@@ -0,0 +1,272 @@
+import numpy as np
+
+import functions as fnc
+import tracing
+
+#Structured array layout for a list of hollow sections, all values in SI units (m, m^2, m^4)
+#Field order matches the (b,h,t,area,I_x,I_y) tuples built by validation.hs_populate
+SECTION_DTYPE = np.dtype([('b','f8'),('h','f8'),('t','f8'),('A','f8'),('Ix','f8'),('Iy','f8')])
+
+#Bit flags for the individual failures of check_angle_ecc_gap
+ANGLE_FAIL = 1
+ECC_FAIL = 2
+GAP_FAIL = 4
+OVERLAP_FAIL = 8
+CHS_OVERLAP_FAIL = 16
+
+def section_array(props):
+    """Pack section properties into a structured array of SECTION_DTYPE.
+    props is either a list of (b,h,t,area,I_x,I_y) tuples
+    or the tuple of columns returned by validation.hs_populate"""
+    if len(props) == 6 and np.ndim(props[0]) == 1:
+        columns = [np.asarray(col,dtype=float) for col in props]
+    else:
+        columns = list(np.asarray(props,dtype=float).reshape(-1,6).T)
+    arr = np.empty(len(columns[0]),dtype=SECTION_DTYPE)
+    for name, col in zip(SECTION_DTYPE.names,columns):
+        arr[name] = col
+    return arr
+
+def dim_params(b0,t0,b1,t1):
+    """Array version of functions.dim_params"""
+    beta = b1 / b0
+    twogamma = b0 / t0
+    tau = t1 / t0
+    return beta, twogamma, tau
+
+def dim_success(chord_type,beta,twogamma,tau):
+    """Mask of joints with beta, 2*gamma and tau inside functions.dim_limits"""
+    tau_min,tau_max,beta_min,beta_max,twogamma_min,twogamma_max = fnc.dim_limits(chord_type)
+    return ((beta_min <= beta) & (beta <= beta_max)
+            & (twogamma_min <= twogamma) & (twogamma <= twogamma_max)
+            & (tau_min <= tau) & (tau <= tau_max))
+
+def overlap(L_chord,chordspacing,div_chord,eccentricity,h0,h1,t0,theta_error=0.0):
+    """Array version of functions.overlap. theta_error (rad) is added to the brace angle of the truss geometry"""
+    h_truss = chordspacing + 2 * eccentricity
+    l_truss = L_chord / div_chord
+    theta = np.arctan(h_truss / l_truss) + theta_error
+    p = h1 / np.sin(theta)
+    x = (0.5*h0 + eccentricity) / np.tan(theta)
+    q = p - 2 * x
+    g_prime = -1 * q/t0
+    Ov = q / p
+    return Ov, theta, g_prime
+
+def check_angle_ecc_gap(chord_type,theta,e,h0,Ov,g_prime,tau):
+    """
+    Array version of functions.check_angle_ecc_gap.
+    The if/elif chain of the scalar function is replaced by masks.
+
+    Returns:
+    success: bool array - Whether or not all checks pass
+    fail_code: int array - Bitwise OR of the *_FAIL flags for each failed check
+    gap: bool array - Whether joint is gap or not
+    """
+    theta, e, h0, Ov, g_prime, tau = np.broadcast_arrays(theta,e,h0,Ov,g_prime,tau)
+    fail_code = np.zeros(theta.shape,dtype=np.int64)
+    fail_code[~((30*np.pi/180 < theta) & (theta < 60*np.pi/180))] |= ANGLE_FAIL
+    fail_code[~((-0.55 <= e/h0) & (e/h0 <= 0.25))] |= ECC_FAIL
+
+    rhs = chord_type != "CHS"
+    small_gap = (0 <= g_prime) & (g_prime < 2 * tau) & rhs
+    is_gap = ~small_gap & (Ov <= 0)
+    bad_overlap = ~small_gap & ~is_gap & ((Ov < 0.5) | (Ov > 1.0)) & rhs
+    good_overlap = ~small_gap & ~is_gap & ~bad_overlap & (0.0 < Ov) & (Ov <= 1.0) & rhs
+    chs_overlap = ~small_gap & ~is_gap & ~bad_overlap & ~good_overlap
+    fail_code[small_gap] |= GAP_FAIL
+    fail_code[bad_overlap] |= OVERLAP_FAIL
+    fail_code[chs_overlap] |= CHS_OVERLAP_FAIL
+
+    gap = small_gap | is_gap
+    success = fail_code == 0
+    return success, fail_code, gap
+
+def check_message(fail_code,gap,h0):
+    """Rebuild the functions.check_angle_ecc_gap message for a single joint.
+    h0 is the chord height, used to report the eccentricity range in mm"""
+    message = ("Angle NOT OK. Maintain 30 to 60deg" if fail_code & ANGLE_FAIL else "Angle OK")
+    if fail_code & ECC_FAIL:
+        message += " | Eccentricity NOT OK. Maintain {0:.0f}mm<=e/h0<={1:.0f}mm".format(-h0*0.55*1000,h0*0.25*1000)
+    else:
+        message += " | Eccentricity OK"
+    if fail_code & GAP_FAIL:
+        message += " | Gap NOT OK. Increase so g'>= 2 * tau"
+    elif fail_code & OVERLAP_FAIL:
+        message += " | Overlap NOT OK. Change to 50% to 100%"
+    elif fail_code & CHS_OVERLAP_FAIL:
+        message += " | Overlap NOT OK for CHS. Make gap joint"
+    elif not gap:
+        message += " | Overlap OK"
+    return message
+
+def MF(chord_type,gap):
+    """Magnification factors for chord and brace, see functions.MF"""
+    MF_chord = np.full(np.shape(gap),1.5)
+    if chord_type == "CHS":
+        MF_brace = np.full(np.shape(gap),1.3)
+    else:
+        MF_brace = np.where(gap,1.5,1.3)
+    return MF_chord, MF_brace
+
+def SCF_overlap_rhs(beta,twogamma,tau,Ov,theta):
+    """Array version of functions.SCF_overlap_rhs"""
+    sin_theta = np.sin(theta)
+    chax_pt1 = 0.5+ 2.38 * beta - 2.87 * beta**2 + 2.18 * beta * Ov + 0.39 * Ov - 1.43 * sin_theta
+    chax_pt2 = twogamma**0.29 * tau**0.7 * Ov**(0.73-5.53*sin_theta**2) * sin_theta**(-0.4-0.08*Ov)
+    bax_pt1 = 0.15 + 1.1 * beta - 0.48 * beta**2 - 0.14 / Ov
+    bax_pt2 = twogamma**0.55 * tau**(-0.3) * Ov**(-2.57 + 1.62 * beta**2) * sin_theta**0.31
+    SCF_chax = np.maximum(chax_pt1 * chax_pt2,2.0)
+    SCF_bax = np.maximum(bax_pt1 * bax_pt2,2.0)
+    SCF_chch = np.maximum(1.2 + 1.46 * beta - 0.028 * beta**2,2.0)
+    return SCF_chax, SCF_bax, SCF_chch
+
+def SCF_gap_rhs(beta,twogamma,tau,g_prime,theta):
+    """Array version of functions.SCF_gap_rhs"""
+    sin_theta = np.sin(theta)
+    chax_pt1 = 0.48 * beta - 0.5 * beta**2 - 0.012 / beta + 0.012 / g_prime
+    chax_pt2 =  twogamma**1.72 * tau**0.78 * g_prime**0.2 * sin_theta**2.09
+    bax_pt1 = -0.008 + 0.45 * beta - 0.34 * beta**2
+    bax_pt2 = twogamma**1.36 * tau**(-0.66) * sin_theta**1.29
+    SCF_chax = np.maximum(chax_pt1 * chax_pt2,2.0)
+    SCF_bax = np.maximum(bax_pt1 * bax_pt2,2.0)
+    SCF_chch = np.maximum((2.45 + 1.23 * beta) * g_prime**-0.27,2.0)
+    return SCF_chax, SCF_bax, SCF_chch
+
+def SCF_chaxbaxchch_chs(gamma,tau,theta,SCF_ochax,SCF_obax,SCF_bax_min):
+    """Array version of functions.SCF_chaxbaxchch_chs"""
+    SCF_chax = np.maximum(2,(gamma/12)**0.4 * (tau/0.5)**1.1 * SCF_ochax)
+    SCF_bax = np.maximum(SCF_bax_min,np.sqrt(gamma/12) * np.sqrt(tau/0.5) * SCF_obax)
+    SCF_chch = np.maximum(2,1.2*(tau/0.5)**0.3 * np.sin(theta)**-0.9)
+    return SCF_chax,SCF_bax,SCF_chch
+
+def chord_ax_stresses(SCF_chax,SCF_chch,P_brace,P_chord,theta,A_chord,A_brace,MF_chord,MF_brace):
+    """Array version of functions.chord_ax_stresses"""
+    sigma_chord1P = SCF_chax * MF_brace * P_brace / A_brace
+    sigma_chord2P = SCF_chch * MF_chord * (P_chord - P_brace * np.cos(theta))/ A_chord
+    return sigma_chord1P, sigma_chord2P
+
+def chord_BM_stresses(h0,b0,b1,SCF_chch,SCF_ch_op,M_ip_chord,M_op_chord,Ix_chord,Iy_chord):
+    """Array version of functions.chord_BM_stresses"""
+    y_ip_chord = h0/2
+    y_op_chord = b1/2
+    sigma_chordM_ip = SCF_chch * (M_ip_chord * y_ip_chord) / Ix_chord
+    sigma_chordM_op = SCF_ch_op * (M_op_chord * y_op_chord) / Iy_chord
+    return sigma_chordM_ip, sigma_chordM_op
+
+def brace_stresses(b1,SCF_bax,P_brace,A_brace,SCF_br_op,M_op_brace,Iy_brace,MF_brace):
+    """Array version of functions.brace_stresses"""
+    sigma_brace_1P = SCF_bax * MF_brace * P_brace / A_brace
+    z_op_brace = b1 / 2
+    sigma_braceM_op = SCF_br_op * M_op_brace * z_op_brace / Iy_brace
+    return sigma_brace_1P, sigma_braceM_op
+
+def cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,sigma_chordM_op,sigma_brace_1P,sigma_braceM_op):
+    """Array version of functions.cum_stresses"""
+    sigma_chord = sigma_chord1P + sigma_chord2P + sigma_chordM_ip + sigma_chordM_op
+    sigma_brace = sigma_brace_1P + sigma_braceM_op
+    return sigma_chord, sigma_brace
+
+def all_pairs(chord,brace):
+    """Index arrays of every chord/brace pair where the brace is no wider than the chord,
+    in the same chord-major order as the nested loop in main.py"""
+    ch_ind, br_ind = np.nonzero(brace['b'][None,:] <= chord['b'][:,None])
+    return ch_ind, br_ind
+
+#Stages of joint_check. Each takes the paired section arrays ch and brace br
+#(chord[ch_ind], brace[br_ind]) and/or the outputs of earlier stages, and returns a dict,
+#so stages.py can recompute only the ones whose inputs changed
+@tracing.traced("overlap")
+def overlap_stage(ch,br,e,chordspacing,L_chord,div_chord,theta_error=0.0):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        Ov, theta, g_prime = overlap(L_chord,chordspacing,div_chord,e,ch['h'],br['h'],ch['t'],theta_error)
+    return {'Ov':Ov, 'theta':theta, 'g_prime':g_prime}
+
+@tracing.traced("dimensional parameters")
+def dim_params_stage(chord_type,ch,br):
+    beta, twogamma, tau = dim_params(ch['b'],ch['t'],br['b'],br['t'])
+    return {'beta':beta, 'twogamma':twogamma, 'tau':tau,
+            'dim_success':dim_success(chord_type,beta,twogamma,tau)}
+
+@tracing.traced("geometry checks")
+def checks_stage(chord_type,ch,e,Ov,theta,g_prime,tau):
+    """Angle, eccentricity and gap checks, and the magnification factors that follow from gap"""
+    with np.errstate(divide='ignore',invalid='ignore'):
+        success, fail_code, gap = check_angle_ecc_gap(chord_type,theta,e,ch['h'],Ov,g_prime,tau)
+    MF_chord, MF_brace = MF(chord_type,gap)
+    return {'success':success, 'fail_code':fail_code, 'gap':gap, 'MF_chord':MF_chord, 'MF_brace':MF_brace}
+
+@tracing.traced("SCF")
+def SCF_stage(chord_type,beta,twogamma,tau,Ov,g_prime,theta,gap):
+    """SCFs of each joint, each formula only evaluated on the joints it applies to"""
+    SCF_chax = np.full(gap.shape,np.nan)
+    SCF_bax = np.full(gap.shape,np.nan)
+    SCF_chch = np.full(gap.shape,np.nan)
+    SCF_ochax = SCF_obax = SCF_bax_min = None
+    theta_b = np.broadcast_to(theta,gap.shape)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        if chord_type == "CHS":
+            SCF_ochax, SCF_obax, SCF_bax_min, SCF_in_range = fnc.SCFochax_func(beta,theta_b)
+            SCF_chax, SCF_bax, SCF_chch = SCF_chaxbaxchch_chs(twogamma/2,tau,theta_b,
+                                            SCF_ochax,SCF_obax,SCF_bax_min)
+        else:
+            SCF_in_range = np.ones(gap.shape,dtype=bool)
+            g_prime_b = np.broadcast_to(g_prime,gap.shape)
+            Ov_b = np.broadcast_to(Ov,gap.shape)
+            m = gap
+            (SCF_chax[m], SCF_bax[m], SCF_chch[m]) = SCF_gap_rhs(beta[m],twogamma[m],tau[m],
+                                                                g_prime_b[m],theta_b[m])
+            m = ~gap
+            (SCF_chax[m], SCF_bax[m], SCF_chch[m]) = SCF_overlap_rhs(beta[m],twogamma[m],tau[m],
+                                                                    Ov_b[m],theta_b[m])
+    return {'SCF_ochax':SCF_ochax, 'SCF_obax':SCF_obax, 'SCF_bax_min':SCF_bax_min,
+            'SCF_chax':SCF_chax, 'SCF_bax':SCF_bax, 'SCF_chch':SCF_chch, 'SCF_in_range':SCF_in_range}
+
+@tracing.traced("stresses")
+def stresses_stage(ch,br,theta,MF_chord,MF_brace,SCF_chax,SCF_bax,SCF_chch,
+                   P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        sigma_chord1P, sigma_chord2P = chord_ax_stresses(SCF_chax,SCF_chch,P_brace,P_chord,
+                                                        theta,ch['A'],br['A'],MF_chord,MF_brace)
+        sigma_chordM_ip, sigma_chordM_op = chord_BM_stresses(ch['h'],ch['b'],br['b'],SCF_chch,SCF_ch_op,
+                                                        M_ip_chord,M_op_chord,ch['Ix'],ch['Iy'])
+        sigma_brace_1P, sigma_braceM_op = brace_stresses(br['b'],SCF_bax,P_brace,br['A'],
+                                                        SCF_br_op,M_op_brace,br['Iy'],MF_brace)
+        sigma_chord, sigma_brace = cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
+                                                        sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
+    return {'sigma_chord1P':sigma_chord1P, 'sigma_chord2P':sigma_chord2P,
+            'sigma_chordM_ip':sigma_chordM_ip, 'sigma_chordM_op':sigma_chordM_op,
+            'sigma_brace_1P':sigma_brace_1P, 'sigma_braceM_op':sigma_braceM_op,
+            'sigma_chord':sigma_chord, 'sigma_brace':sigma_brace}
+
+def stress_check_stage(sigma_chord,sigma_brace,sigma_max):
+    return {'success_stress':(sigma_chord <= sigma_max) & (sigma_brace <= sigma_max)}
+
+def joint_check(chord_type,chord,brace,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op,pairs=None):
+    """
+    Run the full joint check of main.main for many chord/brace pairs in one pass.
+    chord, brace: structured arrays of SECTION_DTYPE
+    pairs: (chord index, brace index) arrays, defaults to all_pairs(chord,brace)
+    All inputs are SI (m, N, Nm, Pa). Geometry and forces may be scalars or arrays
+    broadcastable against the pairs.
+
+    Returns a dict of arrays, one entry per pair, with the same names as the
+    intermediate variables of main.main. Stresses are in Pa.
+    """
+    ch_ind, br_ind = (all_pairs(chord,brace) if pairs is None else pairs)
+    ch = chord[ch_ind]
+    br = brace[br_ind]
+    res = {'chord':ch_ind, 'brace':br_ind}
+    res.update(overlap_stage(ch,br,e,chordspacing,L_chord,div_chord))
+    res.update(dim_params_stage(chord_type,ch,br))
+    res.update(checks_stage(chord_type,ch,e,res['Ov'],res['theta'],res['g_prime'],res['tau']))
+    res.update(SCF_stage(chord_type,res['beta'],res['twogamma'],res['tau'],
+                        res['Ov'],res['g_prime'],res['theta'],res['gap']))
+    res.update(stresses_stage(ch,br,res['theta'],res['MF_chord'],res['MF_brace'],
+                        res['SCF_chax'],res['SCF_bax'],res['SCF_chch'],
+                        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op))
+    res.update(stress_check_stage(res['sigma_chord'],res['sigma_brace'],sigma_max))
+    return res
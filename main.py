@@ -3,18 +3,24 @@ import streamlit as st
 
 #Import associated py files with functions
 import functions as fnc
+import stages
+import optimise
+import truss
+import parametric
+import pareto
+import reliability
+import results_store
+import synthetic
+import sweep
+import sweep_cache
+import tracing
 import validation as vld
 import plots
 
 #Import data and plotting
 import pandas as pd
-from matplotlib import pyplot as plt
 import numpy as np
 
-#Import unit aware modules
-import forallpeople as u
-u.environment('structural')
-
 import math
 import time
 
@@ -49,14 +55,10 @@ def inputs(srun: bool):
         else:
             #display input dialogue and populate from csv
             reverse_axes_chord, hs_chosen_chord = vld.hs_lookup(chord_type,"chord",chord_table)
-            chord_props = vld.hs_populate(reverse_axes_chord, hs_chosen_chord,srun)
+            chord_props = vld.hs_populate(reverse_axes_chord, chord_table, hs_chosen_chord)
     else:
-        #Generate list of properties for chord to be used in scatter plot
-        reverse_axes_chord = False
-        chord_df = vld.hs_populate(reverse_axes_chord, chord_table,srun)
-        chord_props = []
-        for b,h,t,area,I_x,I_y in zip(chord_df[0],chord_df[1],chord_df[2],chord_df[3],chord_df[4],chord_df[5]):
-            chord_props.append((b,h,t,area,I_x,I_y))
+        #Structured array of properties for every chord, to be used in scatter plot
+        chord_props = vld.hs_populate(False, chord_table)
     
     #Brace Data Loading
     brace_type = ("CHS" if chord_type == "CHS" else st.sidebar.radio("Choose Type of Brace:",("SHS","RHS")))
@@ -72,14 +74,10 @@ def inputs(srun: bool):
         else:
             #display input dialogue and populate from csv
             reverse_axes_brace, hs_chosen_brace = vld.hs_lookup(brace_type,"brace",brace_table)
-            brace_props = vld.hs_populate(reverse_axes_brace, hs_chosen_brace, srun)
+            brace_props = vld.hs_populate(reverse_axes_brace, brace_table, hs_chosen_brace)
     else:
-        #Generate list of properties for chord to be used in scatter plot
-        reverse_axes_brace = False
-        brace_df = vld.hs_populate(reverse_axes_brace, brace_table,srun)
-        brace_props = []
-        for b,h,t,area,I_x,I_y in zip(brace_df[0],brace_df[1],brace_df[2],brace_df[3],brace_df[4],brace_df[5]):
-            brace_props.append((b,h,t,area,I_x,I_y))
+        #Structured array of properties for every brace, to be used in scatter plot
+        brace_props = vld.hs_populate(False, brace_table)
 
     #Create Truss geometry input in streamlit sidebar
     st.sidebar.markdown('## Truss Geometry:')
@@ -107,152 +105,120 @@ def inputs(srun: bool):
     return (chord_type,chord_props,brace_props,
             e,chordspacing,L_chord,div_chord,
             P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
-            sigma_max,SCF_ch_op,SCF_br_op)
+            sigma_max,SCF_ch_op,SCF_br_op,code,brace_type)
 
 def main(srun: bool,chord_type,chord_props,brace_props,
                     e,chordspacing,L_chord,div_chord,
                     P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
                     sigma_max,SCF_ch_op,SCF_br_op):
-    #Unpack section properties
+    if not srun:
+        #Fast path: plain SI floats through the calculation core, no units or Streamlit output
+        res = fnc.joint_check(chord_type,chord_props,brace_props,
+                        e,chordspacing,L_chord,div_chord,
+                        P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                        sigma_max*1e6,SCF_ch_op,SCF_br_op)
+        return res['sigma_chord'], res['sigma_brace']
+
+    #Numbers come from the plain SI float path. The handcalcs working is only rendered
+    #for the sections the user opens, and is memoised on its inputs in functions.py
     b0,h0,t0,A_chord,Ix_chord,Iy_chord = chord_props
     b1,h1,t1,A_brace,Ix_brace,Iy_brace = brace_props
-
-    #Calculate overlap and Plot geometry and check eccentricity and angle
-    #Calculate Dimensional parameters beta, gamma, tau, and check angle, eccentricity, if gap
-    if srun: overlap_latex, (Ov,theta,g_prime) = fnc.overlap_hc(L_chord*u.m,chordspacing*u.m,div_chord,e*u.m,h0*u.m,h1*u.m,t0*u.m)
-    else:                      (Ov,theta,g_prime) = fnc.overlap(L_chord*u.m,chordspacing*u.m,div_chord,e*u.m,h0*u.m,h1*u.m,t0*u.m)
-    if srun: dim_params_latex, (beta, twogamma, tau) = fnc.dim_params_hc(b0=b0*u.m,t0=t0*u.m,b1=b1*u.m,t1=t1*u.m,chord_type=chord_type)
-    else:                         (beta, twogamma, tau) = fnc.dim_params(b0=b0*u.m,t0=t0*u.m,b1=b1*u.m,t1=t1*u.m,chord_type=chord_type)
-    success, message, gap = fnc.check_angle_ecc_gap(chord_type,theta,e,h0,Ov,g_prime,tau)
+    si_inputs = (chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                sigma_max*1e6,SCF_ch_op,SCF_br_op)
+    #Stages whose inputs are unchanged since the last rerun are taken from their memo
+    joint_graph = stages.graph('single')
+    res = stages.single_joint(joint_graph,*si_inputs)
+    #Write Magnification factors to sidebar, and override button to be added in
+    if st.sidebar.checkbox("Click for manual Magnification factor input (T2.1/2.2 defaults used otherwise):"):
+        MF_chord = st.sidebar.number_input("Chord Input:[+-0.05]",1.0,2.0,1.5,0.05)
+        MF_brace = st.sidebar.number_input("Brace Input:[+-0.05]",1.0,2.0,1.3,0.05)
+        res = stages.single_joint(joint_graph,*si_inputs,MF_chord=MF_chord,MF_brace=MF_brace)
+    else:
+        st.sidebar.markdown(f'MF_chord = {res["MF_chord"]}')
+        st.sidebar.markdown(f'MF_brace = {res["MF_brace"]}')
+    Ov, theta, g_prime = res['Ov'], res['theta'], res['g_prime']
+    beta, twogamma, tau = res['beta'], res['twogamma'], res['tau']
     tau_min,tau_max,beta_min,beta_max,twogamma_min,twogamma_max = fnc.dim_limits(chord_type)
-    dim_success = (True if (beta_min <= beta <= beta_max 
-        and twogamma_min <= twogamma <= twogamma_max and tau_min <= tau <= tau_max) else False)
-    MF_chord = fnc.MF(chord_type,gap,"chord")
-    MF_brace = fnc.MF(chord_type,gap,"brace")
-    #Single run outputs
-    if srun:
-        #Write Magnification factors to sidebar, and override button to be added in
-        if st.sidebar.checkbox("Click for manual Magnification factor input (T2.1/2.2 defaults used otherwise):"):
-            MF_chord = st.sidebar.number_input("Chord Input:[+-0.05]",1.0,2.0,1.5,0.05)
-            MF_brace = st.sidebar.number_input("Brace Input:[+-0.05]",1.0,2.0,1.3,0.05)
-        else:
-            st.sidebar.markdown(f'MF_chord = {MF_chord}')
-            st.sidebar.markdown(f'MF_brace = {MF_brace}')
-        #Create a container at the top of the page for plotting graphs
-        st.header("Results Summary")
-        geom_container = st.beta_container()
-        res_col1, res_col2, res_col3 = st.beta_columns(3)
-        results_container = st.beta_container()
-        #Expander showing how calculations done
-        st.write('## Calculate overlap')
+    #Create a container at the top of the page for plotting graphs
+    st.header("Results Summary")
+    geom_container = st.beta_container()
+    res_col1, res_col2, res_col3 = st.beta_columns(3)
+    results_container = st.beta_container()
+    #Overlap and geometry plots
+    c_geo = plots.geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type)
+    geom_container.altair_chart(c_geo)
+    st.write('## Calculate overlap')
+    if st.checkbox("Show working",key="overlap_working"):
         vld.overlap_sketch()
-        #Overlap and geometry plots
-        st.latex(overlap_latex)
-        c_geo = plots.geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type)
-        geom_container.altair_chart(c_geo)
-        #Render equations and helper drawing
-        st.write('## Dimensional Parameters')
+        st.latex(fnc.overlap_latex(L_chord,chordspacing,div_chord,e,h0,h1,t0))
+    st.write('## Dimensional Parameters')
+    if st.checkbox("Show working",key="dim_params_working"):
         vld.geometry_sketch()
-        st.latex(dim_params_latex)
-        #Output or stop script for angle, eccentricity, gap checks
-        if success:
-            geom_container.success(message)
-        else:
-            geom_container.error(message)
-            end = time.time()
-            runtime.write(f'Runtime: {end-start:.2f}s')
-            st.stop()
+        st.latex(fnc.dim_params_latex(b0,t0,b1,t1,chord_type))
+    #Output or stop script for angle, eccentricity, gap checks
+    if res['success']:
+        geom_container.success(res['message'])
+    else:
+        geom_container.error(res['message'])
+        report()
+        st.stop()
 
-        #Plot dimensional parameters using Altair
-        beta_plot = plots.dim_params_altair('b0',b0*1000,'b1',b1*1000,'β',
-                                    beta_min,beta_max,500)
-        twogamma_plot = plots.dim_params_altair('t0',t0*1000,'b0',b0*1000,'2γ',
-                                    twogamma_min,twogamma_max,20)
-        tau_plot = plots.dim_params_altair('t0',t0*1000,'t1',t1*1000,'τ',
-                                    tau_min,tau_max,20)
-        res_col1.altair_chart(beta_plot, use_container_width=True)
-        res_col2.altair_chart(twogamma_plot, use_container_width=True)
-        res_col3.altair_chart(tau_plot, use_container_width=True)
+    #Plot dimensional parameters using Altair
+    beta_plot = plots.dim_params_altair('b0',b0*1000,'b1',b1*1000,'β',
+                                beta_min,beta_max,500)
+    twogamma_plot = plots.dim_params_altair('t0',t0*1000,'b0',b0*1000,'2γ',
+                                twogamma_min,twogamma_max,20)
+    tau_plot = plots.dim_params_altair('t0',t0*1000,'t1',t1*1000,'τ',
+                                tau_min,tau_max,20)
+    res_col1.altair_chart(beta_plot, use_container_width=True)
+    res_col2.altair_chart(twogamma_plot, use_container_width=True)
+    res_col3.altair_chart(tau_plot, use_container_width=True)
         
-        #Output or stop script whether dimension parameters are exceeded
-        if dim_success:
-            results_container.success("PASS - Dimensions are within allowable limits")
-        else:
-            results_container.error("FAIL - Dimensional Parameters exceeded.")
-            end = time.time()
-            runtime.write(f'Runtime: {end-start:.2f}s')
-            st.stop() 
-
-        #Calculate SCF values
-        st.markdown("""
-        ## SCF Calculations
-        The follow calculations determine the Stress Concentration Factors (SCF) for each:
-        - LC1 chord -> $SCF_{ch,ax}$
-        - LC1 brace -> $SCF_{b,ax}$
-        - LC2 chord -> $SCF_{ch,ch}$
-        """)
+    #Output or stop script whether dimension parameters are exceeded
+    if res['dim_success']:
+        results_container.success("PASS - Dimensions are within allowable limits")
+    else:
+        results_container.error("FAIL - Dimensional Parameters exceeded.")
+        report()
+        st.stop() 
 
-    #Calculate stress concentration factors
+    #Calculate SCF values
+    st.markdown("""
+    ## SCF Calculations
+    The follow calculations determine the Stress Concentration Factors (SCF) for each:
+    - LC1 chord -> $SCF_{ch,ax}$
+    - LC1 brace -> $SCF_{b,ax}$
+    - LC2 chord -> $SCF_{ch,ch}$
+    """)
     if chord_type=="CHS":
-        try:
-            SCF_ochax, SCF_obax, SCF_bax_min = fnc.SCFochax_func(beta,theta)
-        except:
-            SCF_ochax , SCF_obax, SCF_bax_min = 2, 2, 2
-        if srun: SCF_chaxbax_latex, (SCF_chax,SCF_bax,SCF_chch) = fnc.SCF_chaxbaxchch_chs_hc(twogamma/2,tau,theta,
-                                        SCF_ochax[0],SCF_obax[0],SCF_bax_min)
-        else:                          (SCF_chax,SCF_bax,SCF_chch) = fnc.SCF_chaxbaxchch_chs(twogamma/2,tau,theta,
-                                        SCF_ochax[0],SCF_obax[0],SCF_bax_min)
-        if srun:
-            fig_SCFo_chs, ax_SCFo_chs = plots.SCF_ochax_plot(beta,SCF_ochax,SCF_obax)
-            st.pyplot(fig_SCFo_chs)
-            st.latex(SCF_chaxbax_latex)
-    elif gap:
-        if srun: SCF_latex_rhs, (SCF_chax, SCF_bax, SCF_chch) = fnc.SCF_gap_rhs_hc(beta,twogamma,tau,g_prime,theta)
-        else:                       (SCF_chax, SCF_bax, SCF_chch) = fnc.SCF_gap_rhs(beta,twogamma,tau,g_prime,theta)
-        if srun:
-            st.header("GAP JOINT: $2 \cdot tau <= g^\prime$")
-            st.latex(SCF_latex_rhs)
+        if not res['SCF_in_range']:
+            st.warning("β or θ is outside the CIDECT Fig. range (0.3 <= β <= 0.6, 30 <= θ <= 60deg). "
+                        "SCF_ochax and SCF_obax are taken at the nearest edge of the curves.")
+    elif res['gap']:
+        st.header("GAP JOINT: $2 \cdot tau <= g^\prime$")
     else:
-        if srun: SCF_latex_rhs, (SCF_chax,SCF_bax,SCF_chch) = fnc.SCF_overlap_rhs_hc(beta,twogamma,tau,Ov,theta)
-        else:                    (SCF_chax,SCF_bax,SCF_chch) = fnc.SCF_overlap_rhs(beta,twogamma,tau,Ov,theta)
-        if srun:
-            st.header("OVERLAP JOINT: $0.5 <= O_v <= 1.0$:")
-            st.latex(SCF_latex_rhs)
-
-    #Calculate all stresses
-    if srun: chord_ax_stresses_latex, (sigma_chord1P, sigma_chord2P) = fnc.chord_ax_stresses_hc(SCF_chax, SCF_chch,P_brace * u.kN,P_chord * u.kN,
-                                                            theta, A_chord * u.m**2, A_brace * u.m**2,MF_chord,MF_brace)          
-    else:       (sigma_chord1P, sigma_chord2P) = fnc.chord_ax_stresses(SCF_chax, SCF_chch,P_brace * u.kN,P_chord * u.kN,
-                                                            theta, A_chord * u.m**2, A_brace * u.m**2,MF_chord,MF_brace)  
-    if srun:    chord_BM_stresses_latex, (sigma_chordM_ip, sigma_chordM_op) = fnc.chord_BM_stresses_hc(h0*u.m,b0*u.m,b1*u.m,SCF_chch,SCF_ch_op,
-                                            M_ip_chord * u.kN * u.m,M_op_chord * u.kN * u.m,
-                                            Ix_chord * u.m**4,Iy_chord * u.m**4)
-    else:                                 (sigma_chordM_ip, sigma_chordM_op) = fnc.chord_BM_stresses(h0*u.m,b0*u.m,b1*u.m,SCF_chch,SCF_ch_op,
-                                            M_ip_chord * u.kN * u.m,M_op_chord * u.kN * u.m,
-                                            Ix_chord * u.m**4,Iy_chord * u.m**4)
-    if srun: brace_stresses_latex, (sigma_brace_1P, sigma_braceM_op) = fnc.brace_stresses_hc(b1 * u.m, SCF_bax,
-                                                            P_brace * u.kN,A_brace * u.m**2,SCF_br_op,
-                                                            M_op_brace * u.kN * u.m,Iy_brace * u.m**4,MF_brace)
-    else:                           (sigma_brace_1P, sigma_braceM_op) = fnc.brace_stresses(b1 * u.m, SCF_bax,
-                                                            P_brace * u.kN,A_brace * u.m**2,SCF_br_op,
-                                                            M_op_brace * u.kN * u.m,Iy_brace * u.m**4,MF_brace)
-    if srun: cum_stresses_latex, (sigma_chord, sigma_brace) = fnc.cum_stresses_hc(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
-                                                                    sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
-    else:                     (sigma_chord, sigma_brace) = fnc.cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
-                                                                    sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
-    success_stress = (True if sigma_chord <= sigma_max * u.MPa and sigma_brace <= sigma_max * u.MPa else False)
+        st.header("OVERLAP JOINT: $0.5 <= O_v <= 1.0$:")
+    if st.checkbox("Show working",key="SCF_working"):
+        if chord_type=="CHS":
+            st.image(plots.SCF_ochax_png(beta,res['SCF_ochax'],res['SCF_obax']))
+        st.latex(fnc.SCF_latex(chord_type,res['gap'],beta,twogamma,tau,Ov,g_prime,theta,
+                            res['SCF_ochax'],res['SCF_obax'],res['SCF_bax_min']))
 
-    if srun:
-        #Calculate Stresses:
-        st.markdown("""
-        ## Nominal Stress Ranges
+    #Calculate Stresses:
+    st.markdown("""
+    ## Nominal Stress Ranges
 
-        Nominal stresses are obtained by getting:
-        - principal stresses 
-        - outer fiber bending stresses of each element defined in Sec 3.3.
-        
-        ### Axial Stresses - Chord
-        # """)
+    Nominal stresses are obtained by getting:
+    - principal stresses 
+    - outer fiber bending stresses of each element defined in Sec 3.3.
+    """)
+    if st.checkbox("Show working",key="stresses_working"):
+        chord_ax_stresses_latex, chord_BM_stresses_latex, brace_stresses_latex, cum_stresses_latex = fnc.stresses_latex(
+                                        tuple(chord_props),tuple(brace_props),res['SCF_chax'],res['SCF_bax'],res['SCF_chch'],
+                                        theta,res['MF_chord'],res['MF_brace'],
+                                        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op)
         st.write("### Axial Stresses - Chord")
         st.latex(chord_ax_stresses_latex)
         st.write("### Bending Moment Stresses - Chord")
@@ -261,31 +227,267 @@ def main(srun: bool,chord_type,chord_props,brace_props,
         st.latex(brace_stresses_latex)
         st.markdown("### TOTAL Stresses")
         st.latex(cum_stresses_latex)
-        #Stresses Bar Charts
-        bar_chart_fig = plots.bar_chart_altair(sigma_chord1P.value*10**-6, 
-                                sigma_chord2P.value*10**-6, 
-                                sigma_chordM_ip.value*10**-6, 
-                                sigma_chordM_op.value*10**-6,
-                                sigma_brace_1P.value*10**-6, 
-                                sigma_braceM_op.value*10**-6,
-                                sigma_max)
-        results_container.altair_chart(bar_chart_fig,use_container_width=True)
-        #Check for stresses and output message
-        if success_stress:
-            results_container.success("PASS - Stresses are within allowable limits")
-        else:
-            results_container.error("FAIL - Stresses exceed allowable limits")
-    return sigma_chord.value, sigma_brace.value
+    #Stresses Bar Charts
+    bar_chart_fig = plots.bar_chart_altair(res['sigma_chord1P']*10**-6, 
+                            res['sigma_chord2P']*10**-6, 
+                            res['sigma_chordM_ip']*10**-6, 
+                            res['sigma_chordM_op']*10**-6,
+                            res['sigma_brace_1P']*10**-6, 
+                            res['sigma_braceM_op']*10**-6,
+                            sigma_max)
+    results_container.altair_chart(bar_chart_fig,use_container_width=True)
+    #Check for stresses and output message
+    if res['success_stress']:
+        results_container.success("PASS - Stresses are within allowable limits")
+    else:
+        results_container.error("FAIL - Stresses exceed allowable limits")
+    return res['sigma_chord'], res['sigma_brace']
     
+def parametric_study(chord_type,chord_props,brace_props,e,chordspacing,L_chord,div_chord,
+                     P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                     sigma_max,SCF_ch_op,SCF_br_op):
+    """Utilisation of the chosen pair over a grid of truss geometries, shown as a heat map of a 2D slice"""
+    st.sidebar.markdown('## Parametric Study Ranges')
+    #(label, unit scale to SI, default range about the single joint value, default points)
+    ranges = {'e':("Eccentricity (mm)",1e-3,(e*1000-100,e*1000+100),50),
+              'chordspacing':("Chord spacing (mm)",1e-3,(chordspacing*500,chordspacing*1500),50),
+              'L_chord':("Length of Chord (mm)",1e-3,(L_chord*500,L_chord*1500),40),
+              'div_chord':("Chord divisions",1,(1,20),10)}
+    values = {}
+    for name, (label, scale, (low, high), points) in ranges.items():
+        if name == 'e' and chord_type == "CHS":
+            values[name] = np.array([0.])
+            continue
+        col1, col2, col3 = st.sidebar.beta_columns(3)
+        low = col1.number_input(f"{label} from",value=float(low),key=f"{name}_from")
+        high = col2.number_input("to",value=float(high),key=f"{name}_to")
+        points = col3.number_input("points",1,1000,points,key=f"{name}_points")
+        if name == 'div_chord':
+            values[name] = np.unique(np.linspace(max(low,1),max(high,1),int(points)).round())
+        else:
+            values[name] = np.linspace(low,high,int(points)) * scale
+    res = parametric.cached_study(chord_type,chord_props,brace_props,
+                                  *(values[name] for name in parametric.GEOMETRY),
+                                  P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                                  sigma_max*1e6,SCF_ch_op,SCF_br_op)
+    st.header("Geometry Parametric Study")
+    st.write(f"{res['utilisation'].size} geometries, {res['feasible'].sum()} pass the geometry checks "
+             f"and {res['success'].sum()} also pass the stress check")
+    best = parametric.best_geometry(res)
+    if best:
+        st.write("Lowest utilisation: " + ", ".join(f"{name} = {val:.3g}" for name,val in best.items()))
+    labels = {name:ranges[name][0].replace("(mm)","(m)") for name in parametric.GEOMETRY}
+    swept = [name for name in parametric.GEOMETRY if len(res[name]) > 1]
+    if len(swept) < 2:
+        st.error("Sweep at least two of the geometry parameters")
+        return
+    col1, col2 = st.beta_columns(2)
+    x = col1.selectbox("x axis",swept,index=0,format_func=labels.get)
+    y = col2.selectbox("y axis",[name for name in swept if name != x],format_func=labels.get)
+    #The other axes are fixed at a chosen value
+    fixed = {}
+    for name in swept:
+        if name not in (x,y):
+            val = st.select_slider(labels[name],options=list(res[name]),value=res[name][len(res[name]) // 2])
+            fixed[name] = list(res[name]).index(val)
+    x_values, y_values, grids = parametric.slice2d(res,x,y,fixed)
+    fig, ax = plots.parametric_contour(labels[x],x_values,labels[y],y_values,grids['utilisation'],grids['feasible'])
+    st.pyplot(fig)
+
+def reliability_study(chord_type,chord_props,brace_props,e,chordspacing,L_chord,div_chord,
+                      P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                      sigma_max,SCF_ch_op,SCF_br_op):
+    """Monte Carlo probability of exceeding sigma_max under scatter in the forces and fabrication"""
+    st.sidebar.markdown('## Reliability Scatter')
+    distributions = {}
+    for name, val in zip(reliability.VARIABLES[:5],(P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace)):
+        dist = st.sidebar.selectbox(f"{name} distribution",("fixed","normal","lognormal","gumbel"),key=f"{name}_dist")
+        if dist != "fixed" and val:
+            cov = st.sidebar.number_input(f"{name} COV (%)",0.0,100.0,10.0,step=1.0,key=f"{name}_cov") / 100
+            distributions[name] = ((dist,val*1e3,cov) if dist == "lognormal" else (dist,val*1e3,abs(val)*1e3*cov))
+    t0, t1 = chord_props[2], brace_props[2]
+    std_t = st.sidebar.number_input("Wall thickness std (% of nominal)",0.0,20.0,5.0,step=0.5) / 100
+    if std_t:
+        distributions.update({'t0':('normal',t0,t0*std_t), 't1':('normal',t1,t1*std_t)})
+    if chord_type != "CHS":
+        std_e = st.sidebar.number_input("Eccentricity std (mm)",0.0,50.0,5.0,step=1.0) / 1000
+        if std_e:
+            distributions['e'] = ('normal',e,std_e)
+    std_theta = st.sidebar.number_input("Brace angle std (deg)",0.0,10.0,1.0,step=0.1)
+    if std_theta:
+        distributions['theta_error'] = ('normal',0.0,math.radians(std_theta))
+    n_samples = st.sidebar.number_input("Samples",1000,10**8,10**6,step=10**5,format='%i')
+    seed = st.sidebar.number_input("Random seed",0,2**31 - 1,0,step=1,format='%i')
+    workers = st.sidebar.number_input("Worker processes",1,64,1,step=1,format='%i')
+    st.header("Reliability")
+    try:
+        #Cached, as every rerun of the app (any widget change) would sample again
+        res = reliability.cached_reliability(chord_type,chord_props,brace_props,
+                                             e,chordspacing,L_chord,div_chord,
+                                             P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                                             sigma_max*1e6,SCF_ch_op,SCF_br_op,distributions,
+                                             n_samples=int(n_samples),seed=int(seed),workers=int(workers))
+    except ValueError as error:
+        #e.g. lognormal scatter on a compression (negative) force
+        st.error(str(error))
+        return
+    low, high = res['ci']
+    st.write(f"P(stress > sigma_max) = {res['p_exceed']:.3e} "
+             f"({res['confidence']:.0%} interval {low:.3e} to {high:.3e}, {res['exceedances']} of {res['n']} samples)")
+    st.write(f"Mean utilisation {res['mean_utilisation']:.3f}, max {res['max_utilisation']:.3f}. "
+             f"{res['p_invalid']:.1%} of samples fall outside the CIDECT validity ranges.")
+    if res['nonfinite']:
+        st.warning(f"{res['nonfinite']} samples have no finite utilisation and are left out of the probability")
+    if res['sensitivity']:
+        #Correlation of each random input with the utilisation, largest magnitude first
+        sensitivity = pd.DataFrame(res['sensitivity'],columns=['variable','correlation']).set_index('variable')
+        st.bar_chart(sensitivity)
+        st.table(sensitivity)
+
+def synthetic_sections(member,kind):
+    """Sidebar ranges of a synthetic (d, b, t) grid and its section array"""
+    st.sidebar.markdown(f'### Synthetic {member} {kind}')
+    def axis(label,low,high,points,key):
+        col1, col2, col3 = st.sidebar.beta_columns(3)
+        low = col1.number_input(f"{label} from",value=float(low),key=f"{member}_{key}_from")
+        high = col2.number_input("to",value=float(high),key=f"{member}_{key}_to")
+        points = col3.number_input("points",1,500,points,key=f"{member}_{key}_points")
+        return np.linspace(low,high,int(points)) / 1000
+    d = axis("Height/Diameter (mm)",50.,400.,36,"d")
+    b = (axis("Width (mm)",50.,300.,26,"b") if kind == "RHS" else None)
+    t = axis("Thickness (mm)",3.,16.,14,"t")
+    return synthetic.family(kind,d,t,b)
+
+def pareto_view(res,chord_props,brace_props,e,chordspacing,L_chord,div_chord,sigma_max,mass_per_length=None):
+    """
+    Sidebar choice of the pairs drawn in the all-sizes scatter, by default the Pareto front. Returns their indices.
+    mass_per_length: catalogue (chord, brace) Mass (kg/m), None for area times steel density (synthetic sections)
+    """
+    st.sidebar.markdown('## Scatter Points')
+    show = st.sidebar.radio("Show",("Pareto front","Pareto front and nearest alternatives","All pairs"))
+    if show == "All pairs":
+        return None
+    k = (st.sidebar.number_input("Nearest alternatives",1,500,20,step=1,format='%i')
+         if show == "Pareto front and nearest alternatives" else 0)
+    extra = st.sidebar.selectbox("Fourth objective",["none"] + list(pareto.EXTRA_OBJECTIVES))
+    passing = st.sidebar.checkbox("Only pairs within sigma_max",value=False)
+    out = pareto.front(res,chord_props,brace_props,optimise.member_lengths(e,chordspacing,L_chord,div_chord),
+                       extra=(None if extra == "none" else extra),sigma_max=(sigma_max*1e6 if passing else None),k=int(k),
+                       mass_per_length=mass_per_length)
+    n_front = int(out['pareto'].sum())
+    with st.beta_expander(f"Pareto front: {n_front} pairs minimise chord stress, brace stress and mass"
+                          + ("" if extra == "none" else f" and {extra}")):
+        table = plots.selection_table(res,chord_props,brace_props,out['index'])
+        table['Mass (kg)'] = out['objectives'][:,2]
+        table['Pareto'] = out['pareto']
+        st.table(table)
+    return out['index']
+
+def stored_results(store,sigma_max):
+    """Query the results store by section, stress range and pass/fail, without recomputing"""
+    st.header("Stored Results")
+    col1, col2, col3 = st.beta_columns(3)
+    chord = col1.text_input("Chord name (% matches anything)","%")
+    brace = col2.text_input("Brace name (% matches anything)","%")
+    status = col3.selectbox("Status",("all","passed","failed"))
+    col1, col2 = st.beta_columns(2)
+    sigma_chord = col1.slider("Chord stress (MPa)",0.0,sigma_max*5,(0.0,sigma_max*5))
+    sigma_brace = col2.slider("Brace stress (MPa)",0.0,sigma_max*5,(0.0,sigma_max*5))
+    limit = st.number_input("Maximum rows",1,100000,1000,step=100,format='%i')
+    rows = store.query(columns=['run','code','chord','brace','joint','sigma_chord','sigma_brace',
+                                'geometry_ok','dimensions_ok','passed','message'],
+                       chord=chord,brace=brace,sigma_chord=sigma_chord,sigma_brace=sigma_brace,
+                       passed=(None if status == "all" else status == "passed"),sigma_max=sigma_max,limit=int(limit))
+    st.write(f"{len(rows)} stored pairs match, pass/fail at sigma_max = {sigma_max} MPa")
+    if rows:
+        st.dataframe(pd.DataFrame(rows))
+
+def whole_truss(chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op):
+    """Check every joint along the truss in one vectorised call and plot the utilisation profile"""
+    st.sidebar.markdown('## Whole Truss Forces')
+    pattern = st.sidebar.radio("Joint forces from:",("Uniform load","Values per joint"))
+    if pattern == "Uniform load":
+        w = st.sidebar.number_input("Uniform load range (kN/m)",value=20.0,step=5.0)
+        forces = truss.uniform_load_forces(w*1e3,e,chordspacing,L_chord,div_chord)
+    else:
+        #Comma separated values per joint, a single value (default the joint input) applies to every joint
+        forces = {}
+        for name, val in zip(truss.FORCES,(P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace)):
+            text = st.sidebar.text_input(f"{name} per joint ({'kN' if name.startswith('P') else 'kNm'})",str(val))
+            try:
+                forces[name] = np.array([float(v) for v in text.split(',')]) * 1e3
+            except ValueError:
+                st.error(f"{name}: enter numbers separated by commas")
+                return
+    try:
+        res = truss.check_truss(chord_type,chord_props,brace_props,
+                                e,chordspacing,L_chord,div_chord,
+                                *(forces[name] for name in truss.FORCES),
+                                sigma_max*1e6,SCF_ch_op,SCF_br_op)
+    except ValueError:
+        st.error("Values per joint must all have the same length (or a single value)")
+        return
+    n = len(res['utilisation'])
+    #Joints sit at the panel points when there is one per panel point, else they are numbered
+    x = (truss.panel_points(L_chord,div_chord) if n == div_chord + 1 else np.arange(n,dtype=float))
+    i = res['governing_joint']
+    st.header("Whole Truss")
+    st.write(f"Governing joint {i} at {x[i]:.2f}: {res['governing'][i]} utilisation {res['utilisation'][i]:.2f}")
+    st.altair_chart(plots.truss_utilisation_altair(x,res['u_chord'],res['u_brace'],i),use_container_width=True)
+    P_chord_joint, P_brace_joint = np.broadcast_arrays(forces['P_chord'],forces['P_brace'],np.empty(n))[:2]
+    table = pd.DataFrame({'x (m)':x,'P_chord (kN)':P_chord_joint/1e3,'P_brace (kN)':P_brace_joint/1e3,
+                          'sigma_chord (MPa)':res['sigma_chord']/1e6,'sigma_brace (MPa)':res['sigma_brace']/1e6,
+                          'utilisation':res['utilisation'],'governing':res['governing']})
+    st.table(table.style.apply(lambda row: ['background-color: #ffcccc' if row.name == i else '' for _ in row],axis=1))
+
+def report():
+    """Write the runtime banner and, when tracing is on, the per-stage timings panel"""
+    end = time.time()
+    runtime.write(f'Runtime: {end-start:.2f}s')
+    if not tracing.is_enabled():
+        return
+    stats = tracing.stats()
+    with st.sidebar.beta_expander("Stage timings",expanded=True):
+        if stats:
+            table = pd.DataFrame(stats).T
+            table[['total','mean','p50','p90','p99','max']] *= 1000
+            st.table(table.rename(columns={name:name + " (ms)" for name in ('total','mean','p50','p90','p99','max')}))
+        st.download_button("Download trace (JSON)",tracing.to_json(),file_name="trace.json",mime="application/json")
+        if st.button("Reset timings"):
+            tracing.reset()
+
 if __name__ == '__main__':
     start = time.time()
     runtime = st.empty()
+    #Stage timings are shown when the server runs with HS_TRACE=1. Tracing is process-wide, so no
+    #session switches it. Timings accumulate over reruns until reset
     srun = st.sidebar.checkbox("CHECKED: Choose Size\n UNCHECKED: All Sizes (experimental)",value=True)
     if srun:
         (chord_type,chord_props,brace_props,
             e,chordspacing,L_chord,div_chord,
             P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
-            sigma_max,SCF_ch_op,SCF_br_op) = inputs(srun)
+            sigma_max,SCF_ch_op,SCF_br_op,code,brace_type) = inputs(srun)
+        #Utilisation of this pair over a grid of truss geometries
+        if st.sidebar.checkbox("Geometry parametric study"):
+            parametric_study(chord_type,chord_props,brace_props,
+                        e,chordspacing,L_chord,div_chord,
+                        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                        sigma_max,SCF_ch_op,SCF_br_op)
+        #Probability of exceeding sigma_max under scatter in the inputs
+        if st.sidebar.checkbox("Reliability (Monte Carlo)"):
+            reliability_study(chord_type,chord_props,brace_props,
+                        e,chordspacing,L_chord,div_chord,
+                        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                        sigma_max,SCF_ch_op,SCF_br_op)
+        #Every joint along the truss at once, ahead of the detailed check of one joint
+        if st.sidebar.checkbox("Whole truss: check every joint"):
+            whole_truss(chord_type,chord_props,brace_props,
+                        e,chordspacing,L_chord,div_chord,
+                        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                        sigma_max,SCF_ch_op,SCF_br_op)
         main(srun,chord_type,chord_props,brace_props,
                         e,chordspacing,L_chord,div_chord,
                         P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
@@ -294,26 +496,56 @@ if __name__ == '__main__':
         (chord_type,chord_props,brace_props,
             e,chordspacing,L_chord,div_chord,
             P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
-            sigma_max,SCF_ch_op,SCF_br_op) = inputs(srun)
-        lin_sigma_chord = []
-        lin_sigma_brace = []
-        chord_ind = []
-        brace_ind = []
-        for ch in chord_props:
-            for br in brace_props:
-                if br[0]<=ch[0]:
-                    sigma_chord, sigma_brace = main(srun,chord_type,ch,br,
+            sigma_max,SCF_ch_op,SCF_br_op,code,brace_type) = inputs(srun)
+        #Dense grids of fabricated sizes with closed-form properties, in place of the catalogue rows
+        use_synthetic = st.sidebar.checkbox("Synthetic section grid (beyond the catalogue)")
+        if use_synthetic:
+            chord_props = synthetic_sections("chord",chord_type)
+            brace_props = synthetic_sections("brace",brace_type)
+            st.write(f"{len(chord_props)} synthetic chords and {len(brace_props)} synthetic braces")
+        #Sweeps are also written to the server's results store (HS_RESULTS_STORE), to query stored results later
+        #(not read back). The path is not taken from the browser
+        store = results_store.app_store()
+        labels = None
+        if store is not None:
+            labels = {'code':code, 'brace_type':brace_type,
+                      'chord_names':(synthetic.names(chord_type,chord_props) if use_synthetic
+                                     else vld.load_data(code,chord_type).name),
+                      'brace_names':(synthetic.names(brace_type,brace_props) if use_synthetic
+                                     else vld.load_data(code,brace_type).name)}
+        #Prune pairs that fail the dimensional or geometry checks, then evaluate
+        #the remaining pairs in one vectorised pass (SI units: N, Nm, Pa).
+        #Results are cached on the inputs, so reruns from plot selections do not recompute,
+        #and otherwise only the stages whose inputs changed are rerun
+        res = sweep_cache.all_sizes(chord_type,chord_props,brace_props,
                                 e,chordspacing,L_chord,div_chord,
-                                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
-                                sigma_max,SCF_ch_op,SCF_br_op)
-                    #st.text(f"Chord: {ch[0]*1000,ch[1]*1000,ch[2]*1000}\n"
-                    #        f"Brace: {br[0]*1000,br[1]*1000,br[2]*1000}\n"
-                    #        f"sigma_chord = {sigma_chord/1e6:.2f}MPa\n"
-                    #        f"sigma_brace = {sigma_brace/1e6:.2f}MPa")
-                    lin_sigma_chord.append(sigma_chord/1e6)
-                    lin_sigma_brace.append(sigma_brace/1e6)
-                    chord_ind.append([ch[0],ch[1],ch[2]])
-                    brace_ind.append([br[0],br[1],br[2]])
-        plots.bokeh_interactive(lin_sigma_chord, lin_sigma_brace,sigma_max,chord_ind,brace_ind)
-    end = time.time()
-    runtime.write(f'Runtime: {end-start:.2f}s')
+                                P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                                SCF_ch_op,SCF_br_op,store=store,labels=labels)
+        pruned = res['pruned']
+        with st.beta_expander(f"{pruned['feasible']} of {pruned['total']} chord/brace pairs pass the dimension and geometry checks"):
+            st.table(pd.DataFrame({'Pairs removed':[pruned[rule] for rule in sweep.PRUNE_RULES]},
+                                    index=sweep.PRUNE_RULES))
+        #Lightest passing pairs by catalogue mass, instead of picking from the scatter by eye
+        if not use_synthetic and st.sidebar.checkbox("Find lightest passing pairs"):
+            k = st.sidebar.number_input("Number of pairs",1,50,5,step=1,format='%i')
+            rows, summary = optimise.lightest_pairs(chord_type,vld.load_data(code,chord_type),vld.load_data(code,brace_type),
+                                e,chordspacing,L_chord,div_chord,
+                                P_chord*1e3,P_brace*1e3,M_ip_chord*1e3,M_op_chord*1e3,M_op_brace*1e3,
+                                sigma_max*1e6,SCF_ch_op,SCF_br_op,k=int(k))
+            st.header("Lightest passing pairs")
+            st.write(f"Mass of one chord panel and one brace. {summary['evaluated']} of {summary['feasible']} feasible pairs evaluated.")
+            if rows:
+                table = pd.DataFrame(rows)[['chord','brace','mass','sigma_chord','sigma_brace','utilisation','governing']]
+                table[['sigma_chord','sigma_brace']] /= 1e6
+                st.table(table.rename(columns={'mass':'mass (kg)','sigma_chord':'sigma_chord (MPa)',
+                                                'sigma_brace':'sigma_brace (MPa)'}))
+            else:
+                st.error("No chord/brace pair passes the checks for these inputs")
+        #Only the non-dominated pairs are sent to the browser unless all are asked for
+        mass_per_length = (None if use_synthetic
+                           else (vld.load_data(code,chord_type).mass,vld.load_data(code,brace_type).mass))
+        subset = pareto_view(res,chord_props,brace_props,e,chordspacing,L_chord,div_chord,sigma_max,mass_per_length)
+        plots.bokeh_interactive(res,sigma_max,chord_props,brace_props,subset=subset)
+        if store is not None and st.sidebar.checkbox("Query stored results"):
+            stored_results(store,sigma_max)
+    report()
@@ -0,0 +1,75 @@
+"""
+Lightest passing chord/brace pairs.
+
+Candidate pairs that can pass the dimensional and geometry checks come from
+sweep.candidate_pairs. They are then sorted by mass and evaluated with
+functions_vec.joint_check in growing batches, lightest first, stopping as soon
+as k pairs pass. Every pair lighter than the last one returned has therefore
+been checked, so the result is exact without evaluating the heavy end of the
+catalogue.
+
+The SCFs depend on beta, 2*gamma and tau, so stress is not monotonic in A, I or
+t across the catalogue, and skipping pairs by dominance on section properties
+could miss the optimum. Ordering by mass gives the same early exit safely.
+"""
+import numpy as np
+
+import functions_vec as fvec
+import sweep
+import tracing
+
+DEFAULT_BATCH_SIZE = 256
+
+def member_lengths(e,chordspacing,L_chord,div_chord):
+    """Length of one chord panel and of one brace (m), the mass weights of a pair"""
+    l_truss = L_chord / div_chord
+    return l_truss, float(np.hypot(chordspacing + 2 * e,l_truss))
+
+@tracing.traced("lightest pairs")
+def lightest_pairs(chord_type,chord_table,brace_table,
+                   e,chordspacing,L_chord,div_chord,
+                   P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                   sigma_max,SCF_ch_op,SCF_br_op,k=1,lengths=None,batch_size=DEFAULT_BATCH_SIZE):
+    """
+    The k lightest chord/brace pairs that pass sigma_max, dim_limits and check_angle_ecc_gap.
+    chord_table, brace_table: catalogue.Table, for the section properties, names and Mass (kg/m)
+    lengths: (chord length, brace length) weighting the masses, default member_lengths()
+    All other inputs are SI, as for functions_vec.joint_check.
+
+    Returns:
+    rows: list of dicts, lightest first, with the section names and catalogue rows, mass (kg),
+          stresses (Pa), utilisation (stress / sigma_max) and the governing check
+    summary: dict of the number of pairs in the catalogue, feasible after pruning and evaluated
+    """
+    chord = chord_table.section_array()
+    brace = brace_table.section_array()
+    (ch_ind, br_ind), pruned = sweep.candidate_pairs(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,
+                                                     brace_sorted=brace_table.sorted['b'])
+    chord_length, brace_length = (member_lengths(e,chordspacing,L_chord,div_chord) if lengths is None else lengths)
+    mass = chord_table.mass[ch_ind] * chord_length + brace_table.mass[br_ind] * brace_length
+    order = np.argsort(mass,kind='stable')
+
+    rows = []
+    evaluated = 0
+    start = 0
+    while start < len(order) and len(rows) < k:
+        sel = order[start:start + batch_size]
+        start += len(sel)
+        batch_size *= 2
+        res = fvec.joint_check(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,
+                               P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                               sigma_max,SCF_ch_op,SCF_br_op,pairs=(ch_ind[sel],br_ind[sel]))
+        evaluated += len(sel)
+        passed = np.flatnonzero(res['success'] & res['dim_success'] & res['success_stress'])
+        for i in passed[:k - len(rows)]:
+            u_chord = res['sigma_chord'][i] / sigma_max
+            u_brace = res['sigma_brace'][i] / sigma_max
+            rows.append({'chord':str(chord_table.name[res['chord'][i]]),
+                         'brace':str(brace_table.name[res['brace'][i]]),
+                         'chord_row':int(res['chord'][i]), 'brace_row':int(res['brace'][i]),
+                         'mass':float(mass[sel[i]]),
+                         'sigma_chord':float(res['sigma_chord'][i]), 'sigma_brace':float(res['sigma_brace'][i]),
+                         'utilisation':float(max(u_chord,u_brace)),
+                         'governing':("chord stress" if u_chord >= u_brace else "brace stress")})
+    summary = {'total':pruned['total'], 'feasible':pruned['feasible'], 'evaluated':evaluated}
+    return rows, summary
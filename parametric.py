@@ -0,0 +1,105 @@
+"""
+Geometry parametric study of one chord/brace pair.
+
+The truss geometry (e, chordspacing, L_chord, div_chord) is swept over a dense
+grid, every grid point run through functions_vec.joint_check as a joint of the
+same pair, so overlap, check_angle_ecc_gap, the SCFs and the stresses are all
+evaluated in one vectorised pass (in chunks, to bound memory). Results are
+arrays of the grid shape, one axis per geometry parameter, and are cached in
+STUDY_CACHE so reruns of the app that only change the displayed slice do not
+recompute. Grids can be much larger than all-sizes sweeps, so studies have their
+own small cache rather than taking entries of sweep_cache.default_cache.
+"""
+import numpy as np
+
+import functions_vec as fvec
+import sweep_cache
+import tracing
+
+#Axes of the grid, in the order of the result arrays
+GEOMETRY = ('e','chordspacing','L_chord','div_chord')
+#Outputs of joint_check kept on the grid
+KEEP = ('Ov','theta','g_prime','fail_code','sigma_chord','sigma_brace')
+DEFAULT_CHUNK_SIZE = 2**18
+#Studies kept in memory, not spilled to disk
+STUDY_CACHE_ENTRIES = 2
+
+def axes(e,chordspacing,L_chord,div_chord):
+    """Values along each geometry axis, scalars becoming axes of length 1"""
+    values = {name:np.atleast_1d(np.asarray(val,dtype=float))
+              for name,val in zip(GEOMETRY,(e,chordspacing,L_chord,div_chord))}
+    values['div_chord'] = values['div_chord'].astype(np.int64)
+    return values
+
+@tracing.traced("parametric study")
+def study(chord_type,chord_props,brace_props,
+          e,chordspacing,L_chord,div_chord,
+          P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+          sigma_max,SCF_ch_op,SCF_br_op,chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Joint check of one chord/brace pair over the grid of every combination of the geometry values.
+    chord_props, brace_props: (b,h,t,A,Ix,Iy) tuples in SI units
+    e, chordspacing, L_chord, div_chord: scalars or 1D arrays of values to sweep (m, m, m, -)
+    All other inputs are SI scalars, as for functions_vec.joint_check.
+
+    Returns a dict of the values along each axis (under the GEOMETRY names) and arrays
+    with one axis per GEOMETRY name: the KEEP outputs of joint_check, 'feasible' (dimensional
+    and geometry checks pass), 'utilisation' (max stress / sigma_max) and 'success'
+    (feasible and utilisation <= 1)
+    """
+    grid_axes = axes(e,chordspacing,L_chord,div_chord)
+    shape = tuple(len(grid_axes[name]) for name in GEOMETRY)
+    n = int(np.prod(shape))
+    chord = fvec.section_array([chord_props])
+    brace = fvec.section_array([brace_props])
+    out = {name:np.empty(n,dtype=(np.int64 if name == 'fail_code' else float)) for name in KEEP}
+    out['feasible'] = np.empty(n,dtype=bool)
+    for start in range(0,n,chunk_size):
+        flat = np.arange(start,min(start + chunk_size,n))
+        ind = np.unravel_index(flat,shape)
+        geometry = [grid_axes[name][i] for name,i in zip(GEOMETRY,ind)]
+        zeros = np.zeros(len(flat),dtype=np.int64)
+        res = fvec.joint_check(chord_type,chord,brace,*geometry,
+                               P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                               sigma_max,SCF_ch_op,SCF_br_op,pairs=(zeros,zeros))
+        for name in KEEP:
+            out[name][flat] = res[name]
+        out['feasible'][flat] = res['success'] & res['dim_success']
+    result = {name:val.reshape(shape) for name,val in out.items()}
+    result['utilisation'] = np.maximum(result['sigma_chord'],result['sigma_brace']) / sigma_max
+    result['success'] = result['feasible'] & (result['utilisation'] <= 1)
+    result.update(grid_axes)
+    return result
+
+#Module level, so cached studies survive Streamlit reruns
+STUDY_CACHE = sweep_cache.SweepCache(max_entries=STUDY_CACHE_ENTRIES,spill_dir=None)
+
+def cached_study(*args,cache=STUDY_CACHE,**kwargs):
+    """study() through the sweep cache, keyed on all of its inputs"""
+    key = cache.make_key(study=args,options=sorted(kwargs.items()))
+    return cache.get_or_compute(key,lambda: study(*args,**kwargs))
+
+def slice2d(res,x,y,fixed=None):
+    """
+    2D slice of a study over axes x and y (names in GEOMETRY), with the other axes
+    at the index given in fixed ({name: index}, default 0).
+    Returns the x values, y values and {output: array of shape (len(y), len(x))}
+    """
+    fixed = fixed or {}
+    index = tuple(slice(None) if name in (x,y) else fixed.get(name,0) for name in GEOMETRY)
+    transpose = GEOMETRY.index(x) < GEOMETRY.index(y)
+    grids = {}
+    for name in KEEP + ('feasible','utilisation','success'):
+        grid = res[name][index]
+        grids[name] = (grid.T if transpose else grid)
+    return res[x], res[y], grids
+
+def best_geometry(res):
+    """Geometry of the passing grid point with the lowest utilisation, as {name: value}, or None"""
+    utilisation = np.where(res['success'],res['utilisation'],np.inf)
+    i = np.unravel_index(np.argmin(utilisation),utilisation.shape)
+    if not np.isfinite(utilisation[i]):
+        return None
+    best = {name:res[name][k].item() for name,k in zip(GEOMETRY,i)}
+    best['utilisation'] = float(utilisation[i])
+    return best
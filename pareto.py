@@ -0,0 +1,230 @@
+"""
+Pareto fronts of all-sizes sweep results.
+
+A chord/brace pair is on the front when no other pair is at least as good in
+every objective and better in one: chord stress, brace stress and mass, plus an
+optional fourth objective (all minimised). The utilisation margin is not offered
+as one, as it follows from the two stresses and so never changes the front.
+
+non_dominated() is O(n log n) for two objectives (sort, then a running minimum)
+and three (sort on the first objective, then sweep the points in that order
+through a Fenwick tree of the running minimum of the third objective over the
+ranks of the second). Before the sweep, points dominated by the two-objective
+fronts of each pair of objectives are removed in one vectorised pass, which
+leaves only a few percent of a sweep for the Python loop. With four objectives
+the survivors are compared against the growing front in sorted order instead.
+"""
+import numpy as np
+
+import optimise
+import sweep_cache
+import tracing
+
+OBJECTIVES = ('sigma_chord','sigma_brace','mass')
+#Optional fourth objective, from the chord and brace section arrays (minimised)
+EXTRA_OBJECTIVES = {
+    'chord depth':lambda chord,brace: chord['h'],
+    'brace perimeter (weld length)':lambda chord,brace: 2 * (brace['b'] + brace['h']),
+}
+STEEL_DENSITY = 7850.
+#Points of the two-objective fronts used to prefilter
+PREFILTER_POINTS = 64
+
+def _dominated_by(points,others):
+    """Mask of points dominated by any of others"""
+    columns = points.T
+    alive = np.arange(len(points))
+    for other in others:
+        cols = columns[:,alive]
+        le = np.all(cols >= other[:,None],axis=0)
+        lt = np.any(cols > other[:,None],axis=0)
+        alive = alive[~(le & lt)]
+    out = np.ones(len(points),dtype=bool)
+    out[alive] = False
+    return out
+
+def _front2(points):
+    """Mask of the non-dominated points of two objectives"""
+    order = np.lexsort((points[:,1],points[:,0]))
+    y = points[order,1]
+    #Running minimum of the second objective over the points before, in order of the first
+    best = np.minimum.accumulate(np.concatenate(([np.inf],y[:-1])))
+    keep = y < best
+    #Exact duplicates of a point on the front are on it too
+    x = points[order,0]
+    new = np.concatenate(([True],(x[1:] != x[:-1]) | (y[1:] != y[:-1])))
+    keep = keep[np.maximum.accumulate(np.where(new,np.arange(len(y)),0))]
+    mask = np.zeros(len(points),dtype=bool)
+    mask[order] = keep
+    return mask
+
+def _front3(points):
+    """Mask of the non-dominated points of three objectives, Fenwick tree sweep"""
+    n = len(points)
+    order = np.lexsort((points[:,2],points[:,1],points[:,0]))
+    p = points[order]
+    #1-based ranks of the second objective, equal values sharing a rank
+    rank = np.searchsorted(np.unique(p[:,1]),p[:,1]) + 1
+    tree = [np.inf] * (int(rank.max()) + 1)
+    z = p[:,2].tolist()
+    rank = rank.tolist()
+    #Exact duplicates are queried together, before any of them is inserted
+    starts = np.flatnonzero(np.concatenate(([True],np.any(p[1:] != p[:-1],axis=1)))).tolist()
+    keep = np.zeros(n,dtype=bool)
+    for i, j in zip(starts,starts[1:] + [n]):
+        best = np.inf
+        r = rank[i]
+        while r > 0:
+            best = min(best,tree[r])
+            r -= r & -r
+        keep[i:j] = z[i] < best
+        r = rank[i]
+        while r < len(tree):
+            if z[i] < tree[r]:
+                tree[r] = z[i]
+            r += r & -r
+    mask = np.zeros(n,dtype=bool)
+    mask[order] = keep
+    return mask
+
+def _front_sorted(points):
+    """Mask of the non-dominated points of any number of objectives, against the growing front"""
+    order = np.lexsort(points.T[::-1])
+    keep = np.zeros(len(points),dtype=bool)
+    front = np.empty((0,points.shape[1]))
+    #A point can only be dominated by points before it in lexicographic order
+    for i in order:
+        p = points[i]
+        if not np.any(np.all(front <= p,axis=1) & np.any(front < p,axis=1)):
+            keep[i] = True
+            front = np.vstack((front,p))
+    return keep
+
+def non_dominated(objectives):
+    """
+    Mask of the Pareto-optimal rows of an (n, m) array of objectives, all minimised.
+    Rows equal to a Pareto-optimal row are kept too. Rows with NaN are never optimal.
+    """
+    points = np.asarray(objectives,dtype=float)
+    if points.ndim != 2:
+        raise ValueError("objectives must be an (n, m) array")
+    n, m = points.shape
+    mask = np.zeros(n,dtype=bool)
+    valid = np.flatnonzero(~np.isnan(points).any(axis=1))
+    if len(valid) == 0:
+        return mask
+    points = points[valid]
+    if m == 1:
+        mask[valid] = points[:,0] == points[:,0].min()
+        return mask
+    if m == 2:
+        mask[valid] = _front2(points)
+        return mask
+    #Remove the points dominated by the fronts of the pairs of objectives, which are cheap to find
+    reps = np.unique(np.concatenate([points[_front2(points[:,[a,b]])]
+                                     for a in range(m) for b in range(a + 1,m)]),axis=0)
+    reps = reps[np.linspace(0,len(reps) - 1,min(len(reps),PREFILTER_POINTS)).astype(np.int64)]
+    survivors = np.flatnonzero(~_dominated_by(points,reps))
+    keep = (_front3 if m == 3 else _front_sorted)(points[survivors])
+    mask[valid[survivors[keep]]] = True
+    return mask
+
+def nearest(objectives,front,k):
+    """
+    Indices of the k rows not in front closest to it, closest first, and their distances.
+    Distances are Euclidean over the objectives scaled to [0,1] by their range.
+    """
+    from scipy.spatial import cKDTree
+    points = np.asarray(objectives,dtype=float)
+    low = np.nanmin(points,axis=0)
+    span = np.nanmax(points,axis=0) - low
+    scaled = (points - low) / np.where(span > 0,span,1.)
+    others = np.flatnonzero(~front & ~np.isnan(points).any(axis=1))
+    if k <= 0 or len(others) == 0 or not front.any():
+        return np.empty(0,dtype=np.int64), np.empty(0)
+    distance, _ = cKDTree(scaled[front]).query(scaled[others])
+    closest = np.argsort(distance,kind='stable')[:k]
+    return others[closest], distance[closest]
+
+def objectives(res,chord_props,brace_props,lengths,extra=None,mass_per_length=None):
+    """
+    (n, 3) array of chord stress (Pa), brace stress (Pa) and mass (kg) of the pairs of
+    a sweep, with a fourth column when extra is given.
+    lengths: (chord length, brace length), see optimise.member_lengths
+    extra: array of one value per pair, or a key of EXTRA_OBJECTIVES
+    mass_per_length: (chord, brace) kg/m arrays indexed like the section arrays,
+                     default area times STEEL_DENSITY
+    """
+    chord_ind = np.asarray(res['chord'])
+    brace_ind = np.asarray(res['brace'])
+    if mass_per_length is None:
+        mass_per_length = (chord_props['A'] * STEEL_DENSITY,brace_props['A'] * STEEL_DENSITY)
+    mass = (np.asarray(mass_per_length[0])[chord_ind] * lengths[0]
+            + np.asarray(mass_per_length[1])[brace_ind] * lengths[1])
+    columns = [np.asarray(res['sigma_chord'],dtype=float),np.asarray(res['sigma_brace'],dtype=float),mass]
+    if extra is not None:
+        if isinstance(extra,str):
+            extra = EXTRA_OBJECTIVES[extra](chord_props[chord_ind],brace_props[brace_ind])
+        columns.append(np.asarray(extra,dtype=float))
+    return np.stack(columns,axis=1)
+
+@tracing.traced("Pareto front")
+def front(res,chord_props,brace_props,lengths,extra=None,sigma_max=None,k=0,mass_per_length=None):
+    """
+    Pareto front of the pairs of a sweep that pass the dimensional and geometry checks
+    (and sigma_max, when given), plus the k nearest alternatives off the front.
+    See objectives() for the other inputs.
+
+    Returns a dict of 'index' (rows of res, the front by increasing mass, then the
+    alternatives closest first), 'pareto' (True for the rows on the front),
+    'distance' (scaled distance to the front, 0 on it) and 'objectives' of those rows
+    """
+    obj = objectives(res,chord_props,brace_props,lengths,extra,mass_per_length)
+    candidate = np.asarray(res['success'],dtype=bool) & np.asarray(res['dim_success'],dtype=bool)
+    if sigma_max is not None:
+        candidate &= (obj[:,0] <= sigma_max) & (obj[:,1] <= sigma_max)
+    rows = np.flatnonzero(candidate)
+    on_front = non_dominated(obj[rows])
+    pareto_rows = rows[on_front]
+    pareto_rows = pareto_rows[np.argsort(obj[pareto_rows,2],kind='stable')]
+    alt, distance = nearest(obj[rows],on_front,k)
+    index = np.concatenate((pareto_rows,rows[alt]))
+    return {'index':index,
+            'pareto':np.concatenate((np.ones(len(pareto_rows),dtype=bool),np.zeros(len(alt),dtype=bool))),
+            'distance':np.concatenate((np.zeros(len(pareto_rows)),distance)),
+            'objectives':obj[index]}
+
+def design_front(chord_type,chord_table,brace_table,
+                 e,chordspacing,L_chord,div_chord,
+                 P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                 sigma_max,SCF_ch_op,SCF_br_op,extra=None,k=0,passing=True):
+    """
+    Headless Pareto front of a catalogue: the all-sizes sweep (through the sweep cache)
+    and front() in one call, for design automation.
+    chord_table, brace_table: catalogue.Table, for the section properties, names and Mass (kg/m)
+    passing: only pairs within sigma_max are candidates
+    All other inputs are SI, as for functions_vec.joint_check.
+
+    Returns a list of dicts like optimise.lightest_pairs, front first by increasing mass,
+    each with 'pareto' and 'distance' as returned by front()
+    """
+    chord = chord_table.section_array()
+    brace = brace_table.section_array()
+    res = sweep_cache.all_sizes(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,
+                                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op)
+    lengths = optimise.member_lengths(e,chordspacing,L_chord,div_chord)
+    out = front(res,chord,brace,lengths,extra=extra,sigma_max=(sigma_max if passing else None),k=k,
+                mass_per_length=(chord_table.mass,brace_table.mass))
+    rows = []
+    for i, pareto, distance, obj in zip(out['index'],out['pareto'],out['distance'],out['objectives']):
+        u_chord = obj[0] / sigma_max
+        u_brace = obj[1] / sigma_max
+        row = {'chord':str(chord_table.name[res['chord'][i]]), 'brace':str(brace_table.name[res['brace'][i]]),
+               'chord_row':int(res['chord'][i]), 'brace_row':int(res['brace'][i]),
+               'mass':float(obj[2]), 'sigma_chord':float(obj[0]), 'sigma_brace':float(obj[1]),
+               'utilisation':float(max(u_chord,u_brace)),
+               'pareto':bool(pareto), 'distance':float(distance)}
+        if extra is not None:
+            row['extra'] = float(obj[3])
+        rows.append(row)
+    return rows
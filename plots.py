@@ -2,42 +2,62 @@ import streamlit as st
 
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
-import matplotlib.patches as mpatches
-import matplotlib.lines as lines
 import altair as alt
 
-#Bokeh Plots
-from bokeh.plotting import figure
-from bokeh.models import ColumnDataSource, CustomJS, Label
+import math
+import os
+from functools import lru_cache
 
-# import function
-from streamlit_bokeh_events import streamlit_bokeh_events
+import tracing
 
-import forallpeople as u
-u.environment('structural')
-import math
+#Matplotlib is imported in the charts that use it, and Bokeh only for the all-sizes scatter.
+#Matplotlib charts are built on matplotlib.figure.Figure rather than pyplot, so figures are
+#not kept alive by pyplot and are freed with the last reference.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"data")
+#Chart builds are cached on their inputs, so a rerun with unchanged inputs reuses the spec.
+#Every call returns its own deep copy (or PNG bytes for Matplotlib), as the caches are
+#shared by all sessions and charts and figures are mutable and not thread-safe
+CHART_CACHE_SIZE = 64
 
-def dim_params_altair(val1_string,val1,val2_string,val2,param_string,min,max,x_max):
-    """
-    Plot the dimensional variables beta, 
-    2*gamma and tau, showing the acceptable range in green highlighted area
-    """
+@lru_cache(maxsize=None)
+def image(name):
+    """Decoded image data/<name> as a read-only array, read from disk once and shared"""
+    from matplotlib.image import imread
+    img = imread(os.path.join(DATA_DIR,name))
+    img.setflags(write=False)
+    return img
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _dim_params_area(val1_string,param_string,val2_string,min,max,x_max):
+    """Acceptable range band of dim_params_altair, which only depends on the limits"""
     x = np.array([0,x_max])
     source = pd.DataFrame({
             val1_string: x,
             'y_max': x * max,
             'y_min': x * min
             })
-    source_points = pd.DataFrame({
-            val1_string:val1,
-            val2_string:val2},index=[0])
-    area = alt.Chart(source).mark_area(opacity=0.3).encode(
+    return alt.Chart(source).mark_area(opacity=0.3).encode(
         x=val1_string,
         y='y_min',
         y2='y_max',
         color=alt.value("#33bd81")
         ).properties(title=f'{min} <= {param_string}(={val2_string}/{val1_string}) <= {max}')
+
+@tracing.traced("Altair charts")
+def dim_params_altair(val1_string,val1,val2_string,val2,param_string,min,max,x_max):
+    """
+    Plot the dimensional variables beta, 
+    2*gamma and tau, showing the acceptable range in green highlighted area
+    """
+    return _dim_params_altair(val1_string,val1,val2_string,val2,param_string,min,max,x_max).copy(deep=True)
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _dim_params_altair(val1_string,val1,val2_string,val2,param_string,min,max,x_max):
+    #The range band is built once per set of limits, only the point is rebuilt
+    area = _dim_params_area(val1_string,param_string,val2_string,min,max,x_max)
+    source_points = pd.DataFrame({
+            val1_string:val1,
+            val2_string:val2},index=[0])
     points = alt.Chart(source_points).mark_point(size=80).encode(
         x=val1_string,
         y=val2_string
@@ -53,6 +73,7 @@ def dim_params_altair(val1_string,val1,val2_string,val2,param_string,min,max,x_m
             )
     return c
 
+@tracing.traced("Altair charts")
 def bar_chart_altair(sigma_chord1P,
                 sigma_chord2P,
                 sigma_chordM_ip,
@@ -60,6 +81,12 @@ def bar_chart_altair(sigma_chord1P,
                 sigma_brace_1P,
                 sigma_braceM_op,
                 sigma_max):
+    return _bar_chart_altair(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,sigma_chordM_op,
+                             sigma_brace_1P,sigma_braceM_op,sigma_max).copy(deep=True)
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _bar_chart_altair(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,sigma_chordM_op,
+                      sigma_brace_1P,sigma_braceM_op,sigma_max):
     source = pd.DataFrame({'member':['chord','brace','chord','chord','chord','brace'],
                     'stress_type':['sigma_1P','sigma_1P','sigma_2P','sigma_M_ip','sigma_M_op','sigma_M_op'],
                     'stress':[sigma_chord1P,sigma_brace_1P,sigma_chord2P,sigma_chordM_ip,sigma_chordM_op,sigma_braceM_op]})
@@ -80,10 +107,34 @@ def bar_chart_altair(sigma_chord1P,
     
     return bars + text + limit
 
+@tracing.traced("Altair charts")
+def truss_utilisation_altair(x,u_chord,u_brace,governing_joint):
+    """Chord and brace utilisation at each joint along the truss, governing joint circled in red"""
+    source = pd.DataFrame({'x':np.concatenate((x,x)),
+                           'utilisation':np.concatenate((u_chord,u_brace)),
+                           'member':['chord'] * len(x) + ['brace'] * len(x)})
+    profile = alt.Chart(source).mark_line(point=True).encode(
+        x=alt.X('x:Q',title='Distance along chord (m)'),
+        y=alt.Y('utilisation:Q',title='Utilisation'),
+        color=alt.Color('member:N'),
+        tooltip=['x','member','utilisation'])
+    governing = pd.DataFrame({'x':[x[governing_joint]],
+                              'utilisation':[max(u_chord[governing_joint],u_brace[governing_joint])]})
+    marker = alt.Chart(governing).mark_point(size=300,color='red',strokeWidth=3).encode(
+        x='x:Q',y='utilisation:Q')
+    limit = alt.Chart(pd.DataFrame({'y':[1.0]})).mark_rule(color='red',strokeDash=[5,5]).encode(
+        y='y')
+    return (profile + marker + limit).properties(height=250)
+
+@tracing.traced("Altair charts")
 def geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type):
     """
     Plot the geometry of the chord and brace members including centerlines.
     """
+    return _geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type).copy(deep=True)
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type):
     #Define key variables for brace
     length = 0.5 #length of brace member in metres that will be visible on graph on the diagonal
     br_top_x = length * math.cos(theta) #horizontal projection of the brace length
@@ -235,13 +286,14 @@ def geom_plot_altair(h0,theta,g_prime,t0,h1,e,chord_type):
         #Where SHS or RHS, there is no arc needed because brace sits on top of chord and does not cradle it.
         return  angle_text + brace_CL1 + brace_CL2 + chord_rect + brace_area1 + brace_area2
 
+@tracing.traced("Matplotlib charts")
 def SCF_ochax_plot(beta,SCF_ochax,SCF_obax):
+    from matplotlib.figure import Figure
     #Create graph to visualise answer on graph
-    fig, ax = plt.subplots(1,2)
-    SCF_ochax_img = plt.imread("data/SCFochax.png")
-    SCF_obax_img = plt.imread("data/SCFobax.png")
-    ax[0].imshow(SCF_ochax_img, extent=[0, 1, 0, 4])
-    ax[1].imshow(SCF_obax_img, extent=[0, 1, 0, 4])
+    fig = Figure()
+    ax = fig.subplots(1,2)
+    ax[0].imshow(image("SCFochax.png"), extent=[0, 1, 0, 4])
+    ax[1].imshow(image("SCFobax.png"), extent=[0, 1, 0, 4])
     ax[0].set_title(r"$SCF_{o,ch,ax}$")
     ax[1].set_title(r"$SCF_{o,b,ax}$")
     ax[0].plot(beta,SCF_ochax,'ro')
@@ -250,33 +302,107 @@ def SCF_ochax_plot(beta,SCF_ochax,SCF_obax):
     ax[1].set_aspect(0.25)
     return fig, ax
 
-def bokeh_interactive(sigma_chord,sigma_brace,sigma_max,chord_ind,brace_ind):
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def SCF_ochax_png(beta,SCF_ochax,SCF_obax):
+    """SCF_ochax_plot rendered to PNG bytes, which can be shared between sessions unlike the Figure"""
+    import io
+    fig, _ = SCF_ochax_plot(beta,SCF_ochax,SCF_obax)
+    buf = io.BytesIO()
+    fig.savefig(buf,format="png")
+    return buf.getvalue()
+
+@tracing.traced("Matplotlib charts")
+def parametric_contour(x_label,x,y_label,y,utilisation,feasible):
+    """Utilisation heat map over a 2D geometry slice, infeasible geometry hatched and the utilisation = 1 contour drawn"""
+    from matplotlib.figure import Figure
+    fig = Figure()
+    ax = fig.subplots()
+    mesh = ax.pcolormesh(x,y,np.ma.masked_where(~feasible,utilisation),shading='nearest',cmap='viridis')
+    fig.colorbar(mesh,ax=ax,label='Utilisation')
+    if (~feasible).any():
+        ax.contourf(x,y,(~feasible).astype(float),levels=[0.5,1.5],colors='none',hatches=['//'])
+    if len(x) > 1 and len(y) > 1 and np.nanmin(utilisation) < 1 < np.nanmax(utilisation):
+        ax.contour(x,y,np.where(feasible,utilisation,np.nan),levels=[1.0],colors='red')
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_title("Utilisation (hatched: fails geometry checks)")
+    return fig, ax
+
+#Above this many points the scatter is decimated to one point per cell of a DECIMATE_BINS grid
+DEFAULT_MAX_POINTS = 20000
+DECIMATE_BINS = 400
+#(gap, passed) -> legend label and colour
+JOINT_CATEGORIES = {(True,True):("Gap - pass","#1f77b4"), (True,False):("Gap - fail","#aec7e8"),
+                    (False,True):("Overlap - pass","#2ca02c"), (False,False):("Overlap - fail","#ff9896")}
+
+def decimate(x,y,x_range,y_range,bins=DECIMATE_BINS):
+    """Indices of one point per occupied cell of a bins x bins grid over x_range, y_range.
+    Points outside the ranges fall into the edge cells"""
+    ix = np.clip(((x - x_range[0]) / (x_range[1] - x_range[0]) * bins).astype(np.int64),0,bins - 1)
+    iy = np.clip(((y - y_range[0]) / (y_range[1] - y_range[0]) * bins).astype(np.int64),0,bins - 1)
+    _, first = np.unique(ix * bins + iy,return_index=True)
+    return np.sort(first)
+
+@tracing.traced("Bokeh chart")
+def bokeh_interactive(res,sigma_max,chord_props,brace_props,max_points=DEFAULT_MAX_POINTS,subset=None):
+    """
+    Interactive chord vs brace stress scatter of an all-sizes sweep, drawn with WebGL.
+    res: result arrays of the sweep (sigma_chord, sigma_brace in Pa, chord, brace, gap)
+    chord_props, brace_props: structured section arrays the chord/brace indices refer to
+    subset: indices of the pairs of res to draw (e.g. a Pareto front), default all
+    Points are coloured by joint type and pass/fail. Above max_points each category is
+    decimated to one point per grid cell. Selected points are looked up by index in res.
+    """
+    from bokeh.plotting import figure
+    from bokeh.models import ColumnDataSource, CustomJS, Span
+    from streamlit_bokeh_events import streamlit_bokeh_events
+    sigma_chord = np.asarray(res['sigma_chord']) / 1e6
+    sigma_brace = np.asarray(res['sigma_brace']) / 1e6
+    gap = np.asarray(res['gap'],dtype=bool)
+    passed = (sigma_chord <= sigma_max) & (sigma_brace <= sigma_max)
+    drawn = np.zeros(len(sigma_chord),dtype=bool)
+    drawn[(slice(None) if subset is None else subset)] = True
+    x_range = (0, sigma_max*3)
+    y_range = (0, sigma_max*3)
     # create plot
     p = figure(tools="lasso_select,reset",
-                x_range=(0, sigma_max*3), 
-                y_range=(0, sigma_max*3),
+                x_range=x_range, 
+                y_range=y_range,
                 x_axis_label='Chord Stress (MPa)',
-                y_axis_label='Brace Stress (MPa)')
-    cds = ColumnDataSource(
-        data={
-            "x": sigma_chord,
-            "y": sigma_brace,
-        }
-    )
-    p.circle("x", "y", source=cds)
-
-    # define events
-    cds.selected.js_on_change(
-        "indices",
-        CustomJS(
-            args=dict(source=cds),
-            code="""
-            document.dispatchEvent(
-                new CustomEvent("TestSelectEvent", {detail: {indices: cb_obj.indices}})
+                y_axis_label='Brace Stress (MPa)',
+                output_backend="webgl")
+    p.add_layout(Span(location=sigma_max,dimension='height',line_dash='dashed',line_color='red'))
+    p.add_layout(Span(location=sigma_max,dimension='width',line_dash='dashed',line_color='red'))
+
+    shown = 0
+    for (cat_gap,cat_passed), (label,colour) in JOINT_CATEGORIES.items():
+        idx = np.flatnonzero(drawn & (gap == cat_gap) & (passed == cat_passed))
+        if np.count_nonzero(drawn) > max_points:
+            idx = idx[decimate(sigma_chord[idx],sigma_brace[idx],x_range,y_range)]
+        if len(idx) == 0:
+            continue
+        shown += len(idx)
+        #NumPy columns are sent to the browser as binary buffers
+        cds = ColumnDataSource(data={"x":sigma_chord[idx], "y":sigma_brace[idx], "idx":idx.astype(np.int32)})
+        p.scatter("x", "y", source=cds, color=colour, legend_label=label, size=4)
+
+        # define events, reporting indices into res rather than into this category's source
+        cds.selected.js_on_change(
+            "indices",
+            CustomJS(
+                args=dict(source=cds),
+                code="""
+                const idx = source.data['idx'];
+                document.dispatchEvent(
+                    new CustomEvent("TestSelectEvent", {detail: {indices: cb_obj.indices.map(i => idx[i])}})
+                )
+                """
             )
-            """
         )
-    )
+    p.legend.location = "top_left"
+    p.legend.click_policy = "hide"
+    if shown < np.count_nonzero(drawn):
+        st.write(f"Showing {shown} of {np.count_nonzero(drawn)} pairs, one per grid cell")
 
     # result will be a dict of {event_name: event.detail}
     # events by default is "", in case of more than one events pass it as a comma separated values
@@ -296,9 +422,14 @@ def bokeh_interactive(sigma_chord,sigma_brace,sigma_max,chord_ind,brace_ind):
         # TestSelectEvent was thrown
         if "TestSelectEvent" in result:
             st.subheader("Selected Points")
-            indices = result["TestSelectEvent"].get("indices", [])
-            col1, col2 = st.beta_columns(2)
-            col1.subheader("Chords")
-            col1.table([chord_ind[i] for i in indices])
-            col2.subheader("Brace")
-            col2.table([brace_ind[i] for i in indices])
\ No newline at end of file
+            indices = np.asarray(result["TestSelectEvent"].get("indices", []),dtype=np.int64)
+            st.table(selection_table(res,chord_props,brace_props,indices))
+
+def selection_table(res,chord_props,brace_props,indices):
+    """Chord and brace sizes (mm) and stresses (MPa) of the selected pairs"""
+    chord = chord_props[np.asarray(res['chord'])[indices]]
+    brace = brace_props[np.asarray(res['brace'])[indices]]
+    return pd.DataFrame({'Chord b':chord['b']*1000, 'Chord h':chord['h']*1000, 'Chord t':chord['t']*1000,
+                         'Brace b':brace['b']*1000, 'Brace h':brace['h']*1000, 'Brace t':brace['t']*1000,
+                         'sigma_chord (MPa)':np.asarray(res['sigma_chord'])[indices]/1e6,
+                         'sigma_brace (MPa)':np.asarray(res['sigma_brace'])[indices]/1e6})
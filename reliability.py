@@ -0,0 +1,221 @@
+"""
+Monte Carlo reliability of one joint.
+
+Member forces, wall thicknesses, eccentricity and a brace angle error are
+sampled from user-specified distributions and pushed through the overlap, SCF
+and stress stages of functions_vec in chunks of chunk_size samples, so memory
+stays bounded whatever the number of samples. Each chunk only returns running
+sums (exceedances, and the moments needed for the correlations), which are
+merged in chunk order.
+
+Every chunk draws from its own stream spawned from one SeedSequence, so a run
+is reproducible for a given seed and chunk_size, whether the chunks run in
+this process or across a process pool. cached_reliability() keeps recent
+results, so app reruns with the same inputs do not sample again.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import functions_vec as fvec
+import sweep_cache
+import tracing
+
+#Random inputs. theta_error (rad) is added to the brace angle from the truss geometry,
+#t0 and t1 (m) replace the chord and brace wall thickness, the others replace the sidebar value
+VARIABLES = ('P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace','t0','t1','e','theta_error')
+#Variables whose distributions are truncated at zero (non-positive samples are drawn again)
+POSITIVE = ('t0','t1')
+DEFAULT_CHUNK_SIZE = 2**16
+DEFAULT_CONFIDENCE = 0.95
+#Results kept in memory by cached_reliability (small dicts, not spilled to disk)
+RELIABILITY_CACHE_ENTRIES = 16
+
+def _normal(rng,mean,std,n):
+    return rng.normal(mean,std,n)
+
+def _lognormal(rng,mean,cov,n):
+    sigma = np.sqrt(np.log1p(cov**2))
+    return rng.lognormal(np.log(mean) - sigma**2 / 2,sigma,n)
+
+def _uniform(rng,low,high,n):
+    return rng.uniform(low,high,n)
+
+def _gumbel(rng,mean,std,n):
+    scale = std * np.sqrt(6) / np.pi
+    return rng.gumbel(mean - np.euler_gamma * scale,scale,n)
+
+#name -> (sampler(rng,a,b,n), meaning of a and b)
+DISTRIBUTIONS = {
+    'normal':(_normal,('mean','std')),
+    'lognormal':(_lognormal,('mean','cov')),
+    'uniform':(_uniform,('low','high')),
+    'gumbel':(_gumbel,('mean','std')),
+}
+
+def check_distributions(distributions):
+    """Raise ValueError for unknown variables or distributions, or parameters no sample can be drawn from"""
+    unknown = set(distributions) - set(VARIABLES)
+    if unknown:
+        raise ValueError(f"Unknown random variables: {', '.join(sorted(unknown))}")
+    for name, (dist, a, b) in distributions.items():
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f"{name}: unknown distribution {dist!r}")
+        if dist == 'lognormal' and a <= 0:
+            raise ValueError(f"{name}: a lognormal mean must be positive, not {a}")
+        if dist == 'uniform' and a > b:
+            raise ValueError(f"{name}: uniform low {a} is above high {b}")
+        if dist != 'uniform' and b < 0:
+            raise ValueError(f"{name}: {DISTRIBUTIONS[dist][1][1]} must not be negative, not {b}")
+        if name in POSITIVE and (b if dist == 'uniform' else a) <= 0:
+            raise ValueError(f"{name}: a wall thickness distribution must have positive values")
+
+def sample(distributions,rng,n):
+    """
+    {variable: n samples} for each (dist, a, b) in distributions, see DISTRIBUTIONS.
+    Samples of POSITIVE variables are redrawn until they are above zero
+    """
+    out = {}
+    for name in VARIABLES:
+        if name in distributions:
+            dist, a, b = distributions[name]
+            sampler = DISTRIBUTIONS[dist][0]
+            x = sampler(rng,a,b,n)
+            if name in POSITIVE:
+                bad = np.flatnonzero(x <= 0)
+                while len(bad):
+                    x[bad] = sampler(rng,a,b,len(bad))
+                    bad = bad[x[bad] <= 0]
+            out[name] = x
+    return out
+
+def _sections(props,t,n):
+    """n copies of a section with wall thickness t. A, Ix and Iy scale with t (thin-walled)"""
+    sec = np.repeat(fvec.section_array([props]),n)
+    if t is not None:
+        ratio = t / sec['t']
+        sec['t'] = t
+        for name in ('A','Ix','Iy'):
+            sec[name] *= ratio
+    return sec
+
+def evaluate(model,samples,n):
+    """
+    Utilisation of n sampled joints, and a mask of those outside the CIDECT validity
+    ranges (dimensional, geometry and SCF limits). model: dict of the nominal inputs of reliability()
+    """
+    ch = _sections(model['chord_props'],samples.get('t0'),n)
+    br = _sections(model['brace_props'],samples.get('t1'),n)
+    e = samples.get('e',model['e'])
+    forces = [samples.get(name,model[name]) for name in VARIABLES[:5]]
+    chord_type = model['chord_type']
+    #The angle error moves the brace ends too, so Ov, g' and gap/overlap see it as well as the SCFs
+    res = fvec.overlap_stage(ch,br,e,model['chordspacing'],model['L_chord'],model['div_chord'],
+                             samples.get('theta_error',0.0))
+    theta = res['theta']
+    res.update(fvec.dim_params_stage(chord_type,ch,br))
+    res.update(fvec.checks_stage(chord_type,ch,e,res['Ov'],theta,res['g_prime'],res['tau']))
+    res.update(fvec.SCF_stage(chord_type,res['beta'],res['twogamma'],res['tau'],
+                              res['Ov'],res['g_prime'],theta,res['gap']))
+    res.update(fvec.stresses_stage(ch,br,theta,res['MF_chord'],res['MF_brace'],
+                                   res['SCF_chax'],res['SCF_bax'],res['SCF_chch'],
+                                   *forces,model['SCF_ch_op'],model['SCF_br_op']))
+    utilisation = np.maximum(res['sigma_chord'],res['sigma_brace']) / model['sigma_max']
+    invalid = ~(res['success'] & res['dim_success'] & res['SCF_in_range'])
+    return utilisation, invalid
+
+def _run_chunk(task):
+    """Running sums of one chunk: counts, and sums of u, u^2, x, x^2 and x*u for the correlations"""
+    model, seed, n = task
+    rng = np.random.default_rng(seed)
+    samples = sample(model['distributions'],rng,n)
+    utilisation, invalid = evaluate(model,samples,n)
+    finite = np.isfinite(utilisation)
+    u = utilisation[finite]
+    sums = {'n':n, 'exceed':int(np.count_nonzero(u > 1)),
+            'invalid':int(np.count_nonzero(invalid)), 'nonfinite':int(n - len(u)),
+            'u':u.sum(), 'u2':(u**2).sum(), 'u_max':(u.max() if len(u) else -np.inf)}
+    for name, x in samples.items():
+        #Shifted by the distribution's first parameter to keep the sums well conditioned
+        x = x[finite] - model['distributions'][name][1]
+        sums[name] = (x.sum(),(x**2).sum(),(x * u).sum())
+    return sums
+
+def wilson_interval(k,n,confidence=DEFAULT_CONFIDENCE):
+    """Wilson score interval of a binomial proportion k/n, which stays inside [0,1] for k = 0"""
+    from scipy.stats import norm
+    z = norm.ppf(0.5 + confidence / 2)
+    p = k / n
+    centre = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    low = (0.0 if k == 0 else max(centre - half,0.0))
+    high = (1.0 if k == n else min(centre + half,1.0))
+    return float(low), float(high)
+
+@tracing.traced("Monte Carlo reliability")
+def reliability(chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op,distributions,
+                n_samples=10**6,seed=0,chunk_size=DEFAULT_CHUNK_SIZE,workers=1,confidence=DEFAULT_CONFIDENCE):
+    """
+    Probability that the chord or brace stress exceeds sigma_max.
+    Nominal inputs are SI, as for functions.joint_check.
+    distributions: {variable: (dist, a, b)} for any of VARIABLES, with dist a key of DISTRIBUTIONS;
+                   variables left out keep their nominal value
+    workers: number of processes, None for os.cpu_count(); 1 runs in this process
+
+    Raises ValueError for distributions no sample can be drawn from, see check_distributions().
+
+    Returns a dict with n (samples with a finite utilisation), exceedances, p_exceed and its
+    confidence interval 'ci', 'nonfinite' (samples without a finite utilisation, left out of n),
+    the fraction of all samples outside the CIDECT validity ranges 'p_invalid', the mean and
+    max utilisation, and 'sensitivity': [(variable, correlation with utilisation)]
+    sorted by decreasing magnitude
+    """
+    check_distributions(distributions)
+    model = {'chord_type':chord_type, 'chord_props':tuple(chord_props), 'brace_props':tuple(brace_props),
+             'e':e, 'chordspacing':chordspacing, 'L_chord':L_chord, 'div_chord':div_chord,
+             'P_chord':P_chord, 'P_brace':P_brace, 'M_ip_chord':M_ip_chord, 'M_op_chord':M_op_chord,
+             'M_op_brace':M_op_brace, 'sigma_max':sigma_max, 'SCF_ch_op':SCF_ch_op, 'SCF_br_op':SCF_br_op,
+             'distributions':dict(distributions)}
+    sizes = [min(chunk_size,n_samples - start) for start in range(0,n_samples,chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(model,s,n) for s,n in zip(seeds,sizes)]
+    workers = (os.cpu_count() if workers is None else workers)
+    if workers == 1:
+        chunks = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_run_chunk,tasks))
+
+    total = sum(c['n'] for c in chunks)
+    k = sum(c['exceed'] for c in chunks)
+    m = total - sum(c['nonfinite'] for c in chunks)
+    su = sum(c['u'] for c in chunks)
+    su2 = sum(c['u2'] for c in chunks)
+    var_u = su2 / m - (su / m)**2 if m else 0.0
+    sensitivity = []
+    for name in distributions:
+        sx, sx2, sxu = (sum(c[name][i] for c in chunks) for i in range(3))
+        var_x = (sx2 / m - (sx / m)**2 if m else 0.0)
+        cov = (sxu / m - (sx / m) * (su / m) if m else 0.0)
+        r = (cov / np.sqrt(var_x * var_u) if var_x > 0 and var_u > 0 else 0.0)
+        sensitivity.append((name,float(r)))
+    sensitivity.sort(key=lambda item: -abs(item[1]))
+    return {'n':m, 'exceedances':k, 'p_exceed':(k / m if m else np.nan),
+            'ci':(wilson_interval(k,m,confidence) if m else (0.0,1.0)), 'nonfinite':total - m,
+            'confidence':confidence, 'p_invalid':sum(c['invalid'] for c in chunks) / total,
+            'mean_utilisation':float(su / m if m else np.nan),
+            'max_utilisation':float(max(c['u_max'] for c in chunks)),
+            'sensitivity':sensitivity}
+
+#Module level, so cached results survive Streamlit reruns
+RELIABILITY_CACHE = sweep_cache.SweepCache(max_entries=RELIABILITY_CACHE_ENTRIES,spill_dir=None)
+
+def cached_reliability(*args,cache=RELIABILITY_CACHE,**kwargs):
+    """reliability() through a sweep cache, keyed on all of its inputs but workers, which do not change the result"""
+    key = cache.make_key(reliability=[(sorted(arg.items()) if isinstance(arg,dict) else arg) for arg in args],
+                         options=sorted((name,val) for name,val in kwargs.items() if name != 'workers'))
+    return cache.get_or_compute(key,lambda: reliability(*args,**kwargs))
@@ -0,0 +1,301 @@
+"""
+Append-only store of joint check results in SQLite.
+
+Every evaluated chord/brace pair is one row of the 'results' table, with the
+batch.RESULT_FIELDS columns, the inputs and the stress components
+(batch.DETAIL_FIELDS) in the units of the batch job files: mm, kN, kNm, MPa and
+degrees. Rows belong to a run of the 'runs' table, either an all-sizes sweep,
+keyed on the sweep cache key so that an identical sweep is only stored once, or
+a batch job file. The section names, stresses and pass/fail columns are indexed,
+so the app and the command line query stored results without recomputing.
+
+The store is only ever appended to. Several users can share one file: SQLite
+serialises the writers, and a sweep written twice at once is kept once. The app
+writes to the file named by HS_RESULTS_STORE on the server, never to a path
+given in the browser.
+
+    python results_store.py project.sqlite --runs
+    python results_store.py project.sqlite --chord "200 x 200%" --sigma-chord 0 20 --passed
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import batch
+import functions_vec as fvec
+
+FIELDS = (('run','int64'),) + batch.RESULT_FIELDS + batch.DETAIL_FIELDS
+SQL_TYPES = {'string':'TEXT','float64':'REAL','int64':'INTEGER','bool':'INTEGER'}
+INDEXED = ('run','chord','brace','sigma_chord','sigma_brace','passed')
+#Environment variable with the path of the app's results store
+STORE_ENV = "HS_RESULTS_STORE"
+#Sweep result arrays stored as columns: name in the sweep -> (column, factor to store units)
+SWEEP_COLUMNS = {'chord':('chord_row',1),'brace':('brace_row',1),
+                 'Ov':('Ov',1),'g_prime':('g_prime',1),'beta':('beta',1),'twogamma':('twogamma',1),'tau':('tau',1),
+                 'SCF_chax':('SCF_chax',1),'SCF_bax':('SCF_bax',1),'SCF_chch':('SCF_chch',1),
+                 'MF_chord':('MF_chord',1),'MF_brace':('MF_brace',1),'SCF_in_range':('SCF_in_range',1),
+                 'fail_code':('fail_code',1),'success':('geometry_ok',1),'dim_success':('dimensions_ok',1),
+                 'sigma_chord':('sigma_chord',1e-6),'sigma_brace':('sigma_brace',1e-6)}
+SWEEP_COLUMNS.update({name:(name,1e-6) for name in batch.STRESS_COMPONENTS})
+SWEEP_INPUTS = ('e','chordspacing','L_chord','div_chord','P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace',
+                'SCF_ch_op','SCF_br_op')
+
+def _messages(fail_code,gap,h0,dim_success):
+    """check_message of every row, built once per distinct (fail_code, gap, h0)"""
+    keys, inverse = np.unique(np.stack((fail_code,gap,h0),axis=1),axis=0,return_inverse=True)
+    unique = [fvec.check_message(int(code),bool(g),h) for code,g,h in keys]
+    dim = " | FAIL - Dimensional Parameters exceeded"
+    return [unique[i] + ("" if ok else dim) for i,ok in zip(inverse.ravel(),dim_success)]
+
+def sweep_columns(res,chord_type,chord,brace,inputs,code=None,brace_type=None,chord_names=None,brace_names=None):
+    """
+    Columns of store rows (lists) for the pairs of an all-sizes sweep.
+    chord, brace: the section arrays the sweep indices refer to
+    inputs: {name: SI value} of SWEEP_INPUTS
+    chord_names, brace_names: section labels indexed like chord and brace
+    sigma_max is not part of a sweep, so the stress_ok, passed and utilisation columns are empty.
+    """
+    n = len(res['chord'])
+    cols = {}
+    for name, (column, factor) in SWEEP_COLUMNS.items():
+        val = np.asarray(res[name])
+        cols[column] = (val * factor if factor != 1 else val).tolist()
+    cols['theta_deg'] = np.broadcast_to(np.degrees(res['theta']),(n,)).tolist()
+    cols['joint'] = np.where(res['gap'],"gap","overlap").tolist()
+    ch_ind, br_ind = np.asarray(res['chord']), np.asarray(res['brace'])
+    cols['message'] = _messages(np.asarray(res['fail_code']),np.asarray(res['gap']),chord['h'][ch_ind],
+                                np.asarray(res['dim_success']))
+    for name in SWEEP_INPUTS:
+        cols[name] = [inputs[name] / batch.SI_FACTORS[name]] * n
+    for name, names, ind in (('chord',chord_names,ch_ind),('brace',brace_names,br_ind)):
+        cols[name] = ([str(names[i]) for i in ind] if names is not None else [None] * n)
+    cols['id'] = [str(i) for i in range(n)]
+    cols['code'] = [code] * n
+    cols['chord_type'] = [chord_type] * n
+    cols['brace_type'] = [brace_type] * n
+    return cols
+
+def _sweep_meta(res):
+    """Entries of a sweep result that are not one value per pair (e.g. the pruning counts), as JSON"""
+    meta = {}
+    for name, val in res.items():
+        if isinstance(val,np.ndarray) and val.ndim == 0:
+            meta[name] = val.item()
+        elif not isinstance(val,np.ndarray):
+            meta[name] = val
+    return meta
+
+class ResultStore:
+    """
+    SQLite results store at path, created on first use.
+    Stresses in MPa, angles in degrees, inputs in job file units, see batch.py.
+    One connection is shared by the threads using the store, one call at a time.
+    """
+    def __init__(self,path,timeout=30.0):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path,timeout=timeout,check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY, key TEXT UNIQUE, "
+                              "source TEXT, created REAL, rows INTEGER, meta TEXT)")
+            columns = ", ".join(f"{name} {SQL_TYPES[dtype]}" for name,dtype in FIELDS)
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS results ({columns})")
+            for name in INDEXED:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS results_{name} ON results ({name})")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _insert_rows(self,run,rows):
+        names = [name for name,_ in FIELDS]
+        self.conn.executemany(f"INSERT INTO results VALUES ({', '.join('?' * len(names))})",
+                              ((run,) + tuple(row.get(name) for name in names[1:]) for row in rows))
+
+    def _insert_columns(self,run,cols,n):
+        names = [name for name,_ in FIELDS]
+        data = [[run] * n] + [cols.get(name,[None] * n) for name in names[1:]]
+        self.conn.executemany(f"INSERT INTO results VALUES ({', '.join('?' * len(names))})",zip(*data))
+
+    def begin_run(self,source,key=None,meta=None):
+        """New empty run, returns its number"""
+        with self.lock, self.conn:
+            cur = self.conn.execute("INSERT INTO runs (key, source, created, rows, meta) VALUES (?, ?, ?, 0, ?)",
+                                    (key,source,time.time(),json.dumps(meta or {})))
+        return cur.lastrowid
+
+    def append(self,run,rows):
+        """Append result rows (dicts of FIELDS, e.g. batch.run_chunk rows) to a run"""
+        with self.lock, self.conn:
+            self._insert_rows(run,rows)
+            self.conn.execute("UPDATE runs SET rows = rows + ? WHERE run = ?",(len(rows),run))
+
+    def find_run(self,key):
+        """Number of the run stored under key, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT run FROM runs WHERE key = ?",(key,)).fetchone()
+        return (None if row is None else row[0])
+
+    def add_sweep(self,key,res,chord_type,chord,brace,inputs,**labels):
+        """
+        Store an all-sizes sweep under its sweep cache key, in one transaction, unless
+        it is already stored. See sweep_columns() for the inputs. Returns the run number.
+        """
+        run = self.find_run(key)
+        if run is not None:
+            return run
+        inputs = {name:float(inputs[name]) for name in SWEEP_INPUTS}
+        cols = sweep_columns(res,chord_type,chord,brace,inputs,**labels)
+        n = len(res['chord'])
+        meta = {'sweep':_sweep_meta(res),'inputs':inputs,
+                'labels':{name:val for name,val in labels.items() if not name.endswith('_names')}}
+        with self.lock:
+            try:
+                with self.conn:
+                    cur = self.conn.execute("INSERT INTO runs (key, source, created, rows, meta) VALUES (?, ?, ?, ?, ?)",
+                                            (key,'sweep',time.time(),n,json.dumps(meta)))
+                    self._insert_columns(cur.lastrowid,cols,n)
+                return cur.lastrowid
+            except sqlite3.IntegrityError:
+                #Stored meanwhile by another thread or user of the file
+                return self.find_run(key)
+
+    def runs(self):
+        """List of dicts of the stored runs, newest first"""
+        with self.lock:
+            data = self.conn.execute("SELECT run, key, source, created, rows, meta FROM runs ORDER BY run DESC").fetchall()
+        return [dict(zip(('run','key','source','created','rows','meta'),row[:5] + (json.loads(row[5]),)))
+                for row in data]
+
+    def query(self,columns=None,run=None,source=None,chord=None,brace=None,chord_type=None,
+              sigma_chord=None,sigma_brace=None,passed=None,sigma_max=None,limit=None):
+        """
+        Stored rows matching all the given filters, as a list of dicts of columns (default all).
+        chord, brace: section names, or SQL LIKE patterns such as '200 x 200%'
+        sigma_chord, sigma_brace: (low, high) MPa, either end None for open
+        passed: True/False for joints that pass/fail. Sweep rows have no sigma_max of
+                their own, so they are only matched when sigma_max (MPa) is given, which
+                then replaces the stored one for every row
+        """
+        names = [name for name,_ in FIELDS]
+        columns = list(columns or names)
+        unknown = set(columns) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        where, params = [], []
+        for name, val in (('run',run),('chord_type',chord_type)):
+            if val is not None:
+                where.append(f"{name} = ?")
+                params.append(val)
+        if source is not None:
+            where.append("run IN (SELECT run FROM runs WHERE source = ?)")
+            params.append(source)
+        for name, pattern in (('chord',chord),('brace',brace)):
+            if pattern is not None:
+                where.append(f"{name} LIKE ?")
+                params.append(pattern)
+        for name, bounds in (('sigma_chord',sigma_chord),('sigma_brace',sigma_brace)):
+            low, high = (bounds or (None,None))
+            if low is not None:
+                where.append(f"{name} >= ?")
+                params.append(low)
+            if high is not None:
+                where.append(f"{name} <= ?")
+                params.append(high)
+        if passed is not None:
+            if sigma_max is None:
+                condition = "passed = 1"
+            else:
+                condition = "(geometry_ok = 1 AND dimensions_ok = 1 AND sigma_chord <= ? AND sigma_brace <= ?)"
+                params += [sigma_max,sigma_max]
+            where.append(condition if passed else f"NOT {condition}")
+        sql = f"SELECT {', '.join(columns)} FROM results"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            data = self.conn.execute(sql,params).fetchall()
+        types = dict(FIELDS)
+        rows = []
+        for values in data:
+            row = dict(zip(columns,values))
+            for name in columns:
+                if types[name] == 'bool' and row[name] is not None:
+                    row[name] = bool(row[name])
+            rows.append(row)
+        return rows
+
+@lru_cache(maxsize=None)
+def open_store(path):
+    """ResultStore of path shared by the callers, e.g. kept open across Streamlit reruns"""
+    return ResultStore(path)
+
+def app_store():
+    """The app's shared ResultStore, at the STORE_ENV path set on the server, or None when it is not set"""
+    path = os.environ.get(STORE_ENV)
+    return (open_store(path) if path else None)
+
+class StoreResultWriter:
+    """batch result writer appending each chunk to a new run of a results store"""
+    def __init__(self,path):
+        self.store = ResultStore(path)
+        self.run = self.store.begin_run('batch')
+
+    def write(self,rows):
+        self.store.append(self.run,rows)
+
+    def close(self):
+        self.store.close()
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Query a results store, writing the matching rows as CSV.")
+    parser.add_argument('store',help="results store (.sqlite)")
+    parser.add_argument('--runs',action='store_true',help="list the stored runs instead")
+    parser.add_argument('--run',type=int)
+    parser.add_argument('--source',choices=('sweep','batch'))
+    parser.add_argument('--chord',help="chord name or SQL LIKE pattern, e.g. '200 x 200%%'")
+    parser.add_argument('--brace',help="brace name or SQL LIKE pattern")
+    parser.add_argument('--chord-type',choices=('SHS','RHS','CHS'))
+    parser.add_argument('--sigma-chord',type=float,nargs=2,metavar=('LOW','HIGH'),help="chord stress range (MPa)")
+    parser.add_argument('--sigma-brace',type=float,nargs=2,metavar=('LOW','HIGH'),help="brace stress range (MPa)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--passed',action='store_const',const=True,dest='passed')
+    group.add_argument('--failed',action='store_const',const=False,dest='passed')
+    parser.add_argument('--sigma-max',type=float,help="allowable stress (MPa) for --passed/--failed, needed for sweeps")
+    parser.add_argument('--columns',help="comma separated columns, default all")
+    parser.add_argument('--limit',type=int)
+    args = parser.parse_args(argv)
+    store = ResultStore(args.store)
+    try:
+        if args.runs:
+            rows = [{name:(json.dumps(val) if name == 'meta' else val) for name,val in run.items()}
+                    for run in store.runs()]
+            fieldnames = ['run','key','source','created','rows','meta']
+        else:
+            fieldnames = (args.columns.split(",") if args.columns else None)
+            rows = store.query(columns=fieldnames,run=args.run,source=args.source,
+                               chord=args.chord,brace=args.brace,chord_type=args.chord_type,
+                               sigma_chord=args.sigma_chord,sigma_brace=args.sigma_brace,
+                               passed=args.passed,sigma_max=args.sigma_max,limit=args.limit)
+            fieldnames = fieldnames or [name for name,_ in FIELDS]
+    finally:
+        store.close()
+    writer = csv.DictWriter(sys.stdout,fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(cli())
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import tempfile
+
+#Default location of the on-disk cache, shared by every session and server worker on the machine
+DEFAULT_CACHE_DIR = os.environ.get("HS_SECTION_CACHE",
+                        os.path.join(os.path.expanduser("~"),".cache","hs_truss_fatigue","sections"))
+DEFAULT_MAX_ENTRIES = 2000
+
+class SectionCache:
+    """
+    Content addressed on-disk cache for finite element section properties.
+    Each entry is a small JSON file named by the SHA-256 of its key, so separate
+    processes share results without any locking. Writes go to a temporary file
+    and are moved into place, so readers never see a partial entry.
+    Least recently used entries (by file modification time, refreshed on every hit)
+    are removed once there are more than max_entries files.
+    """
+    def __init__(self,cache_dir=DEFAULT_CACHE_DIR,max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(shape,d,b,t,r_out,**mesh):
+        """Key of a section: shape, dimensions (m, rounded to remove float noise) and mesh settings"""
+        dims = [round(float(x),12) for x in (d,b,t,r_out)]
+        mesh = {name:(round(float(val),15) if isinstance(val,float) else val) for name,val in sorted(mesh.items())}
+        return json.dumps([shape,dims,mesh])
+
+    def _path(self,key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir,digest + ".json")
+
+    def get(self,key):
+        """Cached value for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError,ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def put(self,key,value):
+        """Store a JSON serialisable value and evict the oldest entries above max_entries"""
+        os.makedirs(self.cache_dir,exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir,suffix=".tmp")
+        with os.fdopen(fd,"w") as f:
+            json.dump({"key":key,"value":value},f)
+        os.replace(tmp_path,self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    entries.append((entry.stat().st_mtime,entry.path))
+                except OSError:
+                    pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_or_compute(self,key,func):
+        """Return the cached value for key, computing and storing it with func() on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = func()
+            self.put(key,value)
+        return value
+
+default_cache = SectionCache()
@@ -0,0 +1,237 @@
+"""
+Local HTTP/JSON service for joint checks.
+
+    python service.py --port 8765
+
+POST /check with one job object, or an array of jobs, in the format of the
+batch job files (see batch.py); the response holds the result rows, an object
+for a single job and an array for an array. GET /metrics reports throughput
+and latency, GET /health answers "ok".
+
+Requests are handled on their own threads, but are not evaluated there: their
+jobs are queued, and one worker collects the jobs arriving within a short
+window (up to max_batch jobs) and evaluates them together with
+batch.run_chunk, one vectorised joint_check per chord type. Many small
+concurrent requests thus cost a few large batches. The catalogue memory map and
+the SCF interpolators are loaded once at startup and stay warm between batches.
+
+The server binds to localhost only. service_client.py is a stand-in client for
+load tests.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import batch
+import catalogue
+import functions as fnc
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+#Seconds the worker waits for more jobs after the first of a batch arrives
+DEFAULT_WINDOW = 0.002
+DEFAULT_MAX_BATCH = batch.DEFAULT_CHUNK_SIZE
+#Request latencies kept for the percentiles of /metrics
+LATENCY_SAMPLES = 10000
+
+class Metrics:
+    """Thread-safe counters of requests, joints and batches, and recent request latencies"""
+    def __init__(self,samples=LATENCY_SAMPLES):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.joints = 0
+        self.batches = 0
+        self.batch_time = 0.0
+        self.largest_batch = 0
+        self.latency = deque(maxlen=samples)
+
+    def record_batch(self,joints,seconds):
+        with self.lock:
+            self.batches += 1
+            self.joints += joints
+            self.batch_time += seconds
+            self.largest_batch = max(self.largest_batch,joints)
+
+    def record_request(self,seconds):
+        with self.lock:
+            self.requests += 1
+            self.latency.append(seconds)
+
+    def snapshot(self):
+        """Dict of the counters, throughput (joints/s of uptime and of evaluation) and latency percentiles (ms)"""
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            latency = np.array(self.latency) * 1000
+            out = {'uptime_s':uptime, 'requests':self.requests, 'joints':self.joints, 'batches':self.batches,
+                   'mean_batch_size':(self.joints / self.batches if self.batches else 0.0),
+                   'largest_batch':self.largest_batch,
+                   'joints_per_s':(self.joints / uptime if uptime > 0 else 0.0),
+                   'evaluated_joints_per_s':(self.joints / self.batch_time if self.batch_time > 0 else 0.0)}
+        for p in (50,95,99):
+            out[f'latency_p{p}_ms'] = (float(np.percentile(latency,p)) if len(latency) else None)
+        out['latency_max_ms'] = (float(latency.max()) if len(latency) else None)
+        return out
+
+class Coalescer:
+    """
+    Queue of job lists evaluated in coalesced batches by one worker thread.
+    submit() blocks until the jobs of its request are done.
+    """
+    def __init__(self,window=DEFAULT_WINDOW,max_batch=DEFAULT_MAX_BATCH,metrics=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = metrics or Metrics()
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run,name="joint-check-batches",daemon=True)
+        self.worker.start()
+
+    def submit(self,jobs):
+        """Result rows of a list of raw jobs, in order (see batch.run_chunk)"""
+        start = time.monotonic()
+        future = Future()
+        #Jobs without an id are numbered within their request, not within the batch
+        jobs = [(job if 'id' in job else dict(job,id=i)) for i,job in enumerate(jobs)]
+        self.queue.put((jobs,future))
+        rows = future.result()
+        self.metrics.record_request(time.monotonic() - start)
+        return rows
+
+    def close(self):
+        self.queue.put(None)
+        self.worker.join()
+
+    def _collect(self,first):
+        """The first request and those queued within the window, up to max_batch jobs. None ends the worker"""
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            pending = self._collect(first)
+            jobs = [job for item in pending for job in item[0]]
+            start = time.monotonic()
+            try:
+                rows = batch.run_chunk(jobs)
+            except Exception:
+                #Evaluate each request on its own, so only the one that raised fails
+                for request_jobs, future in pending:
+                    try:
+                        future.set_result(batch.run_chunk(request_jobs))
+                    except Exception as error:
+                        future.set_exception(error)
+                self.metrics.record_batch(len(jobs),time.monotonic() - start)
+                continue
+            self.metrics.record_batch(len(jobs),time.monotonic() - start)
+            offset = 0
+            for request_jobs, future in pending:
+                future.set_result(rows[offset:offset + len(request_jobs)])
+                offset += len(request_jobs)
+
+def warm_up():
+    """Load the catalogue and SCF interpolators ahead of the first request"""
+    catalogue.load()
+    fnc.SCF_interpolators()
+
+class JointCheckServer(ThreadingHTTPServer):
+    daemon_threads = True
+    #Room for bursts of connections from many concurrent clients
+    request_queue_size = 128
+
+class JointCheckHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self,status,body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type","application/json")
+        self.send_header("Content-Length",str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200,self.server.coalescer.metrics.snapshot())
+        elif self.path == "/health":
+            self._send(200,"ok")
+        else:
+            self._send(404,{'error':f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/check":
+            self._send(404,{'error':f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length",0))))
+        except ValueError as error:
+            self._send(400,{'error':f"Invalid JSON: {error}"})
+            return
+        single = isinstance(body,dict)
+        jobs = ([body] if single else body)
+        if not isinstance(jobs,list) or not all(isinstance(job,dict) for job in jobs):
+            self._send(400,{'error':"Expected a job object or an array of job objects"})
+            return
+        try:
+            rows = self.server.coalescer.submit(jobs)
+        except Exception as error:
+            #Answer rather than drop the connection, so the client is not left waiting
+            self._send(500,{'error':f"{type(error).__name__}: {error}"})
+            return
+        self._send(200,(rows[0] if single else rows))
+
+    def log_message(self,format,*args):
+        #Access logs would cost more than small requests, /metrics covers the traffic
+        pass
+
+def make_server(host=DEFAULT_HOST,port=DEFAULT_PORT,window=DEFAULT_WINDOW,max_batch=DEFAULT_MAX_BATCH):
+    """Threaded HTTP server with its Coalescer (server.coalescer). Port 0 picks a free port"""
+    warm_up()
+    server = JointCheckServer((host,port),JointCheckHandler)
+    server.coalescer = Coalescer(window,max_batch)
+    return server
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Serve joint checks over HTTP/JSON on this machine.")
+    parser.add_argument('--port',type=int,default=DEFAULT_PORT)
+    parser.add_argument('--window',type=float,default=DEFAULT_WINDOW*1000,help="batching window (ms)")
+    parser.add_argument('--max-batch',type=int,default=DEFAULT_MAX_BATCH,help="most jobs evaluated per batch")
+    args = parser.parse_args(argv)
+    server = make_server(DEFAULT_HOST,args.port,args.window / 1000,args.max_batch)
+    print(f"Serving joint checks on http://{DEFAULT_HOST}:{server.server_address[1]}/check")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.coalescer.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(cli())
@@ -0,0 +1,112 @@
+"""
+Stand-in client of service.py, for load tests.
+
+It plays the part of a frame analysis post-processor: many workers each post
+small requests of random catalogue joints as fast as the service answers, then
+client-side throughput and latency are reported next to the service metrics.
+
+    python service.py &
+    python service_client.py --clients 32 --requests 200 --joints 4
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+import catalogue
+import service
+
+class JointCheckClient:
+    """Minimal JSON client of a service.py server"""
+    def __init__(self,url=f"http://{service.DEFAULT_HOST}:{service.DEFAULT_PORT}",timeout=60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self,path,body=None):
+        data = (None if body is None else json.dumps(body).encode())
+        request = urllib.request.Request(self.url + path,data=data,headers={"Content-Type":"application/json"})
+        with urllib.request.urlopen(request,timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def check(self,jobs):
+        """Result row of one job (dict), or rows of a list of jobs"""
+        return self._request("/check",jobs)
+
+    def metrics(self):
+        return self._request("/metrics")
+
+def random_jobs(n,rng,code="AS"):
+    """n random SHS chord/brace joints of the catalogue in job file format, with the brace narrower than the chord"""
+    table = catalogue.load().table(code,"SHS")
+    widths = np.asarray(table.b)
+    jobs = []
+    for _ in range(n):
+        chord = int(rng.integers(len(table)))
+        narrower = np.flatnonzero(widths < widths[chord])
+        brace = int(rng.choice(narrower)) if len(narrower) else chord
+        jobs.append({'code':code,'chord_type':"SHS",'chord':str(table.name[chord]),'brace':str(table.name[brace]),
+                     'e':float(rng.uniform(-50,50)),'chordspacing':float(rng.uniform(1000,3000)),
+                     'L_chord':8000.0,'div_chord':4,
+                     'P_chord':float(rng.uniform(-200,200)),'P_brace':float(rng.uniform(-100,100)),
+                     'M_ip_chord':float(rng.uniform(0,10)),'M_op_chord':float(rng.uniform(0,5)),
+                     'M_op_brace':float(rng.uniform(0,5))})
+    return jobs
+
+def load_test(url,clients=16,requests=100,joints=1,seed=0):
+    """
+    clients threads each posting requests requests of joints random jobs.
+    Returns a dict of client-side throughput (joints/s) and latency percentiles (ms),
+    and the service metrics after the test
+    """
+    client = JointCheckClient(url)
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(clients)]
+    payloads = [[random_jobs(joints,rng) for _ in range(requests)] for rng in rngs]
+    latencies = [[] for _ in range(clients)]
+    errors = []
+
+    def worker(k):
+        for jobs in payloads[k]:
+            start = time.perf_counter()
+            try:
+                rows = client.check(jobs)
+            except OSError as error:
+                errors.append(error)
+                continue
+            latencies[k].append(time.perf_counter() - start)
+            if len(rows) != len(jobs):
+                errors.append(ValueError(f"{len(rows)} results for {len(jobs)} jobs"))
+
+    threads = [threading.Thread(target=worker,args=(k,)) for k in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latency = np.concatenate([np.array(l) for l in latencies]) * 1000
+    done = len(latency)
+    out = {'requests':done, 'joints':done * joints, 'errors':len(errors), 'seconds':elapsed,
+           'requests_per_s':done / elapsed, 'joints_per_s':done * joints / elapsed}
+    for p in (50,95,99):
+        out[f'latency_p{p}_ms'] = (float(np.percentile(latency,p)) if done else None)
+    out['service'] = client.metrics()
+    return out
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running joint check service.")
+    parser.add_argument('--url',default=f"http://{service.DEFAULT_HOST}:{service.DEFAULT_PORT}")
+    parser.add_argument('--clients',type=int,default=16,help="concurrent client threads")
+    parser.add_argument('--requests',type=int,default=100,help="requests per client")
+    parser.add_argument('--joints',type=int,default=1,help="joints per request")
+    parser.add_argument('--seed',type=int,default=0)
+    args = parser.parse_args(argv)
+    out = load_test(args.url,args.clients,args.requests,args.joints,args.seed)
+    print(json.dumps(out,indent=1))
+    return (1 if out['errors'] else 0)
+
+if __name__ == '__main__':
+    sys.exit(cli())
@@ -0,0 +1,200 @@
+"""
+Incremental recomputation of the joint check.
+
+functions_vec.joint_check is split into stages that depend on separate input
+groups: geometry drives the overlap, section properties the dimensional
+parameters, the checks and the SCFs, forces only the nominal stresses, and
+sigma_max only the final comparison. StageGraph wires the stages together and
+keeps a small memo on each node, keyed on the values of its own inputs and the
+results of the nodes it depends on. On a Streamlit rerun where only P_brace
+changed, the SCFs are reused and only the stresses and the comparison run.
+
+The same graph serves both modes: all-sizes mode passes the section tables and
+the pairs to check, single_joint() wraps one pair and returns plain floats like
+functions.joint_check.
+"""
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import functions_vec as fvec
+import sweep
+
+GEOMETRY = ('e','chordspacing','L_chord','div_chord')
+FORCES = ('P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace')
+DEFAULT_MEMO_SIZE = 4
+
+def fingerprint(value):
+    """Hashable key of an input value; arrays are keyed on a digest of their contents"""
+    if isinstance(value,np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).view(np.uint8),digest_size=16).hexdigest()
+        return ('ndarray',value.dtype.str,value.shape,digest)
+    if isinstance(value,(tuple,list)):
+        return tuple(fingerprint(val) for val in value)
+    if isinstance(value,np.generic):
+        return value.item()
+    return value
+
+_versions = itertools.count(1)
+
+class Node:
+    """One stage: func is called with the named graph inputs and the outputs of the nodes in after"""
+    def __init__(self,name,func,inputs=(),after=(),memo_size=DEFAULT_MEMO_SIZE):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.after = tuple(after)
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        #Shared graphs serve every Streamlit session thread. The stage itself runs outside the lock
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self,inputs,upstream):
+        """Return (version, outputs), from the memo when the inputs and upstream results are unchanged.
+        The version identifies a result, so downstream nodes key on it instead of the values"""
+        key = (tuple(fingerprint(inputs[name]) for name in self.inputs),
+               tuple(upstream[name][0] for name in self.after))
+        with self.lock:
+            result = self.memo.get(key)
+            if result is not None:
+                self.memo.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+        kwargs = {name:inputs[name] for name in self.inputs}
+        for name in self.after:
+            kwargs.update(upstream[name][1])
+        result = (next(_versions),self.func(**kwargs))
+        with self.lock:
+            self.memo[key] = result
+            self.memo.move_to_end(key)
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.memo.clear()
+
+class StageGraph:
+    """Calculation stages run in the order they were added, each through its own memo"""
+    def __init__(self):
+        self.nodes = OrderedDict()
+
+    def add(self,name,func,inputs=(),after=(),memo_size=DEFAULT_MEMO_SIZE):
+        for dep in after:
+            if dep not in self.nodes:
+                raise ValueError(f"Stage '{name}' depends on '{dep}', which has not been added")
+        self.nodes[name] = Node(name,func,inputs,after,memo_size)
+
+    def run(self,**inputs):
+        """Evaluate every stage and return the merged outputs of all of them"""
+        upstream = {}
+        res = {}
+        for name, node in self.nodes.items():
+            upstream[name] = node.run(inputs,upstream)
+            res.update(upstream[name][1])
+        return res
+
+    def recomputed(self):
+        """Number of times each stage has run (memo misses)"""
+        return {name:node.misses for name, node in self.nodes.items()}
+
+    def clear(self):
+        for node in self.nodes.values():
+            node.clear()
+
+def _pairs(chord_type,chord,brace,e,chordspacing,L_chord,div_chord):
+    pairs, pruned = sweep.candidate_pairs(chord_type,chord,brace,e,chordspacing,L_chord,div_chord)
+    return {'pairs':pairs, 'pruned':pruned}
+
+def _given_pairs(pairs):
+    return {'pairs':pairs}
+
+def _sections(chord,brace,pairs,**_):
+    ch_ind, br_ind = (fvec.all_pairs(chord,brace) if pairs is None else pairs)
+    return {'chord':ch_ind, 'brace':br_ind, 'ch':chord[ch_ind], 'br':brace[br_ind]}
+
+def _stresses(ch,br,theta,MF_chord,MF_brace,SCF_chax,SCF_bax,SCF_chch,
+              P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op,
+              MF_chord_input,MF_brace_input,**_):
+    #Manual magnification factors replace the T2.1/2.2 defaults of the checks stage
+    MF_chord = (MF_chord if MF_chord_input is None else np.full(np.shape(MF_chord),MF_chord_input))
+    MF_brace = (MF_brace if MF_brace_input is None else np.full(np.shape(MF_brace),MF_brace_input))
+    res = fvec.stresses_stage(ch,br,theta,MF_chord,MF_brace,SCF_chax,SCF_bax,SCF_chch,
+                              P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op)
+    res.update({'MF_chord':MF_chord, 'MF_brace':MF_brace})
+    return res
+
+def joint_graph(prune=False):
+    """
+    Stage graph of functions_vec.joint_check. Inputs are the arguments of joint_check
+    (SI units) plus MF_chord_input/MF_brace_input for manual magnification factors.
+    prune: generate the pairs with sweep.candidate_pairs (outputs 'pairs' and 'pruned')
+    instead of taking them from the 'pairs' input
+    """
+    graph = StageGraph()
+    if prune:
+        graph.add('pairs',_pairs,inputs=('chord_type','chord','brace') + GEOMETRY)
+    else:
+        graph.add('pairs',_given_pairs,inputs=('pairs',))
+    graph.add('sections',_sections,inputs=('chord','brace'),after=('pairs',))
+    graph.add('overlap',lambda ch,br,e,chordspacing,L_chord,div_chord,**_:
+                            fvec.overlap_stage(ch,br,e,chordspacing,L_chord,div_chord),
+              inputs=GEOMETRY,after=('sections',))
+    graph.add('dim_params',lambda chord_type,ch,br,**_: fvec.dim_params_stage(chord_type,ch,br),
+              inputs=('chord_type',),after=('sections',))
+    graph.add('checks',lambda chord_type,e,ch,Ov,theta,g_prime,tau,**_:
+                            fvec.checks_stage(chord_type,ch,e,Ov,theta,g_prime,tau),
+              inputs=('chord_type','e'),after=('sections','overlap','dim_params'))
+    graph.add('SCF',lambda chord_type,beta,twogamma,tau,Ov,g_prime,theta,gap,**_:
+                            fvec.SCF_stage(chord_type,beta,twogamma,tau,Ov,g_prime,theta,gap),
+              inputs=('chord_type',),after=('overlap','dim_params','checks'))
+    graph.add('stresses',_stresses,
+              inputs=FORCES + ('SCF_ch_op','SCF_br_op','MF_chord_input','MF_brace_input'),
+              after=('sections','overlap','checks','SCF'))
+    graph.add('stress_check',lambda sigma_max,sigma_chord,sigma_brace,**_:
+                            fvec.stress_check_stage(sigma_chord,sigma_brace,sigma_max),
+              inputs=('sigma_max',),after=('stresses',))
+    return graph
+
+#Graphs live at module level so their memos persist across Streamlit reruns of main.py
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def graph(mode):
+    """Shared graph for 'single' (one joint) or 'all' (pruned all-sizes sweep) mode"""
+    with _graphs_lock:
+        if mode not in _graphs:
+            _graphs[mode] = joint_graph(prune=(mode == 'all'))
+        return _graphs[mode]
+
+def run(graph,chord_type,chord,brace,
+        e,chordspacing,L_chord,div_chord,
+        P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+        sigma_max,SCF_ch_op,SCF_br_op,pairs=None,MF_chord=None,MF_brace=None):
+    """functions_vec.joint_check through the stage graph, with the same arguments and outputs"""
+    res = graph.run(chord_type=chord_type,chord=chord,brace=brace,pairs=pairs,
+                    e=e,chordspacing=chordspacing,L_chord=L_chord,div_chord=div_chord,
+                    P_chord=P_chord,P_brace=P_brace,M_ip_chord=M_ip_chord,M_op_chord=M_op_chord,
+                    M_op_brace=M_op_brace,sigma_max=sigma_max,SCF_ch_op=SCF_ch_op,SCF_br_op=SCF_br_op,
+                    MF_chord_input=MF_chord,MF_brace_input=MF_brace)
+    del res['ch'], res['br']
+    return res
+
+def single_joint(graph,chord_type,chord_props,brace_props,*args,MF_chord=None,MF_brace=None):
+    """functions.joint_check through the stage graph: one joint from (b,h,t,A,Ix,Iy) tuples,
+    with plain float results and the check message"""
+    chord = fvec.section_array([chord_props])
+    brace = fvec.section_array([brace_props])
+    res = run(graph,chord_type,chord,brace,*args,pairs=(np.zeros(1,dtype=int),np.zeros(1,dtype=int)),
+              MF_chord=MF_chord,MF_brace=MF_brace)
+    out = {key:(None if val is None else np.asarray(val).reshape(-1)[0].item())
+           for key,val in res.items() if key not in ('pairs','chord','brace')}
+    out['message'] = fvec.check_message(out['fail_code'],out['gap'],chord_props[1])
+    return out
@@ -0,0 +1,231 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import catalogue
+import functions as fnc
+import functions_vec as fvec
+import tracing
+
+#Order in which the pruning rules are applied, each rule only counts pairs that survived the previous ones
+PRUNE_RULES = ("width","twogamma","eccentricity","beta","tau","angle","gap_overlap")
+
+def _within(x,lo,hi):
+    return (lo <= x) & (x <= hi)
+
+@tracing.traced("pair pruning")
+def candidate_pairs(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,brace_sorted=None):
+    """
+    Generate only the chord/brace pairs that can pass the joint checks, before any SCF work.
+    chord, brace: structured arrays of functions_vec.SECTION_DTYPE
+    brace_sorted: optional brace row order sorted on b (e.g. catalogue.Table.sorted['b'])
+
+    Chord-only rules (2*gamma, e/h0) drop whole rows of the grid. The beta window is
+    turned into a b1 range for each chord and found by binary search on the sorted
+    brace widths, so pairs outside it are never generated. tau, the angle and the
+    gap/overlap limits of check_angle_ecc_gap are then evaluated in bulk.
+
+    Returns:
+    pairs: (chord index, brace index) arrays in the chord-major order of functions_vec.all_pairs
+    pruned: dict of the number of pairs removed by each rule in PRUNE_RULES, plus 'total' and 'feasible'
+    """
+    tau_min,tau_max,beta_min,beta_max,twogamma_min,twogamma_max = fnc.dim_limits(chord_type)
+    order_b = (np.argsort(brace['b'],kind='stable') if brace_sorted is None else np.asarray(brace_sorted))
+    b_sorted = brace['b'][order_b]
+    b0, h0, t0 = chord['b'], chord['h'], chord['t']
+    pruned = {'total':len(chord) * len(brace)}
+
+    #Brace no wider than the chord, as in the original nested loop
+    n_width = np.searchsorted(b_sorted,b0,side='right')
+    pruned['width'] = pruned['total'] - int(n_width.sum())
+
+    #Chord-only rules
+    twogamma_ok = _within(b0 / t0,twogamma_min,twogamma_max)
+    pruned['twogamma'] = int(n_width[~twogamma_ok].sum())
+    ecc_ok = _within(e / h0,-0.55,0.25)
+    pruned['eccentricity'] = int(n_width[twogamma_ok & ~ecc_ok].sum())
+    live = np.nonzero(twogamma_ok & ecc_ok)[0]
+
+    #beta window as a range of brace widths, widened slightly so round-off never loses a pair;
+    #the exact ratio is re-checked below
+    lo = np.searchsorted(b_sorted,beta_min * b0[live] * (1 - 1e-12),side='left')
+    hi = np.searchsorted(b_sorted,min(beta_max,1.0) * b0[live] * (1 + 1e-12),side='right')
+    hi = np.minimum(hi,n_width[live])
+    counts = np.maximum(hi - lo,0)
+    ch_ind = np.repeat(live,counts)
+    starts = np.repeat(lo - np.cumsum(counts) + counts,counts)
+    br_ind = order_b[starts + np.arange(counts.sum())]
+    beta, twogamma, tau = fvec.dim_params(b0[ch_ind],t0[ch_ind],brace['b'][br_ind],brace['t'][br_ind])
+    beta_ok = _within(beta,beta_min,beta_max)
+    pruned['beta'] = int(n_width[live].sum()) - int(beta_ok.sum())
+    tau_ok = _within(tau,tau_min,tau_max)
+    pruned['tau'] = int((beta_ok & ~tau_ok).sum())
+    keep = beta_ok & tau_ok
+    ch_ind, br_ind, tau = ch_ind[keep], br_ind[keep], tau[keep]
+
+    #Geometry rules for the current truss, evaluated in bulk on the remaining pairs
+    with np.errstate(divide='ignore',invalid='ignore'):
+        Ov, theta, g_prime = fvec.overlap(L_chord,chordspacing,div_chord,e,h0[ch_ind],brace['h'][br_ind],t0[ch_ind])
+        success, fail_code, gap = fvec.check_angle_ecc_gap(chord_type,theta,e,h0[ch_ind],Ov,g_prime,tau)
+    angle_ok = (fail_code & fvec.ANGLE_FAIL) == 0
+    pruned['angle'] = int((~angle_ok).sum())
+    pruned['gap_overlap'] = int((angle_ok & ~success).sum())
+    ch_ind, br_ind = ch_ind[success], br_ind[success]
+    pruned['feasible'] = len(ch_ind)
+
+    order = np.lexsort((br_ind,ch_ind))
+    return (ch_ind[order], br_ind[order]), pruned
+
+#Section families of the all-sizes sweep, (chord type, brace type) as offered in the sidebar
+FAMILIES = (("SHS","SHS"),("SHS","RHS"),("RHS","SHS"),("RHS","RHS"),("CHS","CHS"))
+CODES = ("AS","EN")
+#Result arrays kept from functions_vec.joint_check for each design case
+RESULT_KEYS = ('chord','brace','gap','success','dim_success','SCF_chax','SCF_bax','SCF_chch',
+               'sigma_chord','sigma_brace','success_stress')
+
+#Section arrays of the worker process, views onto the parent's shared memory block
+_worker_sections = {}
+
+def _pack_sections(tables):
+    """Copy every section array into one shared memory block.
+    Returns the block and the layout {key: (offset, rows)} needed to rebuild views in the workers"""
+    itemsize = fvec.SECTION_DTYPE.itemsize
+    layout = {}
+    offset = 0
+    for key, arr in tables.items():
+        layout[key] = (offset,len(arr))
+        offset += len(arr) * itemsize
+    shm = shared_memory.SharedMemory(create=True,size=max(offset,1))
+    for key, arr in tables.items():
+        start, rows = layout[key]
+        np.ndarray(rows,dtype=fvec.SECTION_DTYPE,buffer=shm.buf,offset=start)[:] = arr
+    return shm, layout
+
+def _attach_sections(shm_name,layout):
+    """Worker initialiser: map the shared section arrays without copying or pickling them"""
+    #Pool workers share the parent's resource tracker, so the parent's unlink releases the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_sections['_shm'] = shm
+    for key, (start, rows) in layout.items():
+        _worker_sections[key] = np.ndarray(rows,dtype=fvec.SECTION_DTYPE,buffer=shm.buf,offset=start)
+
+def _run_task(task):
+    """Evaluate one chord row range of one design case against every brace"""
+    case, chord_key, brace_key, start, stop = task
+    chord_type = chord_key[1]
+    chord = _worker_sections[chord_key][start:stop]
+    brace = _worker_sections[brace_key]
+    geometry = case['geometry']
+    if case['prune']:
+        pairs, _ = candidate_pairs(chord_type,chord,brace,**geometry)
+    else:
+        pairs = fvec.all_pairs(chord,brace)
+    res = fvec.joint_check(chord_type,chord,brace,pairs=pairs,**geometry,**case['loads'])
+    out = {key:res[key] for key in RESULT_KEYS}
+    out['chord'] = out['chord'] + start
+    return out
+
+def _balanced_ranges(chord,brace,n_chunks):
+    """Split chord rows into at most n_chunks contiguous ranges with about the same number of pairs"""
+    work = np.searchsorted(np.sort(brace['b']),chord['b'],side='right')
+    cum = np.concatenate(([0],np.cumsum(work)))
+    targets = np.linspace(0,cum[-1],n_chunks + 1)[1:-1]
+    cuts = np.unique(np.concatenate(([0],np.searchsorted(cum,targets,side='left'),[len(chord)])))
+    return list(zip(cuts[:-1],cuts[1:]))
+
+@tracing.traced("design space sweep")
+def design_space(geometries,loads,codes=CODES,families=FAMILIES,workers=None,prune=True,chunks_per_worker=4):
+    """
+    Sweep every code x (chord type, brace type) family x geometry case over a process pool.
+    geometries: list of dicts of e, chordspacing, L_chord, div_chord (SI)
+    loads: dict of P_chord, P_brace, M_ip_chord, M_op_chord, M_op_brace, sigma_max, SCF_ch_op, SCF_br_op (SI)
+    workers: number of processes, default os.cpu_count(); 1 runs in this process
+
+    Section arrays are placed once in shared memory. Work is split into chord row
+    ranges of roughly equal pair counts for every case, and the results are merged
+    back in case order. CHS families use e = 0, as the sidebar does.
+
+    Returns a list of dicts, one per (code, chord type, brace type, geometry) case,
+    holding the RESULT_KEYS arrays of functions_vec.joint_check.
+    """
+    workers = (os.cpu_count() if workers is None else workers)
+    cat = catalogue.load()
+    tables = {}
+    cases = []
+    for code in codes:
+        for chord_type, brace_type in families:
+            for key in ((code,chord_type),(code,brace_type)):
+                if key not in tables:
+                    tables[key] = cat.table(*key).section_array()
+            for geometry in geometries:
+                geometry = dict(geometry)
+                if chord_type == "CHS":
+                    geometry['e'] = 0.0
+                cases.append({'code':code,'chord_type':chord_type,'brace_type':brace_type,
+                              'geometry':geometry,'loads':dict(loads),'prune':prune})
+
+    n_chunks = int(np.ceil(workers * chunks_per_worker / len(cases)))
+    tasks = []
+    task_case = []
+    for i, case in enumerate(cases):
+        chord_key = (case['code'],case['chord_type'])
+        brace_key = (case['code'],case['brace_type'])
+        for start, stop in _balanced_ranges(tables[chord_key],tables[brace_key],n_chunks):
+            tasks.append((case,chord_key,brace_key,int(start),int(stop)))
+            task_case.append(i)
+
+    if workers == 1:
+        _worker_sections.update(tables)
+        try:
+            outputs = [_run_task(task) for task in tasks]
+        finally:
+            _worker_sections.clear()
+    else:
+        shm, layout = _pack_sections(tables)
+        try:
+            with ProcessPoolExecutor(max_workers=workers,initializer=_attach_sections,
+                                     initargs=(shm.name,layout)) as pool:
+                outputs = list(pool.map(_run_task,tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results = []
+    for i, case in enumerate(cases):
+        parts = [out for out,j in zip(outputs,task_case) if j == i]
+        merged = {key:np.concatenate([part[key] for part in parts]) for key in RESULT_KEYS}
+        merged.update({key:case[key] for key in ('code','chord_type','brace_type','geometry')})
+        results.append(merged)
+    return results
+
+def cli(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Sweep every code, section family and geometry case on all cores.")
+    parser.add_argument('--e',type=float,nargs='+',default=[-100.],help="eccentricities (mm)")
+    parser.add_argument('--chordspacing',type=float,nargs='+',default=[2000.],help="chord spacings (mm)")
+    parser.add_argument('--L-chord',type=float,nargs='+',default=[8000.],help="chord lengths (mm)")
+    parser.add_argument('--div-chord',type=int,nargs='+',default=[4],help="chord divisions")
+    parser.add_argument('--forces',type=float,nargs=5,default=[70.,50.,5.,5.,5.],
+                        metavar=('P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace'),help="kN and kNm")
+    parser.add_argument('--sigma-max',type=float,default=24.,help="MPa")
+    parser.add_argument('--workers',type=int,default=None)
+    args = parser.parse_args(argv)
+    geometries = [{'e':e/1000,'chordspacing':cs/1000,'L_chord':L/1000,'div_chord':div}
+                  for e in args.e for cs in args.chordspacing for L in args.L_chord for div in args.div_chord]
+    P_chord, P_brace, M_ip_chord, M_op_chord, M_op_brace = (x*1e3 for x in args.forces)
+    loads = {'P_chord':P_chord,'P_brace':P_brace,'M_ip_chord':M_ip_chord,'M_op_chord':M_op_chord,
+             'M_op_brace':M_op_brace,'sigma_max':args.sigma_max*1e6,'SCF_ch_op':2.0,'SCF_br_op':2.0}
+    start = time.time()
+    results = design_space(geometries,loads,workers=args.workers)
+    for res in results:
+        geometry = res['geometry']
+        print(f"{res['code']} {res['chord_type']}/{res['brace_type']} e={geometry['e']*1000:.0f} "
+              f"spacing={geometry['chordspacing']*1000:.0f} L={geometry['L_chord']*1000:.0f} div={geometry['div_chord']}: "
+              f"{len(res['chord'])} feasible pairs, {int(res['success_stress'].sum())} within sigma_max")
+    print(f"{len(results)} cases in {time.time()-start:.2f}s")
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import stages
+import tracing
+
+#Spill directory for evicted sweep results, disabled unless set
+DEFAULT_SPILL_DIR = os.environ.get("HS_SWEEP_CACHE")
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_SPILL_ENTRIES = 200
+
+class SweepCache:
+    """
+    Bounded in-memory LRU cache of all-sizes sweep results (dicts of arrays).
+    Entries pushed out of memory are written to spill_dir as .npz files when it is
+    set, and read back on a later miss, so a long session can revisit old inputs
+    without recomputing. The spill directory keeps the max_spill_entries most
+    recently used files, like section_cache.SectionCache.
+    """
+    def __init__(self,max_entries=DEFAULT_MAX_ENTRIES,spill_dir=DEFAULT_SPILL_DIR,
+                 max_spill_entries=DEFAULT_MAX_SPILL_ENTRIES):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.max_spill_entries = max_spill_entries
+        self.entries = OrderedDict()
+        #Module-level caches are shared by every Streamlit session thread
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**parts):
+        """SHA-256 of the inputs of a sweep. Arrays (e.g. the section tables) are keyed on their contents"""
+        canonical = json.dumps(sorted((name,stages.fingerprint(val)) for name,val in parts.items()))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _spill_path(self,key):
+        return os.path.join(self.spill_dir,key + ".npz")
+
+    def _spill(self,key,value):
+        arrays = {name:val for name,val in value.items() if isinstance(val,np.ndarray)}
+        meta = {name:val for name,val in value.items() if not isinstance(val,np.ndarray)}
+        os.makedirs(self.spill_dir,exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir,suffix=".tmp")
+        with os.fdopen(fd,"wb") as f:
+            np.savez(f,__meta__=np.array(json.dumps(meta)),**arrays)
+        os.replace(tmp_path,self._spill_path(key))
+        self._evict_spill()
+
+    def _load_spill(self,key):
+        path = self._spill_path(key)
+        try:
+            with np.load(path,allow_pickle=False) as data:
+                value = json.loads(str(data["__meta__"]))
+                value.update({name:data[name] for name in data.files if name != "__meta__"})
+        except (OSError,ValueError,KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _evict_spill(self):
+        entries = []
+        for entry in os.scandir(self.spill_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    entries.append((entry.stat().st_mtime,entry.path))
+                except OSError:
+                    pass
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_spill_entries,0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self,key):
+        """Cached result for key, or None on a miss"""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                return value
+        if self.spill_dir is None:
+            return None
+        value = self._load_spill(key)
+        if value is not None:
+            self.put(key,value)
+        return value
+
+    def put(self,key,value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            evicted = []
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False))
+        #Spill files are written outside the lock, so other sessions' hits do not wait on the disk
+        if self.spill_dir is not None:
+            for old_key, old_value in evicted:
+                self._spill(old_key,old_value)
+
+    def get_or_compute(self,key,func):
+        """Return the cached value for key, computing and storing it with func() on a miss"""
+        value = self.get(key)
+        hit = value is not None
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            value = func()
+            self.put(key,value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+#Module level, so cached sweeps survive Streamlit reruns (e.g. from Bokeh selection events)
+default_cache = SweepCache()
+
+@tracing.traced("all-sizes sweep")
+def all_sizes(chord_type,chord,brace,e,chordspacing,L_chord,div_chord,
+              P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,SCF_ch_op,SCF_br_op,cache=default_cache,
+              store=None,labels=None):
+    """
+    Pruned all-sizes sweep of main.py through the stage graph, cached on its inputs (SI).
+    The section tables stand for the code and section types in the key. sigma_max is
+    left out, as it only decides success_stress, which is not kept.
+    store: optional results_store.ResultStore the sweep is added to (once per key, also when it
+           comes from the cache), with labels ({code, brace_type, chord_names, brace_names}) for its rows. Reading
+           the arrays back is slower than the vectorised sweep, so the store is for queries
+    """
+    forces = (P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace)
+    key = cache.make_key(chord_type=chord_type,chord=chord,brace=brace,
+                         geometry=(e,chordspacing,L_chord,div_chord),forces=forces,SCF=(SCF_ch_op,SCF_br_op))
+    def compute():
+        res = stages.run(stages.graph('all'),chord_type,chord,brace,e,chordspacing,L_chord,div_chord,
+                         *forces,np.inf,SCF_ch_op,SCF_br_op)
+        return {name:val for name,val in res.items() if name not in ('pairs','success_stress')}
+    res = cache.get_or_compute(key,compute)
+    if store is not None:
+        inputs = dict(zip(('e','chordspacing','L_chord','div_chord','P_chord','P_brace','M_ip_chord',
+                           'M_op_chord','M_op_brace','SCF_ch_op','SCF_br_op'),
+                          (e,chordspacing,L_chord,div_chord) + forces + (SCF_ch_op,SCF_br_op)))
+        store.add_sweep(key,res,chord_type,chord,brace,inputs,**(labels or {}))
+    return res
@@ -0,0 +1,213 @@
+"""
+Synthetic hollow section families for sweeps beyond the catalogue.
+
+Dense (d, b, t) grids of SHS, RHS and CHS get their properties from vectorised
+closed forms of the geometry validation.hs meshes: RHS/SHS with outer corner
+radius r_out = 2t (inner radius t), CHS as a true circle. The FE solve of
+validation.hs models the corners and circle with a few straight segments, so
+its properties differ slightly from the closed forms. A correction table of
+FE / closed-form ratios, tabulated against the shape ratios d/t and b/t, is
+built once from FE solves (through the persistent section cache) and saved
+with the data; the properties are then exact closed forms times interpolated
+ratios. As the whole geometry (r_out = 2t) and mesh size (t^2) scale with t, the
+ratios depend on shape only. build_corrections() records the largest
+interpolation error at cell midpoints, which must be within CORRECTION_TOLERANCE.
+
+The generated arrays are functions_vec.SECTION_DTYPE, so they feed
+functions_vec.joint_check and the all-sizes sweep directly.
+"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+import catalogue
+import functions_vec as fvec
+
+CORRECTIONS_PATH = os.path.join(catalogue.DATA_DIR,"synthetic_corrections.json")
+#Largest allowed relative error of an interpolated correction against the FE solve
+CORRECTION_TOLERANCE = 0.005
+#Shape ratios d/t and b/t of the correction table, from the smallest section with room for the inner radius
+SHAPE_GRID = (5.,6.,8.,10.,14.,20.,28.,40.,60.,80.,100.)
+PROPS = ('A','Ix','Iy')
+
+def _rounded_rect(b,d,r):
+    """Area and second moments (about the centroid, Ix with d as depth) of a solid b x d rectangle with corner radius r"""
+    #Rectangle, less four r x r corner squares, plus four quarter circles
+    square_y = d / 2 - r / 2
+    square_x = b / 2 - r / 2
+    circle_y = d / 2 - r + 4 * r / (3 * np.pi)
+    circle_x = b / 2 - r + 4 * r / (3 * np.pi)
+    quarter_area = np.pi * r**2 / 4
+    quarter_I0 = (np.pi / 16 - 4 / (9 * np.pi)) * r**4
+    A = b * d - 4 * r**2 + 4 * quarter_area
+    Ix = b * d**3 / 12 - 4 * (r**4 / 12 + r**2 * square_y**2) + 4 * (quarter_I0 + quarter_area * circle_y**2)
+    Iy = d * b**3 / 12 - 4 * (r**4 / 12 + r**2 * square_x**2) + 4 * (quarter_I0 + quarter_area * circle_x**2)
+    return A, Ix, Iy
+
+def closed_form(kind,d,b,t):
+    """
+    Exact area and second moments (m^2, m^4) of hollow sections, for arrays of d, b, t (m).
+    RHS/SHS: outer corner radius 2t and inner radius t, as meshed by validation.hs.rhs;
+    Ix bends about the axis parallel to b (d is the depth). CHS: d is the diameter, b is ignored.
+    """
+    d, b, t = np.broadcast_arrays(*(np.asarray(x,dtype=float) for x in (d,b,t)))
+    if kind == "CHS":
+        d_in = d - 2 * t
+        A = np.pi / 4 * (d**2 - d_in**2)
+        I = np.pi / 64 * (d**4 - d_in**4)
+        return A, I, I.copy()
+    A_out, Ix_out, Iy_out = _rounded_rect(b,d,2 * t)
+    A_in, Ix_in, Iy_in = _rounded_rect(b - 2 * t,d - 2 * t,t)
+    return A_out - A_in, Ix_out - Ix_in, Iy_out - Iy_in
+
+def _fe_solve(kind,d,b,t):
+    """A, Ix, Iy of one section from the FE solve of validation.hs (section cache first)"""
+    import validation as vld
+    section = vld.hs(d,t)
+    props = (section.chs() if kind == "CHS" else section.rhs(b))
+    return props[0], props[1], props[2]
+
+def _polygon_moments(x,y):
+    """Area and second moments about the centroid of a closed polygon (counter-clockwise)"""
+    x1, y1 = np.roll(x,-1), np.roll(y,-1)
+    cross = x * y1 - x1 * y
+    A = cross.sum() / 2
+    cx = ((x + x1) * cross).sum() / (6 * A)
+    cy = ((y + y1) * cross).sum() / (6 * A)
+    Ix = ((y**2 + y * y1 + y1**2) * cross).sum() / 12 - A * cy**2
+    Iy = ((x**2 + x * x1 + x1**2) * cross).sum() / 12 - A * cx**2
+    return A, Ix, Iy
+
+def _rounded_rect_polygon(b,d,r,n_r):
+    angles = np.linspace(0,np.pi / 2,n_r)
+    x, y = [], []
+    for cx, cy, start in ((b / 2 - r,d / 2 - r,0.),(-b / 2 + r,d / 2 - r,np.pi / 2),
+                          (-b / 2 + r,-d / 2 + r,np.pi),(b / 2 - r,-d / 2 + r,1.5 * np.pi)):
+        x.append(cx + r * np.cos(start + angles))
+        y.append(cy + r * np.sin(start + angles))
+    return np.concatenate(x), np.concatenate(y)
+
+def polygon_solve(kind,d,b,t,n_r=3,n=70):
+    """
+    A, Ix, Iy of the straight-sided geometry validation.hs meshes (n_r points per corner arc,
+    n points around a CHS). The FE solve integrates these exactly, so this stands in for it
+    in build_corrections() where sectionproperties is not available.
+    """
+    if kind == "CHS":
+        angles = np.arange(n) * 2 * np.pi / n
+        outer = _polygon_moments(d / 2 * np.cos(angles),d / 2 * np.sin(angles))
+        inner = _polygon_moments((d / 2 - t) * np.cos(angles),(d / 2 - t) * np.sin(angles))
+    else:
+        outer = _polygon_moments(*_rounded_rect_polygon(b,d,2 * t,n_r))
+        inner = _polygon_moments(*_rounded_rect_polygon(b - 2 * t,d - 2 * t,t,n_r))
+    return tuple(o - i for o,i in zip(outer,inner))
+
+def _ratios(kind,d_t,b_t,solve,t):
+    """FE / closed-form ratios of (A, Ix, Iy) of the section of shape d/t, b/t"""
+    d = d_t * t
+    b = (d if kind == "CHS" else b_t * t)
+    fe = solve(kind,d,b,t)
+    cf = closed_form(kind,d,b,t)
+    return [float(f / c) for f,c in zip(fe,cf)]
+
+def build_corrections(path=CORRECTIONS_PATH,solve=_fe_solve,t=0.01,grid=SHAPE_GRID):
+    """
+    Tabulate FE / closed-form ratios over the shape grid, check the interpolation error at
+    the midpoints of the grid cells against CORRECTION_TOLERANCE and save the table.
+    RHS/SHS ratios of A and Ix are tabulated against (d/t, b/t); Iy is Ix of the section
+    turned on its side. CHS ratios are tabulated against d/t.
+    solve(kind,d,b,t) -> (A, Ix, Iy), the FE solve of validation.hs by default.
+    Returns the table; raises ValueError if the interpolation is outside the tolerance.
+    """
+    table = {'tolerance':CORRECTION_TOLERANCE, 'solve':solve.__name__, 'shape':list(grid)}
+    rhs = [[_ratios("RHS",d_t,b_t,solve,t) for b_t in grid] for d_t in grid]
+    table['RHS'] = {'A':[[r[0] for r in row] for row in rhs], 'Ix':[[r[1] for r in row] for row in rhs]}
+    chs = [_ratios("CHS",d_t,d_t,solve,t) for d_t in grid]
+    table['CHS'] = {name:[r[k] for r in chs] for k,name in enumerate(PROPS)}
+
+    mid = (np.asarray(grid[:-1]) + np.asarray(grid[1:])) / 2
+    error = 0.0
+    for kind, b_values in (("RHS",mid),("CHS",[None])):
+        for d_t in mid:
+            for b_t in b_values:
+                b_t = (d_t if b_t is None else b_t)
+                exact = _ratios(kind,d_t,b_t,solve,t)
+                approx = _interpolate(table,kind,np.array([d_t]),np.array([b_t]))
+                error = max(error,max(abs(a[0] / e - 1) for a,e in zip(approx,exact)))
+    table['max_error'] = error
+    if error > CORRECTION_TOLERANCE:
+        raise ValueError(f"Correction interpolation error {error:.4f} exceeds {CORRECTION_TOLERANCE}")
+    with open(path,"w") as f:
+        json.dump(table,f,indent=1)
+    load_corrections.cache_clear()
+    return table
+
+@lru_cache(maxsize=None)
+def load_corrections(path=CORRECTIONS_PATH):
+    """Saved correction table, or None where it has not been built"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError,ValueError):
+        return None
+
+def _interpolate(table,kind,d_t,b_t):
+    """Interpolated (A, Ix, Iy) ratios at the shape ratios, clamped to the table edges"""
+    grid = np.asarray(table['shape'])
+    d_t = np.clip(d_t,grid[0],grid[-1])
+    if kind == "CHS":
+        return tuple(np.interp(d_t,grid,table['CHS'][name]) for name in PROPS)
+    from scipy.interpolate import RegularGridInterpolator
+    b_t = np.clip(b_t,grid[0],grid[-1])
+    A = RegularGridInterpolator((grid,grid),np.asarray(table['RHS']['A']))
+    Ix = RegularGridInterpolator((grid,grid),np.asarray(table['RHS']['Ix']))
+    return (A(np.stack((d_t,b_t),axis=-1)), Ix(np.stack((d_t,b_t),axis=-1)), Ix(np.stack((b_t,d_t),axis=-1)))
+
+def properties(kind,d,b,t,corrections=None):
+    """
+    Section properties (A, Ix, Iy) of arrays of d, b, t (m): closed forms times the FE
+    correction ratios. corrections: table of build_corrections(), default the saved one;
+    without a table the closed forms are returned uncorrected.
+    """
+    d, b, t = np.broadcast_arrays(*(np.asarray(x,dtype=float) for x in (d,b,t)))
+    A, Ix, Iy = closed_form(kind,d,b,t)
+    corrections = (load_corrections() if corrections is None else corrections)
+    if corrections is None:
+        return A, Ix, Iy
+    rA, rIx, rIy = _interpolate(corrections,kind,d / t,b / t)
+    return A * rA, Ix * rIx, Iy * rIy
+
+def family(kind,d,t,b=None,corrections=None):
+    """
+    Every valid (d, b, t) combination of the given values (m) as a SECTION_DTYPE array.
+    SHS and CHS use b = d. RHS takes the widths b and keeps b < d.
+    Sections need d > 4t (room for the inner corner radius) for SHS/RHS, d > 2t for CHS.
+    """
+    d = np.asarray(d,dtype=float)
+    t = np.asarray(t,dtype=float)
+    if kind == "RHS":
+        dd, bb, tt = (x.ravel() for x in np.meshgrid(d,np.asarray(b,dtype=float),t,indexing='ij'))
+        keep = (bb < dd) & (bb > 4 * tt) & (dd > 4 * tt)
+    else:
+        dd, tt = (x.ravel() for x in np.meshgrid(d,t,indexing='ij'))
+        bb = dd
+        keep = dd > (2 if kind == "CHS" else 4) * tt
+    dd, bb, tt = dd[keep], bb[keep], tt[keep]
+    A, Ix, Iy = properties(kind,dd,bb,tt,corrections)
+    return fvec.section_array((bb,dd,tt,A,Ix,Iy))
+
+def names(kind,sections):
+    """Labels in the format of the catalogue names, e.g. '250 x 150 x 8.0 RHS' or '168.3 x 6.4 CHS' (mm)"""
+    return [f"{h*1000:.0f} x {b*1000:.0f} x {t*1000:.1f} {kind}" if kind != "CHS" else f"{h*1000:.1f} x {t*1000:.1f} CHS"
+            for b,h,t in zip(sections['b'],sections['h'],sections['t'])]
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the FE correction table of the synthetic section families.")
+    parser.add_argument('--polygon',action='store_true',
+                        help="integrate the meshed polygons directly instead of solving with sectionproperties")
+    args = parser.parse_args()
+    table = build_corrections(solve=(polygon_solve if args.polygon else _fe_solve))
+    print(f"Correction table written to {CORRECTIONS_PATH}, max interpolation error {table['max_error']:.4%}")
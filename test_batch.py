@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+import pytest
+
+import batch
+import catalogue
+import functions as fnc
+
+JOBS = [{'id':'J1','chord_type':'SHS','chord':'200 x 200 x 10.0 SHS','brace':'100 x 100 x 6.0 SHS',
+         'e':-100,'chordspacing':2000,'L_chord':8000,'div_chord':4,
+         'P_chord':70,'P_brace':50,'M_ip_chord':5,'M_op_chord':5,'M_op_brace':5},
+        {'id':'J2','chord_type':'RHS','chord':'200 x 100 x 6.0 RHS','chord_rotate':'true','brace':'100 x 100 x 4.0 SHS',
+         'e':20,'chordspacing':1000,'L_chord':6000,'div_chord':6,
+         'P_chord':120,'P_brace':-40,'M_ip_chord':2,'M_op_chord':1,'M_op_brace':0.5,'sigma_max':30},
+        {'id':'J3','chord_type':'SHS','chord':'no such section','brace':'100 x 100 x 6.0 SHS',
+         'e':0,'chordspacing':2000,'L_chord':8000,'div_chord':4,
+         'P_chord':70,'P_brace':50,'M_ip_chord':5,'M_op_chord':5,'M_op_brace':5}]
+
+@pytest.mark.parametrize("ext",[".csv",".jsonl",".json"])
+def test_batch_matches_single_joint(tmp_path,ext):
+    job_path = str(tmp_path / ("jobs" + ext))
+    with open(job_path,'w',newline='') as f:
+        if ext == ".csv":
+            writer = csv.DictWriter(f,fieldnames=sorted({key for job in JOBS for key in job}))
+            writer.writeheader()
+            writer.writerows(JOBS)
+        elif ext == ".json":
+            json.dump(JOBS,f,indent=1)
+        else:
+            f.writelines(json.dumps(job) + "\n" for job in JOBS)
+    out_path = str(tmp_path / "results.csv")
+    summary = batch.run(job_path,out_path,chunk_size=2)
+    assert summary['jobs'] == 3
+    with open(out_path,newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['id'] for row in rows] == ['J1','J2','J3']
+    assert rows[2]['passed'] == 'False' and rows[2]['message'].startswith("Input error")
+
+    cat = catalogue.load()
+    for job, row in zip(JOBS[:2],rows[:2]):
+        chord_table = cat.table('AS',job['chord_type'])
+        brace_table = cat.table('AS','SHS')
+        scalar = fnc.joint_check(job['chord_type'],
+                    chord_table.props(chord_table.find(job['chord']),job.get('chord_rotate') == 'true'),
+                    brace_table.props(brace_table.find(job['brace'])),
+                    job['e']/1000,job['chordspacing']/1000,job['L_chord']/1000,job['div_chord'],
+                    job['P_chord']*1e3,job['P_brace']*1e3,job['M_ip_chord']*1e3,job['M_op_chord']*1e3,
+                    job['M_op_brace']*1e3,job.get('sigma_max',24)*1e6,2.0,2.0)
+        assert float(row['sigma_chord']) == pytest.approx(scalar['sigma_chord']/1e6,rel=1e-9)
+        assert float(row['sigma_brace']) == pytest.approx(scalar['sigma_brace']/1e6,rel=1e-9)
+        assert row['message'].startswith(scalar['message'])
+        assert row['passed'] == str(scalar['success'] and scalar['dim_success'] and scalar['success_stress'])
+
+def test_json_array_read_incrementally():
+    text = json.dumps(JOBS + [1.25e3,[1,2],"x"],indent=2)
+    #Reads of a few characters split every element across reads
+    for read_size in (1,7,len(text)):
+        assert list(batch._iter_json_array(io.StringIO(text),read_size)) == JOBS + [1.25e3,[1,2],"x"]
+    assert list(batch._iter_json_array(io.StringIO(" [ ] "))) == []
+    with pytest.raises(ValueError):
+        list(batch._iter_json_array(io.StringIO('{"id": 1}')))
+    with pytest.raises(ValueError):
+        list(batch._iter_json_array(io.StringIO('[{"id": 1}, {"id"'),4))
+
+def test_huge_integer_is_input_error():
+    job = dict(JOBS[0],id="huge",P_chord=json.loads("1" * 400))
+    rows = batch.run_chunk([job,JOBS[0]])
+    assert rows[0]['id'] == "huge" and rows[0]['message'].startswith("Input error")
+    assert rows[1] == batch.run_chunk([JOBS[0]])[0]
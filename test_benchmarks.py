@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+import benchmarks
+import functions as fnc
+import functions_vec as fvec
+import stages
+
+GOLDEN = benchmarks.load_golden()
+FLOAT_KEYS = ('Ov','theta','g_prime','beta','twogamma','tau','SCF_chax','SCF_bax','SCF_chch','sigma_chord','sigma_brace')
+
+def check_golden(res,golden,rel):
+    for key in FLOAT_KEYS:
+        assert res[key] == pytest.approx(golden[key],rel=rel), key
+    for key in ('success','gap','dim_success','success_stress','message'):
+        assert res[key] == golden[key], key
+
+@pytest.mark.parametrize("case",GOLDEN)
+def test_scalar_path_matches_golden(case):
+    res = fnc.joint_check(case['chord_type'],case['chord'],case['brace'],case['e'],
+                          *benchmarks.GEOMETRY,*benchmarks.LOADS)
+    check_golden(res,case['result'],rel=1e-12)
+
+def test_vectorised_paths_match_golden():
+    graph = stages.joint_graph()
+    for chord_type in ("SHS","RHS","CHS"):
+        cases = [case for case in GOLDEN if case['chord_type'] == chord_type]
+        chord = fvec.section_array([case['chord'] for case in cases])
+        brace = fvec.section_array([case['brace'] for case in cases])
+        e = np.array([case['e'] for case in cases])
+        ind = np.arange(len(cases))
+        res = fvec.joint_check(chord_type,chord,brace,e,*benchmarks.GEOMETRY,*benchmarks.LOADS,pairs=(ind,ind))
+        for i, case in enumerate(cases):
+            row = {key:res[key][i] for key in res if res[key] is not None}
+            row['message'] = fvec.check_message(res['fail_code'][i],res['gap'][i],case['chord'][1])
+            check_golden(row,case['result'],rel=1e-9)
+            single = stages.single_joint(graph,chord_type,tuple(case['chord']),tuple(case['brace']),case['e'],
+                                         *benchmarks.GEOMETRY,*benchmarks.LOADS)
+            check_golden(single,case['result'],rel=1e-9)
+
+@pytest.mark.skipif(not os.environ.get("HS_RUN_BENCHMARKS"),reason="set HS_RUN_BENCHMARKS=1 to time the core")
+def test_no_performance_regression():
+    timings, errors = benchmarks.run()
+    assert benchmarks.regressions(timings,benchmarks.load_baselines()) == {}
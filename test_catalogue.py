@@ -0,0 +1,23 @@
+import numpy as np
+
+import catalogue
+import functions_vec as fvec
+from test_functions_vec import catalogue_props
+
+def test_store_matches_csv(tmp_path):
+    cat = catalogue.Catalogue(catalogue.build(str(tmp_path)))
+    for (code,hs_type),source in catalogue.SOURCES.items():
+        table = cat.table(code,hs_type)
+        expected = fvec.section_array(catalogue_props("data/" + source))
+        np.testing.assert_allclose(table.section_array().view((float,6)),expected.view((float,6)),rtol=1e-12)
+        assert np.all(table.mass > 0)
+
+def test_range_query_and_lookup():
+    table = catalogue.load().table("AS","RHS")
+    rows = table.select(b=(0.1,0.2),t=(0.004,0.008))
+    mask = (table.b >= 0.1) & (table.b <= 0.2) & (table.t >= 0.004) & (table.t <= 0.008)
+    np.testing.assert_array_equal(rows,np.nonzero(mask)[0])
+    row = table.find(str(table.name[5]))
+    assert row == 5
+    b, h, t, area, I_x, I_y = table.props(row,reverse_axes=True)
+    assert (b, h, I_x, I_y) == (table.d[5], table.b[5], table.Iy[5], table.Ix[5])
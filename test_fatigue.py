@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import catalogue
+import fatigue
+import functions_vec as fvec
+
+def test_count_astm_example():
+    #ASTM E1049 rainflow counting example
+    ranges, counts = fatigue.count([-2,1,-3,5,-1,3,-4,4,-2])
+    totals = {}
+    for r, n in zip(ranges,counts):
+        totals[r] = totals.get(r,0) + n
+    assert totals == {3:0.5, 4:1.5, 6:0.5, 8:1.0, 9:0.5}
+
+def test_extract_matches_sequential_and_streaming():
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.normal(size=50000)) + 3 * rng.normal(size=50000)
+    tp = fatigue.turning_points(x)
+    ranges, residue = fatigue.extract_cycles(tp)
+    seq_ranges, seq_residue = fatigue._extract_sequential(tp)
+    np.testing.assert_array_equal(np.sort(ranges),np.sort(seq_ranges))
+    np.testing.assert_array_equal(residue,seq_residue)
+    counter = fatigue.Rainflow()
+    streamed = np.concatenate([counter.push(chunk) for chunk in np.array_split(x,23)])
+    np.testing.assert_array_equal(np.sort(streamed),np.sort(ranges))
+    np.testing.assert_array_equal(counter.residue,residue)
+
+def test_influence_coefficients_match_joint_check():
+    table = catalogue.load().table("AS","SHS")
+    chord = table.section_array()[[30,40,50]]
+    brace = table.section_array()[[10,20,30]]
+    loads = np.array([70e3,50e3,5e3,5e3,5e3])
+    coeffs = fatigue.influence_coefficients("SHS",chord,brace,-0.1,2.0,8.0,4,2.0,2.0)
+    ind = np.arange(3)
+    res = fvec.joint_check("SHS",chord,brace,-0.1,2.0,8.0,4,*loads,24e6,2.0,2.0,pairs=(ind,ind))
+    np.testing.assert_allclose(coeffs @ loads,np.stack([res['sigma_chord'],res['sigma_brace']],axis=1),rtol=1e-12)
+
+def test_constant_amplitude_damage():
+    #114 MPa is the 2e6 cycle hot-spot strength of a 16 mm wall
+    assert fatigue.cycles_to_failure(114e6,0.016) == pytest.approx(2e6,rel=0.01)
+    assert fatigue.cycles_to_failure(20e6,0.016) == np.inf
+    coeffs = np.array([[1e3,0,0,0,0],[0,0,0,0,0]])
+    history = np.zeros((2001,5))
+    history[1::2,0] = 114e3
+    res = fatigue.history_damage(coeffs,history,0.016,0.016,chunk_size=300)
+    assert res['cycles_chord'] == 1000
+    assert res['damage_chord'] == pytest.approx(1000 / fatigue.cycles_to_failure(114e6,0.016))
+    assert res['damage_brace'] == 0
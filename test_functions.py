@@ -0,0 +1,66 @@
+import pytest
+
+import forallpeople as u
+u.environment('structural')
+
+import functions as fnc
+
+#200x200x10 SHS chord and 100x100x6 SHS brace, (b,h,t,A,Ix,Iy) in SI units
+CHORD = (0.2,0.2,0.01,7.1e-3,4.18e-5,4.18e-5)
+BRACE = (0.1,0.1,0.006,2.14e-3,3.04e-6,3.04e-6)
+SECTION_UNITS = (u.m,u.m,u.m,u.m**2,u.m**4,u.m**4)
+
+def unit_inputs(e):
+    """Sidebar default inputs as forallpeople quantities, in the units main.main uses"""
+    return dict(chord_type="SHS",
+                chord_props=tuple(val*unit for val,unit in zip(CHORD,SECTION_UNITS)),
+                brace_props=tuple(val*unit for val,unit in zip(BRACE,SECTION_UNITS)),
+                e=e*u.m,chordspacing=2.0*u.m,L_chord=8.0*u.m,div_chord=4,
+                P_chord=70*u.kN,P_brace=50*u.kN,
+                M_ip_chord=5*u.kN*u.m,M_op_chord=5*u.kN*u.m,M_op_brace=5*u.kN*u.m,
+                sigma_max=24*u.MPa,SCF_ch_op=2.0,SCF_br_op=2.0)
+
+@pytest.mark.parametrize("e",[-0.1,-0.05,0.0,0.04])
+def test_plain_path_matches_unit_path(e):
+    unit_res = fnc.joint_check(**unit_inputs(e))
+    plain_res = fnc.joint_check_units(**unit_inputs(e))
+    assert plain_res.keys() == unit_res.keys()
+    for key in unit_res:
+        if key in fnc.STRESS_KEYS:
+            assert isinstance(plain_res[key],u.Physical)
+            assert plain_res[key].value == pytest.approx(unit_res[key].value,rel=1e-12)
+        else:
+            assert plain_res[key] == pytest.approx(unit_res[key],rel=1e-12)
+
+def test_units_checked_at_boundary():
+    inputs = unit_inputs(-0.1)
+    inputs['P_brace'] = 50*u.kN*u.m
+    with pytest.raises(ValueError):
+        fnc.joint_check_units(**inputs)
+    inputs['P_brace'] = 50e3
+    with pytest.raises(TypeError):
+        fnc.joint_check_units(**inputs)
+
+def test_SCFochax_func_tables():
+    #Grid points return the tabulated CIDECT values
+    SCF_ochax, SCF_obax, SCF_bax_min, in_range = fnc.SCFochax_func(0.6,45*3.141592653589793/180)
+    assert (SCF_ochax, SCF_obax, SCF_bax_min) == pytest.approx((2.83,1.7,2.30))
+    assert in_range
+    #Arrays are evaluated in one call and points off the curves are flagged, not raised
+    beta = [0.3,0.45,0.7]
+    theta = [x*3.141592653589793/180 for x in (30,37.5,45)]
+    SCF_ochax, SCF_obax, SCF_bax_min, in_range = fnc.SCFochax_func(beta,theta)
+    assert SCF_ochax[1] == pytest.approx((2.73+2.5+3.18+2.83)/4)
+    assert SCF_ochax[2] == pytest.approx(2.83)
+    assert list(in_range) == [True,True,False]
+
+def test_stresses_latex_matches_plain_path_and_is_memoised():
+    res = fnc.joint_check("SHS",CHORD,BRACE,-0.1,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0,MF_chord=1.6)
+    assert res['MF_chord'] == 1.6
+    args = (CHORD,BRACE,res['SCF_chax'],res['SCF_bax'],res['SCF_chch'],res['theta'],res['MF_chord'],res['MF_brace'],
+            70.,50.,5.,5.,5.,2.0,2.0)
+    latex = fnc.stresses_latex(*args)
+    assert f"{res['sigma_chord']/1e6:.3f}" in latex[3]
+    hits = fnc.stresses_latex.cache_info().hits
+    assert fnc.stresses_latex(*args) is latex
+    assert fnc.stresses_latex.cache_info().hits == hits + 1
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forallpeople as u
+u.environment('structural')
+
+import functions as fnc
+import functions_vec as fvec
+
+def catalogue_props(path):
+    """(b,h,t,area,I_x,I_y) tuples in SI units, as built by validation.hs_populate"""
+    df = pd.read_csv(path,header=0)
+    b = (df['b'] if 'b' in df else df['d']) / 1000
+    I_y = (df['Iy'] if 'Iy' in df else df['Ix']) * 10**6 / 1000**4
+    return list(zip(b,df['d']/1000,df['t']/1000,df['Area']/1000**2,df['Ix']*10**6/1000**4,I_y))
+
+def scalar_joint(chord_type,ch,br,e,chordspacing,L_chord,div_chord):
+    """Unit aware scalar chain of main.main (srun=False) for the default sidebar forces"""
+    b0,h0,t0,A_chord,Ix_chord,Iy_chord = ch
+    b1,h1,t1,A_brace,Ix_brace,Iy_brace = br
+    Ov,theta,g_prime = fnc.overlap(L_chord*u.m,chordspacing*u.m,div_chord,e*u.m,h0*u.m,h1*u.m,t0*u.m)
+    beta,twogamma,tau = fnc.dim_params(b0=b0*u.m,t0=t0*u.m,b1=b1*u.m,t1=t1*u.m,chord_type=chord_type)
+    success, message, gap = fnc.check_angle_ecc_gap(chord_type,theta,e,h0,Ov,g_prime,tau)
+    MF_chord = fnc.MF(chord_type,gap,"chord")
+    MF_brace = fnc.MF(chord_type,gap,"brace")
+    if gap:
+        SCF_chax,SCF_bax,SCF_chch = fnc.SCF_gap_rhs(beta,twogamma,tau,g_prime,theta)
+    else:
+        SCF_chax,SCF_bax,SCF_chch = fnc.SCF_overlap_rhs(beta,twogamma,tau,Ov,theta)
+    sigma_chord1P, sigma_chord2P = fnc.chord_ax_stresses(SCF_chax,SCF_chch,50*u.kN,70*u.kN,
+                                        theta,A_chord*u.m**2,A_brace*u.m**2,MF_chord,MF_brace)
+    sigma_chordM_ip, sigma_chordM_op = fnc.chord_BM_stresses(h0*u.m,b0*u.m,b1*u.m,SCF_chch,2.0,
+                                        5*u.kN*u.m,5*u.kN*u.m,Ix_chord*u.m**4,Iy_chord*u.m**4)
+    sigma_brace_1P, sigma_braceM_op = fnc.brace_stresses(b1*u.m,SCF_bax,50*u.kN,A_brace*u.m**2,2.0,
+                                        5*u.kN*u.m,Iy_brace*u.m**4,MF_brace)
+    sigma_chord, sigma_brace = fnc.cum_stresses(sigma_chord1P,sigma_chord2P,sigma_chordM_ip,
+                                        sigma_chordM_op,sigma_brace_1P,sigma_braceM_op)
+    return sigma_chord.value, sigma_brace.value, success, message, gap
+
+@pytest.mark.parametrize("chord_type,path,e",[("SHS","data/SHS.csv",-0.1),
+                                              ("SHS","data/SHS.csv",0.03),
+                                              ("RHS","data/RHS.csv",-0.05)])
+def test_joint_check_matches_scalar(chord_type,path,e):
+    props = catalogue_props(path)[::4]
+    chord = fvec.section_array(props)
+    brace = fvec.section_array(props)
+    res = fvec.joint_check(chord_type,chord,brace,e,2.0,8.0,4,
+                            70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    assert len(res['sigma_chord']) == sum(br[0] <= ch[0] for ch in props for br in props)
+    for i,(ch_ind,br_ind) in enumerate(zip(res['chord'],res['brace'])):
+        sigma_chord, sigma_brace, success, message, gap = scalar_joint(chord_type,props[ch_ind],props[br_ind],
+                                                                        e,2.0,8.0,4)
+        assert res['sigma_chord'][i] == pytest.approx(sigma_chord,rel=1e-9)
+        assert res['sigma_brace'][i] == pytest.approx(sigma_brace,rel=1e-9)
+        assert res['success'][i] == success
+        assert res['gap'][i] == gap
+        assert fvec.check_message(res['fail_code'][i],res['gap'][i],props[ch_ind][1]) == message
+
+def test_section_array_from_columns():
+    props = catalogue_props("data/SHS.csv")
+    columns = tuple(np.array(col) for col in zip(*props))
+    np.testing.assert_array_equal(fvec.section_array(columns),fvec.section_array(props))
+
+@pytest.mark.parametrize("path",["data/CHS.csv","data/CHS_en.csv"])
+def test_joint_check_matches_scalar_chs(path):
+    props = catalogue_props(path)[::5]
+    chord = fvec.section_array(props)
+    res = fvec.joint_check("CHS",chord,chord,0,2.0,8.0,4,
+                            70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    for i,(ch_ind,br_ind) in enumerate(zip(res['chord'],res['brace'])):
+        scalar = fnc.joint_check("CHS",props[ch_ind],props[br_ind],0,2.0,8.0,4,
+                                70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+        for key in ('SCF_chax','SCF_bax','SCF_chch','sigma_chord','sigma_brace'):
+            assert res[key][i] == pytest.approx(scalar[key],rel=1e-12)
+        assert res['SCF_in_range'][i] == scalar['SCF_in_range']
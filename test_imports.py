@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY = ('scipy','handcalcs','matplotlib','bokeh','streamlit_bokeh_events','streamlit_drawable_canvas',
+         'PIL','sectionproperties')
+
+def loaded(modules):
+    """Heavy modules left in sys.modules after importing modules in a fresh interpreter"""
+    code = (f"import sys, json; import {', '.join(modules)}; "
+            f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))")
+    out = subprocess.run([sys.executable,"-c",code],check=True,capture_output=True,text=True,cwd=HERE)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def test_core_defers_heavy_imports():
+    assert loaded(("functions","functions_vec","catalogue","stages","sweep","optimise",
+                   "truss","parametric","reliability","fatigue")) == []
+
+def test_app_defers_feature_imports():
+    assert loaded(("main",)) == []
+
+def test_deferred_imports_load_on_use():
+    import functions as fnc
+    SCF_ochax, SCF_obax, SCF_bax_min, in_range = fnc.SCFochax_func(0.45,0.785398)
+    assert in_range and 'scipy.interpolate' in sys.modules
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions_vec as fvec
+import optimise
+
+@pytest.mark.parametrize("code,chord_type,brace_type,e",[("AS","SHS","SHS",-0.1),
+                                                         ("AS","RHS","SHS",-0.05),
+                                                         ("EN","CHS","CHS",0.0)])
+def test_lightest_pairs_match_brute_force(code,chord_type,brace_type,e):
+    cat = catalogue.load()
+    chord_table, brace_table = cat.table(code,chord_type), cat.table(code,brace_type)
+    args = (e,2.0,8.0,4,20e3,15e3,1e3,1e3,1e3,40e6,2.0,2.0)
+    rows, summary = optimise.lightest_pairs(chord_type,chord_table,brace_table,*args,k=5)
+    res = fvec.joint_check(chord_type,chord_table.section_array(),brace_table.section_array(),*args)
+    ok = res['success'] & res['dim_success'] & res['success_stress']
+    chord_length, brace_length = optimise.member_lengths(*args[:4])
+    mass = chord_table.mass[res['chord']] * chord_length + brace_table.mass[res['brace']] * brace_length
+    expected = np.sort(mass[ok])[:5]
+    assert [row['mass'] for row in rows] == pytest.approx(list(expected))
+    assert summary['evaluated'] <= summary['feasible']
+    for row in rows:
+        assert row['utilisation'] <= 1.0
+        assert row['governing'] in ("chord stress","brace stress")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions as fnc
+import parametric
+import sweep_cache
+
+FORCES = (70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+
+def pair(chord_type,chord_row=40,brace_row=25):
+    table = catalogue.load().table("AS",chord_type)
+    return table.props(chord_row), table.props(brace_row)
+
+@pytest.mark.parametrize("chord_type",["SHS","CHS"])
+def test_study_matches_scalar_joint_check(chord_type):
+    chord, brace = pair(chord_type)
+    e = (np.linspace(-0.15,0.05,5) if chord_type != "CHS" else 0.0)
+    res = parametric.study(chord_type,chord,brace,e,np.linspace(1.0,3.0,4),[6.0,8.0,10.0],[2,4,6],*FORCES,chunk_size=7)
+    assert res['utilisation'].shape == (len(res['e']),4,3,3)
+    rng = np.random.default_rng(0)
+    for ind in zip(*(rng.integers(0,n,10) for n in res['utilisation'].shape)):
+        geometry = [res[name][i].item() for name,i in zip(parametric.GEOMETRY,ind)]
+        single = fnc.joint_check(chord_type,chord,brace,*geometry,*FORCES)
+        assert res['sigma_chord'][ind] == pytest.approx(single['sigma_chord'])
+        assert res['sigma_brace'][ind] == pytest.approx(single['sigma_brace'])
+        assert res['feasible'][ind] == (single['success'] and single['dim_success'])
+
+def test_slice2d_and_best_geometry():
+    #200x200x10 chord, 125x125x5 brace
+    chord, brace = pair("SHS",19,33)
+    res = parametric.study("SHS",chord,brace,np.linspace(-0.15,0.05,5),np.linspace(1.0,3.0,4),8.0,[2,4,6],
+                           20e3,15e3,1e3,1e3,1e3,100e6,2.0,2.0)
+    x, y, grids = parametric.slice2d(res,'div_chord','e',{'chordspacing':2})
+    assert grids['utilisation'].shape == (len(y),len(x))
+    assert grids['utilisation'][1,2] == res['utilisation'][1,2,0,2]
+    best = parametric.best_geometry(res)
+    passing = res['utilisation'][res['success']]
+    assert len(passing) > 0
+    assert best['utilisation'] == pytest.approx(passing.min())
+
+def test_cached_study_reuses_result():
+    chord, brace = pair("SHS")
+    cache = sweep_cache.SweepCache()
+    args = ("SHS",chord,brace,np.linspace(-0.15,0.05,5),2.0,8.0,[2,4],*FORCES)
+    first = parametric.cached_study(*args,cache=cache)
+    assert parametric.cached_study(*args,cache=cache) is first
+    assert (cache.hits, cache.misses) == (1,1)
+
+def test_cached_study_has_own_cache():
+    chord, brace = pair("SHS")
+    entries = list(sweep_cache.default_cache.entries)
+    parametric.STUDY_CACHE.clear()
+    for div_chord in (2,4,6):
+        parametric.cached_study("SHS",chord,brace,0.0,2.0,8.0,div_chord,*FORCES)
+    assert len(parametric.STUDY_CACHE.entries) == parametric.STUDY_CACHE_ENTRIES
+    assert list(sweep_cache.default_cache.entries) == entries
+    parametric.STUDY_CACHE.clear()
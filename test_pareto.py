@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import catalogue
+import optimise
+import pareto
+import sweep_cache
+
+def brute_force(points):
+    le = np.all(points[None] <= points[:,None],axis=2)
+    lt = np.any(points[None] < points[:,None],axis=2)
+    return ~np.any(le & lt,axis=1)
+
+@pytest.mark.parametrize("m",[1,2,3,4])
+def test_non_dominated_matches_brute_force(m):
+    rng = np.random.default_rng(m)
+    for _ in range(20):
+        #Integer points have many ties and exact duplicates
+        for points in (rng.integers(0,5,(200,m)).astype(float),rng.random((200,m))):
+            assert (pareto.non_dominated(points) == brute_force(points)).all()
+
+def test_non_dominated_anticorrelated_front():
+    #Every point on the front, so the prefilter removes nothing
+    x = np.linspace(0,1,2000)
+    points = np.stack((x,1 - x,np.zeros_like(x)),axis=1)
+    assert pareto.non_dominated(points).all()
+
+def test_non_dominated_skips_nan():
+    points = np.array([[np.nan,0.,0.],[1.,1.,1.],[2.,2.,2.]])
+    assert list(pareto.non_dominated(points)) == [False,True,False]
+
+def test_nearest_alternatives_closest_first():
+    points = np.array([[0.,0.5],[0.5,0.],[0.1,0.6],[0.9,0.9],[1.,1.]])
+    front = pareto.non_dominated(points)
+    index, distance = pareto.nearest(points,front,2)
+    assert list(index) == [2,3]
+    assert distance[0] < distance[1]
+
+def test_front_of_sweep():
+    shs = catalogue.load().table("AS","SHS")
+    args = (0.0,1.0,10.0,8,20e3,15e3,1e3,1e3,1e3,2.0,2.0)
+    res = sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*args,
+                                cache=sweep_cache.SweepCache())
+    lengths = optimise.member_lengths(*args[:4])
+    out = pareto.front(res,shs.section_array(),shs.section_array(),lengths,sigma_max=100e6,k=5)
+    obj = out['objectives']
+    assert out['pareto'].sum() + 5 == len(out['index'])
+    assert (obj[:,:2] <= 100e6).all()
+    #Front by increasing mass, then the alternatives, none of which dominates a front pair
+    assert (np.diff(obj[out['pareto'],2]) >= 0).all()
+    candidates = pareto.objectives(res,shs.section_array(),shs.section_array(),lengths)
+    ok = res['success'] & res['dim_success'] & (candidates[:,:2] <= 100e6).all(axis=1)
+    assert np.sort(out['index'][out['pareto']]).tolist() == np.flatnonzero(ok)[brute_force(candidates[ok])].tolist()
+    assert (out['distance'][~out['pareto']] > 0).all()
+
+def test_design_front_rows():
+    shs = catalogue.load().table("AS","SHS")
+    rows = pareto.design_front("SHS",shs,shs,0.0,1.0,10.0,8,20e3,15e3,1e3,1e3,1e3,100e6,2.0,2.0,
+                               extra='chord depth')
+    assert rows and all(row['pareto'] and row['utilisation'] <= 1 for row in rows)
+    assert rows[0]['mass'] == min(row['mass'] for row in rows)
+    assert 'extra' in rows[0]
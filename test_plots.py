@@ -0,0 +1,45 @@
+import numpy as np
+
+import plots
+
+def test_decimate_keeps_one_point_per_cell():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0,10,100000)
+    y = rng.uniform(0,10,100000)
+    idx = plots.decimate(x,y,(0,10),(0,10),bins=50)
+    assert len(idx) == 2500
+    cells = np.floor(x[idx] / 0.2) * 50 + np.floor(y[idx] / 0.2)
+    assert len(np.unique(cells)) == len(idx)
+    #Points outside the window collapse into the edge cells
+    assert len(plots.decimate(np.array([-5.,-1.,20.]),np.array([1.,1.,1.]),(0,10),(0,10),bins=50)) == 2
+
+def test_truss_utilisation_marks_governing_joint():
+    x = np.linspace(0,8,5)
+    chart = plots.truss_utilisation_altair(x,np.array([0.2,0.5,0.9,0.5,0.2]),np.array([0.4,0.3,0.1,0.3,0.4]),2)
+    spec = chart.to_dict()
+    marker = spec['datasets'][spec['layer'][1]['data']['name']]
+    assert marker == [{'x':4.0,'utilisation':0.9}]
+
+def test_images_decoded_once_and_read_only():
+    img = plots.image("SCFochax.png")
+    assert plots.image("SCFochax.png") is img
+    assert not img.flags.writeable
+
+def test_charts_reused_for_unchanged_inputs():
+    import matplotlib.pyplot as plt
+    png = plots.SCF_ochax_png(0.45,2.9,1.6)
+    assert png.startswith(b"\x89PNG") and plots.SCF_ochax_png(0.45,2.9,1.6) is png
+    assert plt.get_fignums() == []
+    #Specs are built once, but every call gets its own copy of the chart
+    args = (0.2,0.9,1.2,0.01,0.125,-0.1,"SHS")
+    geom = plots.geom_plot_altair(*args)
+    assert plots.geom_plot_altair(*args) is not geom
+    assert plots.geom_plot_altair(*args).to_dict() == geom.to_dict()
+    beta = plots.dim_params_altair('b0',200.,'b1',125.,'β',0.35,1.0,500)
+    beta.layer[0].encoding.x.title = "changed"
+    again = plots.dim_params_altair('b0',200.,'b1',125.,'β',0.35,1.0,500)
+    assert again.to_dict()['layer'][0]['encoding']['x']['title'] == 'b0 (mm)'
+    #Only the point changes with the section, the range band comes from the same template
+    other = plots.dim_params_altair('b0',200.,'b1',100.,'β',0.35,1.0,500)
+    assert beta.layer[1].to_dict() == other.layer[1].to_dict()
+    assert beta.layer[0].to_dict() != other.layer[0].to_dict()
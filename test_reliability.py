@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions as fnc
+import reliability as rel
+import sweep_cache
+
+def args(sigma_max=200e6):
+    #200x200x10 chord, 125x125x5 brace
+    table = catalogue.load().table("AS","SHS")
+    return ("SHS",table.props(19),table.props(33),-0.1,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,sigma_max,2.0,2.0)
+
+DISTRIBUTIONS = {'P_chord':('lognormal',70e3,0.1),'P_brace':('gumbel',50e3,10e3),
+                 't0':('normal',0.010,0.0005),'t1':('normal',0.005,0.0003),
+                 'e':('uniform',-0.105,-0.095),'theta_error':('normal',0.0,np.radians(1.0))}
+
+def test_samplers_match_moments():
+    rng = np.random.default_rng(0)
+    samples = rel.sample({'P_chord':('lognormal',70e3,0.1),'P_brace':('gumbel',50e3,5e3)},rng,200000)
+    assert samples['P_chord'].mean() == pytest.approx(70e3,rel=0.01)
+    assert samples['P_chord'].std() / 70e3 == pytest.approx(0.1,rel=0.02)
+    assert samples['P_brace'].mean() == pytest.approx(50e3,rel=0.01)
+    assert samples['P_brace'].std() == pytest.approx(5e3,rel=0.02)
+
+def test_nominal_samples_match_joint_check():
+    nominal = fnc.joint_check(*args())
+    deterministic = {'P_chord':('uniform',70e3,70e3),'t0':('uniform',0.010,0.010)}
+    res = rel.reliability(*args(),deterministic,n_samples=1000,chunk_size=300)
+    utilisation = max(nominal['sigma_chord'],nominal['sigma_brace']) / 200e6
+    assert res['mean_utilisation'] == pytest.approx(utilisation)
+    assert res['p_exceed'] == (1.0 if utilisation > 1 else 0.0)
+
+def test_angle_error_moves_overlap():
+    #A fixed angle error is the same joint as the chord spacing that gives that angle.
+    #Gap joint (e = 0) governed by the chord, whose SCFs depend on g'
+    delta = np.radians(3.0)
+    base = list(args())
+    base[3] = 0.0
+    base[8] = 5e3
+    base[11] = 0.0
+    a = list(base)
+    e, chordspacing, L_chord, div_chord = a[3:7]
+    l_truss = L_chord / div_chord
+    a[4] = l_truss * np.tan(np.arctan((chordspacing + 2 * e) / l_truss) + delta) - 2 * e
+    nominal = fnc.joint_check(*a)
+    res = rel.reliability(*base,{'theta_error':('uniform',delta,delta)},n_samples=100)
+    assert res['mean_utilisation'] == pytest.approx(max(nominal['sigma_chord'],nominal['sigma_brace']) / 200e6)
+
+def test_reproducible_across_workers():
+    first = rel.reliability(*args(),DISTRIBUTIONS,n_samples=50000,seed=3,chunk_size=8192)
+    assert rel.reliability(*args(),DISTRIBUTIONS,n_samples=50000,seed=3,chunk_size=8192,workers=2) == first
+    assert rel.reliability(*args(),DISTRIBUTIONS,n_samples=50000,seed=4,chunk_size=8192) != first
+
+def test_exceedance_and_sensitivity():
+    res = rel.reliability(*args(),DISTRIBUTIONS,n_samples=100000,seed=0)
+    assert 0 < res['p_exceed'] < 1
+    low, high = res['ci']
+    assert low < res['p_exceed'] < high
+    names = [name for name,_ in res['sensitivity']]
+    assert sorted(names) == sorted(DISTRIBUTIONS)
+    #Thinner walls raise the stresses
+    assert dict(res['sensitivity'])['t1'] < 0
+    with pytest.raises(ValueError):
+        rel.reliability(*args(),{'L_chord':('normal',8.0,0.1)},n_samples=10)
+
+def test_wilson_interval():
+    low, high = rel.wilson_interval(0,1000)
+    assert low == 0.0 and 0 < high < 0.005
+    low, high = rel.wilson_interval(500,1000)
+    assert low == pytest.approx(0.469,abs=1e-3) and high == pytest.approx(0.531,abs=1e-3)
+
+@pytest.mark.parametrize("distributions",[{'P_brace':('lognormal',-50e3,0.1)},{'P_chord':('normal',70e3,-1.0)},
+                                          {'e':('uniform',0.0,-0.1)},{'t0':('normal',0.0,0.001)},
+                                          {'t1':('weibull',0.005,0.001)}])
+def test_invalid_distributions_rejected(distributions):
+    with pytest.raises(ValueError):
+        rel.reliability(*args(),distributions,n_samples=100)
+
+def test_thickness_truncated_at_zero():
+    rng = np.random.default_rng(0)
+    samples = rel.sample({'t0':('normal',0.001,0.002)},rng,10000)
+    assert (samples['t0'] > 0).all()
+
+def test_nonfinite_utilisation_left_out(monkeypatch):
+    evaluate = rel.evaluate
+    def with_nan(model,samples,n):
+        utilisation, invalid = evaluate(model,samples,n)
+        utilisation[::2] = np.nan
+        return utilisation, invalid
+    monkeypatch.setattr(rel,"evaluate",with_nan)
+    res = rel.reliability(*args(sigma_max=1e6),{'P_chord':('normal',70e3,7e3)},n_samples=1000)
+    assert res['n'] == 500 and res['nonfinite'] == 500
+    assert res['exceedances'] == 500 and res['p_exceed'] == 1.0
+    assert np.isfinite(res['mean_utilisation'])
+
+def test_cached_reliability_reuses_result():
+    cache = sweep_cache.SweepCache(spill_dir=None)
+    first = rel.cached_reliability(*args(),DISTRIBUTIONS,n_samples=2000,seed=1,cache=cache)
+    again = rel.cached_reliability(*args(),dict(reversed(list(DISTRIBUTIONS.items()))),n_samples=2000,seed=1,
+                                   workers=2,cache=cache)
+    assert again is first
+    assert rel.cached_reliability(*args(),DISTRIBUTIONS,n_samples=2000,seed=2,cache=cache) is not first
+    assert (cache.hits, cache.misses) == (1,2)
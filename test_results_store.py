@@ -0,0 +1,110 @@
+import csv
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import batch
+import catalogue
+import results_store
+import sweep_cache
+from test_batch import JOBS
+
+ARGS = (0.0,1.0,10.0,8,20e3,15e3,1e3,1e3,1e3,2.0,2.0)
+
+def test_sweep_stored_and_read_back(tmp_path):
+    shs = catalogue.load().table("AS","SHS")
+    store = results_store.ResultStore(str(tmp_path / "results.sqlite"))
+    labels = {'code':'AS','brace_type':'SHS','chord_names':shs.name,'brace_names':shs.name}
+    first = sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*ARGS,
+                                  cache=sweep_cache.SweepCache(),store=store,labels=labels)
+    (run,) = store.runs()
+    assert run['source'] == 'sweep' and run['rows'] == len(first['chord'])
+
+    #Rerunning the same sweep in a fresh session does not store it twice
+    store = results_store.ResultStore(str(tmp_path / "results.sqlite"))
+    sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*ARGS,
+                          cache=sweep_cache.SweepCache(),store=store,labels=labels)
+    assert len(store.runs()) == 1
+    stored = store.query(columns=['chord_row','brace_row','sigma_chord','sigma_brace','message'])
+    assert [row['chord_row'] for row in stored] == first['chord'].tolist()
+    assert [row['brace_row'] for row in stored] == first['brace'].tolist()
+    assert np.allclose([row['sigma_brace'] for row in stored],first['sigma_brace'] / 1e6)
+
+    rows = store.query(chord="200 x 200%",sigma_chord=(0,50),passed=True,sigma_max=100)
+    assert rows and all(row['chord'].startswith("200 x 200") and row['sigma_chord'] <= 50 for row in rows)
+    ok = (first['success'] & first['dim_success'] & (first['sigma_chord'] <= 100e6) & (first['sigma_brace'] <= 100e6))
+    assert len(store.query(passed=True,sigma_max=100)) == ok.sum()
+    assert len(store.query(passed=False,sigma_max=100)) == len(ok) - ok.sum()
+    #Sweeps have no sigma_max of their own
+    assert store.query(passed=True) == []
+
+def test_cached_sweep_reaches_store(tmp_path):
+    #A sweep already in the memory cache is stored once a store is given
+    shs = catalogue.load().table("AS","SHS")
+    cache = sweep_cache.SweepCache()
+    sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*ARGS,cache=cache)
+    store = results_store.ResultStore(str(tmp_path / "results.sqlite"))
+    res = sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*ARGS,cache=cache,store=store)
+    assert cache.hits == 1
+    assert [run['rows'] for run in store.runs()] == [len(res['chord'])]
+
+def test_batch_appends_runs(tmp_path):
+    job_path = str(tmp_path / "jobs.jsonl")
+    with open(job_path,'w') as f:
+        f.writelines(json.dumps(job) + "\n" for job in JOBS)
+    out_path = str(tmp_path / "project.sqlite")
+    batch.run(job_path,out_path,chunk_size=2)
+    batch.run(job_path,out_path)
+    batch.run(job_path,str(tmp_path / "results.csv"))
+    with open(tmp_path / "results.csv",newline='') as f:
+        expected = list(csv.DictReader(f))
+
+    store = results_store.ResultStore(out_path)
+    assert [run['rows'] for run in store.runs()] == [3,3]
+    rows = store.query(run=1)
+    assert [row['id'] for row in rows] == ['J1','J2','J3']
+    for row, csv_row in zip(rows[:2],expected[:2]):
+        assert row['sigma_chord'] == pytest.approx(float(csv_row['sigma_chord']))
+        assert row['message'] == csv_row['message']
+        components = row['sigma_chord1P'] + row['sigma_chord2P'] + row['sigma_chordM_ip'] + row['sigma_chordM_op']
+        assert row['sigma_chord'] == pytest.approx(components)
+    assert rows[0]['P_chord'] == JOBS[0]['P_chord'] and rows[0]['chordspacing'] == JOBS[0]['chordspacing']
+    assert rows[2]['message'].startswith("Input error") and rows[2]['passed'] is False
+    assert [row['id'] for row in store.query(source='batch',brace="100 x 100 x 4.0 SHS")] == ['J2','J2']
+
+def test_query_rejects_unknown_columns(tmp_path):
+    store = results_store.ResultStore(str(tmp_path / "results.sqlite"))
+    with pytest.raises(ValueError):
+        store.query(columns=['chord','no_such_column'])
+
+def test_shared_store_across_threads(tmp_path):
+    #Sessions share one open store, as in the app
+    store = results_store.open_store(str(tmp_path / "shared.sqlite"))
+    shs = catalogue.load().table("AS","SHS")
+    errors = []
+    def session(k):
+        try:
+            args = (0.0,1.0 + 0.1 * k) + ARGS[2:]
+            sweep_cache.all_sizes("SHS",shs.section_array(),shs.section_array(),*args,
+                                  cache=sweep_cache.SweepCache(),store=store)
+            store.query(columns=['chord_row'],limit=10)
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=session,args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(store.runs()) == 4
+    assert len(store.query(columns=['run'])) == sum(run['rows'] for run in store.runs())
+
+def test_app_store_from_environment(tmp_path,monkeypatch):
+    monkeypatch.delenv(results_store.STORE_ENV,raising=False)
+    assert results_store.app_store() is None
+    path = str(tmp_path / "app.sqlite")
+    monkeypatch.setenv(results_store.STORE_ENV,path)
+    store = results_store.app_store()
+    assert store is results_store.open_store(path) and results_store.app_store() is store
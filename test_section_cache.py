@@ -0,0 +1,32 @@
+import os
+import time
+
+from section_cache import SectionCache
+
+def test_get_or_compute_persists(tmp_path):
+    props = [7.1e-3,4.18e-5,4.18e-5,0.0,6.6e-5,0.0]
+    calls = []
+    def solve():
+        calls.append(1)
+        return props
+    key = SectionCache.make_key("RHS",0.2,0.2,0.01,0.02,n_r=3,mesh_size=0.01**2)
+    assert SectionCache(str(tmp_path)).get_or_compute(key,solve) == props
+    #A new cache object on the same directory (another session or worker) hits the file
+    assert SectionCache(str(tmp_path)).get_or_compute(key,solve) == props
+    assert len(calls) == 1
+    assert SectionCache.make_key("RHS",0.1+0.1,0.2,0.01,0.02,n_r=3,mesh_size=0.01**2) == key
+
+def test_lru_eviction(tmp_path):
+    cache = SectionCache(str(tmp_path),max_entries=2)
+    keys = [SectionCache.make_key("CHS",d,d,0.005,0.0,n=70) for d in (0.1,0.2,0.3)]
+    cache.put(keys[0],[1.0])
+    cache.put(keys[1],[2.0])
+    past = time.time() - 100
+    os.utime(cache._path(keys[0]),(past,past))
+    os.utime(cache._path(keys[1]),(past - 10,past - 10))
+    #Reading keys[1] makes it the most recently used, so keys[0] is evicted next
+    assert cache.get(keys[1]) == [2.0]
+    cache.put(keys[2],[3.0])
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) == [2.0]
+    assert cache.get(keys[2]) == [3.0]
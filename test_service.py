@@ -0,0 +1,94 @@
+import threading
+import urllib.error
+
+import numpy as np
+import pytest
+
+import batch
+import service
+import service_client
+from test_batch import JOBS
+
+@pytest.fixture
+def server():
+    #A long window, so that concurrent requests land in the same batch
+    server = service.make_server(port=0,window=0.2)
+    thread = threading.Thread(target=server.serve_forever,daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.coalescer.close()
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_single_and_array_requests(server):
+    client = service_client.JointCheckClient(url(server))
+    expected = batch.run_chunk(JOBS)
+    assert client.check(JOBS[0]) == expected[0]
+    assert client.check(JOBS) == expected
+
+def test_concurrent_requests_coalesced(server):
+    client = service_client.JointCheckClient(url(server))
+    jobs = service_client.random_jobs(8,np.random.default_rng(0))
+    results = [None] * len(jobs)
+    def post(i):
+        results[i] = client.check(jobs[i])
+    threads = [threading.Thread(target=post,args=(i,)) for i in range(len(jobs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [batch.run_chunk([job])[0] for job in jobs]
+    metrics = client.metrics()
+    assert metrics['requests'] == len(jobs) and metrics['joints'] == len(jobs)
+    assert metrics['batches'] < len(jobs)
+    assert metrics['latency_p50_ms'] > 0
+
+def test_bad_request(server):
+    client = service_client.JointCheckClient(url(server))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.check("not a job")
+    assert error.value.code == 400
+
+def test_failed_batch_is_server_error(server,monkeypatch):
+    def fail(jobs):
+        raise RuntimeError("interpolator unavailable")
+    monkeypatch.setattr(batch,"run_chunk",fail)
+    client = service_client.JointCheckClient(url(server))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.check(JOBS)
+    assert error.value.code == 500
+    assert "interpolator unavailable" in error.value.read().decode()
+    monkeypatch.undo()
+    assert client.check(JOBS) == batch.run_chunk(JOBS)
+
+def test_failed_request_isolated_in_batch(server,monkeypatch):
+    run_chunk = batch.run_chunk
+    def fail_bad(jobs):
+        if any(job.get('id') == "bad" for job in jobs):
+            raise OverflowError("int too large to convert to float")
+        return run_chunk(jobs)
+    monkeypatch.setattr(batch,"run_chunk",fail_bad)
+    client = service_client.JointCheckClient(url(server))
+    results = {}
+    def post(name,jobs):
+        try:
+            results[name] = client.check(jobs)
+        except urllib.error.HTTPError as error:
+            results[name] = error.code
+    #Both requests land within the window, so in the same batch
+    threads = [threading.Thread(target=post,args=("bad",[dict(JOBS[0],id="bad")])),
+               threading.Thread(target=post,args=("good",JOBS))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'bad':500, 'good':run_chunk(JOBS)}
+    assert server.coalescer.metrics.batches == 1
+
+def test_load_test_reports_throughput(server):
+    out = service_client.load_test(url(server),clients=4,requests=3,joints=2)
+    assert out['errors'] == 0 and out['joints'] == 24
+    assert out['joints_per_s'] > 0 and out['service']['joints'] == 24
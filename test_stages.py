@@ -0,0 +1,64 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+import catalogue
+import functions as fnc
+import functions_vec as fvec
+import stages
+
+ARGS = (-0.1,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+
+def test_graph_matches_joint_check_and_reuses_stages():
+    chord = catalogue.load().table("AS","SHS").section_array()
+    graph = stages.joint_graph(prune=True)
+    res = stages.run(graph,"SHS",chord,chord,*ARGS)
+    ref = fvec.joint_check("SHS",chord,chord,*ARGS,pairs=res['pairs'])
+    for key in ref:
+        if ref[key] is not None:
+            np.testing.assert_array_equal(res[key],ref[key])
+    #A force only reruns the stresses, sigma_max only the final comparison
+    stages.run(graph,"SHS",chord,chord,*ARGS[:5],40e3,*ARGS[6:])
+    stages.run(graph,"SHS",chord,chord,*ARGS[:5],40e3,*ARGS[6:9],30e6,*ARGS[10:])
+    assert graph.recomputed() == {'pairs':1,'sections':1,'overlap':1,'dim_params':1,
+                                  'checks':1,'SCF':1,'stresses':2,'stress_check':3}
+    #Going back to earlier inputs is served from the memos
+    again = stages.run(graph,"SHS",chord,chord,*ARGS)
+    assert again['sigma_chord'] is res['sigma_chord']
+    assert graph.recomputed()['stress_check'] == 3
+
+def test_single_joint_matches_scalar():
+    table = catalogue.load().table("AS","SHS")
+    graph = stages.joint_graph()
+    res = stages.single_joint(graph,"SHS",table.props(40),table.props(25),*ARGS,MF_brace=1.4)
+    ref = fnc.joint_check("SHS",table.props(40),table.props(25),*ARGS,MF_brace=1.4)
+    assert res['message'] == ref['message']
+    for key in ('Ov','theta','beta','SCF_chax','SCF_bax','SCF_chch','MF_brace','sigma_chord','sigma_brace'):
+        assert res[key] == pytest.approx(ref[key],rel=1e-12)
+    assert res['success_stress'] == ref['success_stress']
+
+def test_shared_node_across_threads():
+    node = stages.Node('square',lambda x: {'y':x * x},inputs=('x',),memo_size=2)
+    errors = []
+    def worker(k):
+        try:
+            for i in range(2000):
+                x = (i + k) % 5
+                assert node.run({'x':x},{})[1]['y'] == x * x
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=worker,args=(k,)) for k in range(8)]
+    #Switch threads as often as possible, to interleave the memo updates
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == [] and len(node.memo) <= 2
+    assert node.hits + node.misses == 8 * 2000
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions_vec as fvec
+import sweep
+
+@pytest.mark.parametrize("code,chord_type,brace_type,e,chordspacing",[("AS","SHS","SHS",-0.1,2.0),
+                                                                     ("AS","RHS","SHS",-0.05,1.0),
+                                                                     ("EN","CHS","CHS",0,2.0)])
+def test_candidate_pairs_are_the_feasible_pairs(code,chord_type,brace_type,e,chordspacing):
+    chord = catalogue.load().table(code,chord_type).section_array()
+    brace = catalogue.load().table(code,brace_type).section_array()
+    full = fvec.joint_check(chord_type,chord,brace,e,chordspacing,8.0,4,
+                            70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    feasible = full['success'] & full['dim_success']
+    (ch_ind, br_ind), pruned = sweep.candidate_pairs(chord_type,chord,brace,e,chordspacing,8.0,4)
+    np.testing.assert_array_equal(ch_ind,full['chord'][feasible])
+    np.testing.assert_array_equal(br_ind,full['brace'][feasible])
+    assert pruned['feasible'] == feasible.sum()
+    assert sum(pruned[rule] for rule in sweep.PRUNE_RULES) + pruned['feasible'] == pruned['total']
+
+def test_design_space_workers_match_serial():
+    geometries = [{'e':e,'chordspacing':2.0,'L_chord':8.0,'div_chord':4} for e in (-0.1,0.0)]
+    loads = {'P_chord':70e3,'P_brace':50e3,'M_ip_chord':5e3,'M_op_chord':5e3,'M_op_brace':5e3,
+             'sigma_max':24e6,'SCF_ch_op':2.0,'SCF_br_op':2.0}
+    families = (("SHS","SHS"),("CHS","CHS"))
+    serial = sweep.design_space(geometries,loads,codes=("AS",),families=families,workers=1,prune=False)
+    pooled = sweep.design_space(geometries,loads,codes=("AS",),families=families,workers=2,prune=False)
+    assert [(r['chord_type'],r['geometry']['e']) for r in pooled] == [("SHS",-0.1),("SHS",0.0),("CHS",0.0),("CHS",0.0)]
+    chord = catalogue.load().table("AS","SHS").section_array()
+    direct = fvec.joint_check("SHS",chord,chord,geometries[0]['e'],2.0,8.0,4,**{k:v for k,v in loads.items()})
+    for key in sweep.RESULT_KEYS:
+        np.testing.assert_array_equal(pooled[0][key],direct[key])
+        for a, b in zip(serial,pooled):
+            np.testing.assert_array_equal(a[key],b[key])
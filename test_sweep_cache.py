@@ -0,0 +1,58 @@
+import sys
+import threading
+
+import numpy as np
+
+import catalogue
+import sweep_cache
+
+ARGS = (-0.1,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,2.0,2.0)
+
+def test_all_sizes_cached_and_spilled(tmp_path):
+    shs = catalogue.load().table("AS","SHS").section_array()
+    rhs = catalogue.load().table("AS","RHS").section_array()
+    cache = sweep_cache.SweepCache(max_entries=1,spill_dir=str(tmp_path))
+    first = sweep_cache.all_sizes("SHS",shs,shs,*ARGS,cache=cache)
+    assert sweep_cache.all_sizes("SHS",shs,shs,*ARGS,cache=cache) is first
+    assert (cache.hits, cache.misses) == (1,1)
+    #A second table pushes the first result out of memory and onto disk
+    sweep_cache.all_sizes("SHS",shs,rhs,*ARGS,cache=cache)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+    again = sweep_cache.all_sizes("SHS",shs,shs,*ARGS,cache=cache)
+    assert (cache.hits, cache.misses) == (2,2)
+    assert again.keys() == first.keys()
+    assert again['pruned'] == first['pruned']
+    for name, val in first.items():
+        if isinstance(val,np.ndarray):
+            np.testing.assert_array_equal(again[name],val)
+
+def test_key_changes_with_inputs():
+    shs = catalogue.load().table("AS","SHS").section_array()
+    key = sweep_cache.SweepCache.make_key(chord=shs,forces=(1.0,2.0))
+    assert key == sweep_cache.SweepCache.make_key(forces=(1.0,2.0),chord=shs.copy())
+    assert key != sweep_cache.SweepCache.make_key(chord=shs,forces=(1.0,2.5))
+    assert key != sweep_cache.SweepCache.make_key(chord=shs[:-1],forces=(1.0,2.0))
+
+def test_shared_cache_across_threads():
+    cache = sweep_cache.SweepCache(max_entries=2,spill_dir=None)
+    errors = []
+    def worker(k):
+        try:
+            for i in range(2000):
+                key = str((i + k) % 5)
+                assert cache.get_or_compute(key,lambda: {'key':key})['key'] == key
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=worker,args=(k,)) for k in range(8)]
+    #Switch threads as often as possible, to interleave the memo updates
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == [] and len(cache.entries) <= 2
+    assert cache.hits + cache.misses == 8 * 2000
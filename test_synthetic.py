@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions as fnc
+import functions_vec as fvec
+import synthetic
+
+def test_closed_form_matches_finely_divided_polygon():
+    for kind, d, b, t in (("RHS",0.25,0.15,0.008),("RHS",0.1,0.3,0.005),("SHS",0.2,0.2,0.016),("CHS",0.2,0.2,0.008)):
+        exact = synthetic.closed_form(kind,d,b,t)
+        fine = synthetic.polygon_solve(kind,d,b,t,n_r=2000,n=20000)
+        assert [float(x) for x in exact] == pytest.approx(fine,rel=1e-5)
+
+def test_corrected_properties_within_tolerance():
+    table = synthetic.load_corrections()
+    assert table is not None and table['max_error'] <= synthetic.CORRECTION_TOLERANCE
+    rng = np.random.default_rng(0)
+    d, b, t = rng.uniform(0.05,0.5,300), rng.uniform(0.05,0.5,300), rng.uniform(0.003,0.02,300)
+    ok = (d > 5 * t) & (b > 5 * t)
+    for kind in ("RHS","CHS"):
+        props = synthetic.properties(kind,d[ok],b[ok],t[ok])
+        for i in np.flatnonzero(ok)[:100]:
+            j = np.count_nonzero(ok[:i])
+            exact = synthetic.polygon_solve(kind,d[i],b[i],t[i])
+            assert [p[j] for p in props] == pytest.approx(exact,rel=synthetic.CORRECTION_TOLERANCE)
+
+def test_build_corrections_checks_tolerance(tmp_path):
+    #A solver whose ratio is smooth in the shape passes, one that jumps between grid points fails
+    smooth = lambda kind,d,b,t: tuple(c * (1 - 0.01 * t / d) for c in synthetic.closed_form(kind,d,b,t))
+    table = synthetic.build_corrections(str(tmp_path / "table.json"),solve=smooth)
+    assert table['max_error'] <= synthetic.CORRECTION_TOLERANCE
+    assert synthetic.properties("CHS",0.2,0.2,0.01,corrections=table)[0] == pytest.approx(
+        synthetic.closed_form("CHS",0.2,0.2,0.01)[0] * (1 - 0.01 * 0.05),rel=1e-4)
+    rough = lambda kind,d,b,t: tuple(c * (1.05 if round(d / t) % 2 else 1.0) for c in synthetic.closed_form(kind,d,b,t))
+    with pytest.raises(ValueError):
+        synthetic.build_corrections(str(tmp_path / "rough.json"),solve=rough)
+
+def test_family_feeds_joint_check():
+    chord = synthetic.family("RHS",np.linspace(0.15,0.3,7),[0.008,0.01,0.012],b=np.linspace(0.1,0.25,7))
+    brace = synthetic.family("SHS",np.linspace(0.05,0.15,11),[0.004,0.006])
+    assert chord.dtype == fvec.SECTION_DTYPE
+    assert (chord['b'] < chord['h']).all() and (chord['h'] > 4 * chord['t']).all()
+    assert len(synthetic.names("RHS",chord)) == len(chord)
+    res = fvec.joint_check("RHS",chord,brace,-0.05,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    i = len(res['chord']) // 2
+    single = fnc.joint_check("RHS",tuple(chord[res['chord'][i]]),tuple(brace[res['brace'][i]]),
+                             -0.05,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    assert res['sigma_chord'][i] == pytest.approx(single['sigma_chord'])
+
+@pytest.mark.parametrize("kind",["SHS","RHS","CHS"])
+def test_names_match_catalogue(kind):
+    table = catalogue.load().table("AS",kind)
+    rows = [0,len(table) // 2,len(table) - 1]
+    sections = fvec.section_array([table.props(row) for row in rows])
+    assert synthetic.names(kind,sections) == [str(table.name[row]) for row in rows]
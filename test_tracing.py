@@ -0,0 +1,42 @@
+import json
+
+import catalogue
+import functions_vec as fvec
+import tracing
+
+def test_stages_traced_only_when_enabled(tmp_path):
+    chord = catalogue.load().table("AS","SHS").section_array()
+    args = ("SHS",chord,chord,-0.1,2.0,8.0,4,70e3,50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    tracing.reset()
+    tracing.enable(False)
+    fvec.joint_check(*args)
+    with tracing.span("block"):
+        pass
+    assert tracing.stats() == {}
+    tracing.enable(True)
+    try:
+        for _ in range(3):
+            fvec.joint_check(*args)
+        with tracing.span("block"):
+            pass
+    finally:
+        tracing.enable(False)
+    stats = tracing.stats()
+    for name in ("overlap","dimensional parameters","geometry checks","SCF","stresses","block"):
+        assert stats[name]['count'] == (1 if name == "block" else 3)
+        assert stats[name]['p50'] <= stats[name]['p99'] <= stats[name]['max'] <= stats[name]['total']
+    exported = json.loads(open(tracing.export(str(tmp_path / "trace.json"))).read())
+    assert exported['stats']['SCF']['count'] == 3
+    assert len(exported['events']) == 16
+    tracing.reset()
+
+def test_durations_capped(monkeypatch):
+    monkeypatch.setattr(tracing,"MAX_DURATIONS",10)
+    tracing.reset()
+    for i in range(25):
+        tracing.record("stage",0.0,float(i))
+    stats = tracing.stats()["stage"]
+    assert len(tracing._durations["stage"]) == 10
+    assert stats['count'] == 25 and stats['total'] == sum(range(25)) and stats['max'] == 24
+    assert stats['p50'] >= 15
+    tracing.reset()
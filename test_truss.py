@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import catalogue
+import functions as fnc
+import truss
+
+def test_uniform_load_forces_statics():
+    w, e, chordspacing, L_chord, div_chord = 20e3,-0.1,2.0,8.0,4
+    forces = truss.uniform_load_forces(w,e,chordspacing,L_chord,div_chord)
+    h_truss = chordspacing + 2 * e
+    #Midspan chord force is wL^2/8 over the depth, zero at the supports
+    assert forces['P_chord'][2] == pytest.approx(w * L_chord**2 / 8 / h_truss)
+    assert forces['P_chord'][[0,-1]] == pytest.approx([0,0])
+    #End panel shear is w(L/2 - l/2), symmetric about midspan
+    theta = np.arctan(h_truss / (L_chord / div_chord))
+    assert forces['P_brace'][0] == pytest.approx(w * (L_chord / 2 - L_chord / div_chord / 2) / np.sin(theta))
+    assert forces['P_brace'] == pytest.approx(forces['P_brace'][::-1])
+    assert len(forces['M_op_brace']) == div_chord + 1
+
+@pytest.mark.parametrize("chord_type,e",[("SHS",-0.1),("CHS",0.0)])
+def test_check_truss_matches_single_joints(chord_type,e):
+    table = catalogue.load().table("AS",chord_type)
+    chord, brace = table.props(40), table.props(25)
+    forces = truss.uniform_load_forces(20e3,e,2.0,8.0,4)
+    forces['M_ip_chord'] = np.linspace(0,5e3,5)
+    args = [forces[name] for name in truss.FORCES]
+    res = truss.check_truss(chord_type,chord,brace,e,2.0,8.0,4,*args,24e6,2.0,2.0)
+    for i in range(5):
+        single = fnc.joint_check(chord_type,chord,brace,e,2.0,8.0,4,*(f[i] for f in args),24e6,2.0,2.0)
+        assert res['sigma_chord'][i] == pytest.approx(single['sigma_chord'])
+        assert res['sigma_brace'][i] == pytest.approx(single['sigma_brace'])
+    assert res['utilisation'][res['governing_joint']] == res['utilisation'].max()
+    assert res['utilisation'] == pytest.approx(np.maximum(res['sigma_chord'],res['sigma_brace']) / 24e6)
+
+def test_check_truss_broadcasts_scalar_forces():
+    table = catalogue.load().table("AS","SHS")
+    res = truss.check_truss("SHS",table.props(40),table.props(25),-0.1,2.0,8.0,4,
+                            [70e3,50e3,30e3],50e3,5e3,5e3,5e3,24e6,2.0,2.0)
+    assert len(res['utilisation']) == 3
+    assert res['governing_joint'] == 0
+    with pytest.raises(ValueError):
+        truss.check_truss("SHS",table.props(40),table.props(25),-0.1,2.0,8.0,4,
+                          [70e3,50e3],[1e3,2e3,3e3],5e3,5e3,5e3,24e6,2.0,2.0)
@@ -0,0 +1,128 @@
+"""
+Lightweight per-stage timing.
+
+Stages are wrapped with the traced() decorator or a span() block. While tracing
+is disabled (the default) a traced function costs one flag check per call and
+span() returns a shared no-op context, so the instrumentation can stay in place.
+When enabled, each call records its duration under the stage name; stats()
+summarises count, total and percentiles per stage and to_json()/export() write
+the summary and the raw events for offline comparison.
+
+Set HS_TRACE=1 to enable tracing from the start, e.g. for batch runs. The flag
+is process-wide, so the app takes it from the environment only.
+"""
+import functools
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+#Raw events kept for export, the oldest are dropped beyond this
+MAX_EVENTS = 100000
+#Durations kept per stage for the percentiles, the oldest are dropped beyond this.
+#Counts and totals cover every call
+MAX_DURATIONS = 10000
+
+_enabled = bool(os.environ.get("HS_TRACE"))
+_durations = {}
+#stage -> [count, total seconds, max seconds] of every recorded call
+_totals = {}
+_events = []
+_origin = time.perf_counter()
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+def is_enabled():
+    return _enabled
+
+def record(name,start,seconds):
+    durations = _durations.get(name)
+    if durations is None:
+        durations = _durations.setdefault(name,deque(maxlen=MAX_DURATIONS))
+        _totals.setdefault(name,[0,0.0,0.0])
+    durations.append(seconds)
+    totals = _totals[name]
+    totals[0] += 1
+    totals[1] += seconds
+    totals[2] = max(totals[2],seconds)
+    _events.append((name,start - _origin,seconds))
+    if len(_events) > MAX_EVENTS:
+        del _events[:len(_events) - MAX_EVENTS]
+
+class _Span:
+    __slots__ = ('name','start')
+    def __init__(self,name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self,*exc):
+        record(self.name,self.start,time.perf_counter() - self.start)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Context manager timing the block under name"""
+    return (_Span(name) if _enabled else _NULL_SPAN)
+
+def traced(name=None):
+    """Decorator timing every call of the function under name (default its qualified name)"""
+    def decorator(func):
+        label = (func.__qualname__ if name is None else name)
+        @functools.wraps(func)
+        def wrapper(*args,**kwargs):
+            if not _enabled:
+                return func(*args,**kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                record(label,start,time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def stats():
+    """
+    {stage: {count, total, mean, p50, p90, p99, max}} in seconds, slowest total first.
+    The percentiles are of the last MAX_DURATIONS calls of each stage
+    """
+    out = {}
+    for name, durations in list(_durations.items()):
+        arr = np.array(durations)
+        count, total, longest = _totals[name]
+        p50, p90, p99 = np.percentile(arr,[50,90,99])
+        out[name] = {'count':count, 'total':float(total), 'mean':float(total / count),
+                     'p50':float(p50), 'p90':float(p90), 'p99':float(p99), 'max':float(longest)}
+    return dict(sorted(out.items(),key=lambda item: -item[1]['total']))
+
+def reset():
+    global _origin
+    _durations.clear()
+    _totals.clear()
+    _events.clear()
+    _origin = time.perf_counter()
+
+def to_json():
+    return json.dumps({'stats':stats(),
+                       'events':[{'stage':name,'start':start,'seconds':seconds} for name,start,seconds in _events]})
+
+def export(path):
+    """Write the stats and raw events to a JSON file"""
+    with open(path,"w") as f:
+        f.write(to_json())
+    return path
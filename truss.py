@@ -0,0 +1,66 @@
+"""
+Whole-truss check: every K-joint along the chord in one vectorised call.
+
+The truss layout is the one functions.overlap assumes: div_chord panels of
+length L_chord / div_chord and depth chordspacing + 2e, with a K-joint at each
+of the div_chord + 1 panel points. Forces are given per joint (arrays) or
+derived from a uniformly distributed load on a simply supported span. All
+joints share the chord and brace section and the geometry, so they run through
+functions_vec.joint_check as one batch of identical pairs.
+"""
+import numpy as np
+
+import functions_vec as fvec
+import tracing
+
+FORCES = ('P_chord','P_brace','M_ip_chord','M_op_chord','M_op_brace')
+
+def panel_points(L_chord,div_chord):
+    """Distance (m) of each of the div_chord + 1 panel points from the left support"""
+    return np.arange(div_chord + 1) * L_chord / div_chord
+
+def uniform_load_forces(w,e,chordspacing,L_chord,div_chord):
+    """
+    Force ranges (N) at each panel point of a simply supported truss under a uniform load range w (N/m).
+    Chord force is the bending moment over the truss depth at the panel point; brace force
+    is the larger panel shear either side of the point over sin(theta). Moments are zero (pinned joints).
+    """
+    x = panel_points(L_chord,div_chord)
+    h_truss = chordspacing + 2 * e
+    l_truss = L_chord / div_chord
+    theta = np.arctan(h_truss / l_truss)
+    P_chord = w * x * (L_chord - x) / 2 / h_truss
+    V_panel = np.abs(w * (L_chord / 2 - (x[:-1] + l_truss / 2)))
+    V = np.maximum(np.concatenate(([0.],V_panel)),np.concatenate((V_panel,[0.])))
+    zeros = np.zeros_like(x)
+    return {'P_chord':P_chord, 'P_brace':V / np.sin(theta),
+            'M_ip_chord':zeros, 'M_op_chord':zeros, 'M_op_brace':zeros}
+
+@tracing.traced("whole truss check")
+def check_truss(chord_type,chord_props,brace_props,
+                e,chordspacing,L_chord,div_chord,
+                P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace,
+                sigma_max,SCF_ch_op,SCF_br_op):
+    """
+    Joint check of every joint along the truss.
+    chord_props, brace_props: (b,h,t,A,Ix,Iy) tuples in SI units
+    Forces: scalars or arrays with one value per joint (N, Nm), broadcast against each other
+
+    Returns the functions_vec.joint_check arrays, one entry per joint, plus
+    'utilisation' (max stress / sigma_max), 'governing' (max of chord and brace, per joint)
+    and 'governing_joint' (index of the joint with the highest utilisation)
+    """
+    forces = np.broadcast_arrays(*(np.atleast_1d(np.asarray(f,dtype=float))
+                                   for f in (P_chord,P_brace,M_ip_chord,M_op_chord,M_op_brace)))
+    n = len(forces[0])
+    ind = np.zeros(n,dtype=np.int64)
+    res = fvec.joint_check(chord_type,fvec.section_array([chord_props]),fvec.section_array([brace_props]),
+                           e,chordspacing,L_chord,div_chord,*forces,
+                           sigma_max,SCF_ch_op,SCF_br_op,pairs=(ind,ind))
+    u_chord = res['sigma_chord'] / sigma_max
+    u_brace = res['sigma_brace'] / sigma_max
+    res.update({'u_chord':u_chord, 'u_brace':u_brace,
+                'utilisation':np.maximum(u_chord,u_brace),
+                'governing':np.where(u_chord >= u_brace,"chord","brace")})
+    res['governing_joint'] = int(np.argmax(res['utilisation']))
+    return res
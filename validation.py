@@ -1,64 +1,48 @@
-import streamlit as st
-from streamlit_drawable_canvas import st_canvas
+import os
+from functools import lru_cache
 
-import pandas as pd
-import forallpeople as u
-u.environment('structural')
-from PIL import Image
+import streamlit as st
 
-import sectionproperties.pre.sections as sections
-from sectionproperties.analysis.cross_section import CrossSection
+#The drawing canvas, Pillow and sectionproperties are imported where they are used,
+#so sessions without custom sections or sketches do not load them
+import section_cache
+import catalogue
+import tracing
 
-@st.cache
+@tracing.traced("section lookup")
 def load_data(code,chord_type):
-    if code == "AS":
-        if chord_type=="SHS":   return pd.read_csv(r"data/SHS.csv",header=0)
-        elif chord_type=="RHS": return pd.read_csv(r"data/RHS.csv",header=0)
-        elif chord_type=="CHS": return pd.read_csv(r"data/CHS.csv",header=0)
-    elif code == "EN":
-        if chord_type=="SHS":   return pd.read_csv(r"data/SHS.csv",header=0)
-        elif chord_type=="RHS": return pd.read_csv(r"data/RHS.csv",header=0)
-        elif chord_type=="CHS": return pd.read_csv(r"data/CHS_en.csv",header=0)
+    """Memory-mapped section table from the compiled catalogue (see catalogue.py)"""
+    return catalogue.load().table(code,chord_type)
 
 def hs_lookup(hs_type,member_type,chord_table):
     """Select a section size"""
-    options = st.sidebar.selectbox("",chord_table,key=member_type)
-    hs_chosen = chord_table[chord_table['Dimensions'] == options]
+    options = st.sidebar.selectbox("",chord_table.name,key=member_type)
+    hs_chosen = chord_table.find(options)
     reverse_axes = (st.sidebar.checkbox("Rotate 90 degrees W > H",key=member_type) if hs_type == "RHS" else False)
     return reverse_axes, hs_chosen
 
-#@st.cache
-def hs_populate(reverse_axes: bool, hs_chosen,srun):
-    if reverse_axes:
-        b = hs_chosen['d'] / 1000
-        h = hs_chosen['b'] / 1000
-        I_x =  hs_chosen['Iy'] * 10**6 / 1000**4
-        I_y =  hs_chosen['Ix'] * 10**6 / 1000**4
-    else:
-        try:
-            b = hs_chosen['b'] / 1000
-        except:
-            b = hs_chosen['d'] / 1000
-        h = hs_chosen['d'] / 1000
-        I_x =  hs_chosen['Ix'] * 10**6 / 1000**4
-        try:
-            I_y =  hs_chosen['Iy'] * 10**6 / 1000**4
-        except:
-            I_y = I_x #In RHS.csv I_y column does not exist, so needs to use I_x for SHS's
-    t = hs_chosen['t'] / 1000
-    area = hs_chosen['Area'] / 1000**2
-    if srun:
-        return b.iloc[0],h.iloc[0],t.iloc[0],area.iloc[0],I_x.iloc[0],I_y.iloc[0]
-    else:
-        return b,h,t,area,I_x,I_y
+@tracing.traced("section lookup")
+def hs_populate(reverse_axes: bool, chord_table, hs_chosen=None):
+    """Section properties in SI units.
+    Returns the (b,h,t,area,I_x,I_y) tuple of row hs_chosen,
+    or a structured array of every row of the table if hs_chosen is None"""
+    if hs_chosen is None:
+        return chord_table.section_array()
+    return chord_table.props(hs_chosen,reverse_axes)
+
+@lru_cache(maxsize=None)
+def sketch(name):
+    """Encoded bytes of the image data/<name>, read from disk once"""
+    with open(os.path.join(catalogue.DATA_DIR,name),"rb") as f:
+        return f.read()
 
 def overlap_sketch():
     col1, col2 = st.beta_columns(2)
     button_open = col1.button('Click to open sketch of overlap')
     button_close = col2.button('Click to close sketch of overlap')
     if button_open:
-        st.image(r"data/overlap_calculation.png",use_column_width=True)
-        st.image(r"data/gap_calculation.jpg",use_column_width=True)
+        st.image(sketch("overlap_calculation.png"),use_column_width=True)
+        st.image(sketch("gap_calculation.jpg"),use_column_width=True)
     if button_close:
         pass
 
@@ -67,7 +51,7 @@ def geometry_sketch():
     button_open = col1.button('Click to open sketch of truss properties')
     button_close = col2.button('Click to close truss properties')
     if button_open:
-        st.image(r"data/geometric_parameters.png",use_column_width=True)
+        st.image(sketch("geometric_parameters.png"),use_column_width=True)
     if button_close:
         pass
 
@@ -86,6 +70,7 @@ def input_description(label):
         """Display images using Pillow that 
         have been added via the streamlit file_uploader
         using the input_description function"""
+        from PIL import Image
         img = Image.open(image_file)
         return img
         
@@ -97,6 +82,7 @@ def input_description(label):
             st.text_area("Write a description:",key="write_area")
         if input_options[1]:
             #Provide drawing canvas
+            from streamlit_drawable_canvas import st_canvas
             draw_cols = st.beta_columns(2)
             stroke_width = draw_cols[0].number_input("Stroke width: ", 1, 6, 3)
             stroke_color = draw_cols[1].color_picker("Stroke color: ")
@@ -116,26 +102,41 @@ def input_description(label):
                 st.image(load_image(image_file),use_column_width=True)
 
 #Class to define SHS Object and allow operations such as analyse geometry
+#Frame properties are looked up in the persistent section_cache before meshing,
+#so each size is only solved once across sessions and server workers
 class hs:
-    def __init__(self,d,t):
+    def __init__(self,d,t,cache=section_cache.default_cache):
         self.d = d
         self.t = t
+        self.cache = cache
+        self.section = None
 
-    def rhs(self,b):
-        geometry = sections.Rhs(d=self.d, b=b, t=self.t, r_out=self.t*2.0, n_r=3)
+    def rhs_geometry(self,b):
+        import sectionproperties.pre.sections as sections
+        return sections.Rhs(d=self.d, b=b, t=self.t, r_out=self.t*2.0, n_r=3)
+
+    def chs_geometry(self):
+        import sectionproperties.pre.sections as sections
+        return sections.Chs(d=self.d,t=self.t,n=70)
+
+    @tracing.traced("FE section properties")
+    def analyse(self,geometry):
+        from sectionproperties.analysis.cross_section import CrossSection
         mesh = geometry.create_mesh(mesh_sizes=[self.t**2])
         self.section = CrossSection(geometry, mesh)
         return self.section.calculate_frame_properties()
 
+    def rhs(self,b):
+        key = self.cache.make_key("RHS",self.d,b,self.t,self.t*2.0,n_r=3,mesh_size=self.t**2)
+        return tuple(self.cache.get_or_compute(key,lambda: list(self.analyse(self.rhs_geometry(b)))))
+
     def chs(self):
-        geometry = sections.Chs(d=self.d,t=self.t,n=70)
-        mesh = geometry.create_mesh(mesh_sizes=[self.t**2])
-        self.section = CrossSection(geometry, mesh)
-        return self.section.calculate_frame_properties()
+        key = self.cache.make_key("CHS",self.d,self.d,self.t,0.0,n=70,mesh_size=self.t**2)
+        return tuple(self.cache.get_or_compute(key,lambda: list(self.analyse(self.chs_geometry()))))
 
-    def visualise(self):
+    def visualise(self,b=None):
+        #Cached results have no mesh, so rebuild the section before plotting
+        if self.section is None:
+            self.analyse(self.chs_geometry() if b is None else self.rhs_geometry(b))
         fig, ax = self.section.plot_centroids()
         return fig, ax
-
-    
-